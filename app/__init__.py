@@ -1,39 +1,64 @@
+import logging
+import time
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
 from flask_mail import Mail
-from flask_migrate import Migrate
 from app.config import Config
-import logging
+from app.logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
 
 # Initialize the db and mail
 db = SQLAlchemy()
-migrate = Migrate()
 mail = Mail()
 
 def create_app():
-    app = Flask(__name__)
+    started = time.perf_counter()
+    timings = {}
 
-    # Configure logging
-    logging.basicConfig(level=logging.DEBUG,  # Log all levels DEBUG and above
-                        format='%(asctime)s - %(levelname)s - %(message)s',
-                        handlers=[
-                            logging.StreamHandler(),  # Output to console
-                            logging.FileHandler('app.log')  # Log to a file
-                        ])
+    def mark(phase):
+        nonlocal started
+        now = time.perf_counter()
+        timings[phase] = round((now - started) * 1000, 2)
+        started = now
+
+    app = Flask(__name__)
 
     # Load configuration from .env or config.py
     app.config.from_object(Config)
+    mark('config')
+
+    # Configure logging (once per process, written by a background thread)
+    configure_logging(app)
+    mark('logging')
 
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
     mail.init_app(app)
+    # Flask-Migrate pulls in Alembic and Mako (about 120 ms); only `flask db ...` needs it
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        from app import models  # noqa: F401  Autogenerate compares against the models' metadata
+        Migrate(app, db)
+    mark('extensions')
 
-    # Register blueprints
-    from .routes import main_routes, user_routes, email_routes
+    # Register blueprints; the routes import their services on first use
+    from .routes import main_routes, user_routes, email_routes, health_routes
     app.register_blueprint(main_routes.main_bp)
     app.register_blueprint(user_routes.user_bp)
     app.register_blueprint(email_routes.email_bp)
+    app.register_blueprint(health_routes.health_bp)
+    mark('blueprints')
+
+    # Register CLI commands
+    from .commands import register_commands
+    register_commands(app)
+    mark('commands')
+
+    # Startup-timing report, also returned by /ready
+    timings['total'] = round(sum(timings.values()), 2)
+    app.extensions['startup_timings'] = timings
+    logger.info("App created in %.1f ms: %s", timings['total'], timings)
 
     return app
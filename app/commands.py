@@ -0,0 +1,68 @@
+import json
+import click
+
+
+def register_commands(app):
+    """Registers the maintenance and worker commands on the Flask CLI (`flask <command>`)."""
+
+    @app.cli.command('content-maintenance')
+    @click.option('--retention-days', type=int, default=None, help="Days of content to keep (default: CONTENT_RETENTION_DAYS).")
+    @click.option('--days-ahead', type=int, default=None, help="Partitions to create in advance (default: CONTENT_PARTITION_PREMAKE_DAYS).")
+    def content_maintenance(retention_days, days_ahead):
+        """Create upcoming content partitions, drop expired ones and purge old cache rows and news articles."""
+        from app.services.retention_service import run_content_maintenance
+        report = run_content_maintenance(retention_days, days_ahead)
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command('import-users')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None, help="Upload format (default: from the file extension).")
+    @click.option('--on-duplicate', type=click.Choice(['skip', 'update']), default='skip', help="Keep or update users whose email already exists.")
+    @click.option('--chunk-size', type=int, default=None, help="Rows per COPY and merge (default: IMPORT_CHUNK_SIZE).")
+    def import_users_command(path, fmt, on_duplicate, chunk_size):
+        """Bulk import users from a CSV or NDJSON file."""
+        from app.services.import_service import ImportFormatError, detect_format, import_users
+        fmt = fmt or detect_format(path)
+        if fmt is None:
+            raise click.UsageError("Cannot tell the format from the file name; pass --format.")
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            try:
+                report, error = import_users(stream, fmt, on_duplicate=on_duplicate, chunk_size=chunk_size)
+            except ImportFormatError as e:
+                raise click.ClickException(str(e))
+        click.echo(json.dumps(report, indent=2))
+        if error:
+            raise click.ClickException(error)
+        if 'stopped_at_line' in report:
+            raise click.ClickException(f"Import stopped at line {report['stopped_at_line']}")
+
+    @app.cli.command('newsletter-worker')
+    @click.option('--burst', is_flag=True, help="Exit once the queue is empty instead of polling.")
+    @click.option('--poll-interval', type=float, default=None, help="Seconds between polls of an empty queue (default: NEWSLETTER_WORKER_POLL_SECONDS).")
+    @click.option('--schedule', is_flag=True, help="Also queue the scheduled runs from NEWSLETTER_SCHEDULE.")
+    @click.option('--metrics-port', type=int, default=None, help="Serve Prometheus metrics for this worker on the given port.")
+    def newsletter_worker(burst, poll_interval, schedule, metrics_port):
+        """Claim and send queued newsletter tasks."""
+        from app.services.job_service import run_worker
+        from app.services.scheduler_service import fire_due_runs
+        if metrics_port:
+            from app.services.metrics_service import start_metrics_server
+            start_metrics_server(metrics_port)
+        processed = run_worker(burst=burst, poll_interval=poll_interval, tick=fire_due_runs if schedule else None)
+        click.echo(json.dumps({'tasks_processed': processed}))
+
+    @app.cli.command('newsletter-scheduler')
+    @click.option('--poll-interval', type=float, default=30, help="Seconds between schedule checks.")
+    @click.option('--once', is_flag=True, help="Check the schedule once and exit.")
+    def newsletter_scheduler(poll_interval, once):
+        """Queue newsletter runs at the NEWSLETTER_SCHEDULE send times."""
+        from app.services.scheduler_service import run_scheduler
+        queued = run_scheduler(poll_interval=poll_interval, once=once)
+        click.echo(json.dumps({'jobs_queued': queued}))
+
+    @app.cli.command('newsletter-warm')
+    def newsletter_warm():
+        """Fetch and cache the content every subscribed user needs ahead of a send."""
+        from app.services.main_service import warm_content_cache
+        report = warm_content_cache()
+        click.echo(json.dumps(report, indent=2))
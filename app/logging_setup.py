@@ -0,0 +1,92 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+_queue_handler = None
+_fork_hook_registered = False
+
+
+class TruncatingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for a QueueListener, cutting messages down to max_length characters.
+
+    Formatting happens on the logging thread, so messages built from API payloads or
+    rendered HTML are truncated before they are queued; the listener thread does the I/O.
+    """
+
+    def __init__(self, log_queue, max_length):
+        super().__init__(log_queue)
+        self.max_length = max_length
+
+    def prepare(self, record):
+        message = record.getMessage()
+        if self.max_length and len(message) > self.max_length:
+            message = f"{message[:self.max_length]}... [{len(message) - self.max_length} more characters]"
+        record.msg = message
+        record.args = None
+        return super().prepare(record)
+
+
+def configure_logging(app):
+    """
+    Configures the root logger once per process from LOG_LEVEL, LOG_FILE and LOG_MAX_MESSAGE_LENGTH.
+
+    Callers only pay for formatting and a queue put; a QueueListener thread writes the
+    records to stderr and, if LOG_FILE is set, to that file.
+
+    Args:
+        app (Flask): The application whose config is used.
+    """
+    global _listener, _queue_handler, _fork_hook_registered
+    if _listener is not None:
+        return
+
+    config = app.config
+    handlers = [logging.StreamHandler()]
+    if config['LOG_FILE']:
+        handlers.append(logging.FileHandler(config['LOG_FILE']))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = TruncatingQueueHandler(log_queue, config['LOG_MAX_MESSAGE_LENGTH'])
+    queue_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config['LOG_LEVEL'].upper())
+
+    _queue_handler = queue_handler
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+    atexit.register(stop_logging)
+    if not _fork_hook_registered:
+        os.register_at_fork(after_in_child=_restart_after_fork)
+        _fork_hook_registered = True
+
+
+def _restart_after_fork():
+    # Threads do not survive fork(): a gunicorn worker forked from a preloaded master would
+    # queue records nobody writes. Give the child its own queue and listener thread.
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers)
+    _listener.start()
+
+
+def stop_logging():
+    """
+    Flushes queued records and stops the listener thread; configure_logging() may run again afterwards.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
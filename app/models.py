@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import JSONB
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import ForeignKey, Date
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime, date
@@ -33,8 +34,8 @@ class SubscriptionContent(db.Model):
     __tablename__ = 'subscription_content'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     subscription_type = db.Column(db.String(50), nullable=False)  # E.g., 'WeatherUpdateNow'
-    result = db.Column(db.JSON, nullable=False)  # API response stored as JSON
-    fetch_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    result = db.Column(JSONB, nullable=False)  # API response stored as JSONB
+    fetch_date = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)  # Partition key, see retention_service
 
     def __init__(self, subscription_type, result, fetch_date=None):
         self.subscription_type = subscription_type
@@ -43,3 +44,105 @@ class SubscriptionContent(db.Model):
 
     def __repr__(self):
         return f"<SubscriptionContent {self.subscription_type} at {self.fetch_date}>"
+
+# CachedContent Model
+class CachedContent(db.Model):
+    __tablename__ = 'cached_content'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    subscription_type = db.Column(db.String(100), nullable=False)  # E.g., 'WeatherUpdateNow'
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the normalized type + arguments
+    arguments = db.Column(JSONB, nullable=False)  # Arguments the content was resolved for
+    data = db.Column(JSONB, nullable=False)  # Resolved content
+    cached_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expiration_date = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<CachedContent {self.subscription_type} {self.arguments} until {self.expiration_date}>"
+
+# WeatherLocation Model
+class WeatherLocation(db.Model):
+    """A location as users spell it, resolved once to the OpenWeatherMap city it names."""
+    __tablename__ = 'weather_locations'
+    location = db.Column(db.String(255), primary_key=True)  # weather_service.normalize_location() of the user's input
+    city_id = db.Column(db.Integer, nullable=False, index=True)  # OpenWeatherMap city ID, the weather cache key
+    name = db.Column(db.String(255), nullable=False)  # OpenWeatherMap's name for the city
+    country = db.Column(db.String(10))
+    lat = db.Column(db.Float)
+    lon = db.Column(db.Float)
+    resolved_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<WeatherLocation {self.location!r} -> {self.city_id}>"
+
+# NewsArticle Model
+class NewsArticle(db.Model):
+    __tablename__ = 'news_articles'
+    uuid = db.Column(db.String(36), primary_key=True)  # TheNewsAPI article uuid
+    title = db.Column(db.Text, nullable=False)
+    description = db.Column(db.Text)
+    snippet = db.Column(db.Text)
+    url = db.Column(db.Text, nullable=False)
+    image_url = db.Column(db.Text)
+    source = db.Column(db.String(255), index=True)
+    language = db.Column(db.String(10), nullable=False)
+    categories = db.Column(ARRAY(db.String(50)), nullable=False, default=list)
+    published_at = db.Column(db.DateTime, nullable=False)  # UTC
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_news_articles_language_published_at', 'language', db.text('published_at DESC')),
+        db.Index('ix_news_articles_categories', 'categories', postgresql_using='gin'),
+    )
+
+    def __repr__(self):
+        return f"<NewsArticle {self.uuid} {self.title!r}>"
+
+
+
+class NewsletterJob(db.Model):
+    """A queued newsletter send, split into NewsletterTask ranges of user ids."""
+    __tablename__ = 'newsletter_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_key = db.Column(db.String(100), unique=True)  # Set for scheduled runs so each one is queued once
+    start_id = db.Column(db.Integer)  # Inclusive user id range requested, None for unbounded
+    end_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True))
+
+    tasks = relationship('NewsletterTask', back_populates='job', order_by='NewsletterTask.id')
+
+    def __repr__(self):
+        return f"<NewsletterJob {self.id}>"
+
+
+class NewsletterTask(db.Model):
+    """
+    A range of user ids to send to, claimed by one worker at a time.
+
+    A claimed task is leased until locked_until; a worker that dies mid-task lets the lease
+    expire and another worker picks the task up again from last_user_id.
+    """
+    __tablename__ = 'newsletter_tasks'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_id = db.Column(db.Integer, ForeignKey('newsletter_jobs.id', ondelete='CASCADE'), nullable=False, index=True)
+    start_id = db.Column(db.Integer)
+    end_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime(timezone=True))
+    last_user_id = db.Column(db.Integer)  # Progress: every user up to here has been handled
+    sent = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), nullable=False)
+
+    job = relationship('NewsletterJob', back_populates='tasks')
+
+    __table_args__ = (
+        db.Index('ix_newsletter_tasks_claim', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f"<NewsletterTask {self.id} job={self.job_id} {self.status}>"
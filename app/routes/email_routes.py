@@ -1,11 +1,11 @@
 from flask import Blueprint, jsonify
-from app.services.email_service import send_email
-from app.models import User
 
 email_bp = Blueprint('email_bp', __name__)
 
 @email_bp.route('/send', methods=['POST'])
 def send_email_to_user():
+    from app.models import User
+    from app.services.email_service import send_email
     user = User.query.first()
     if user:
         success, message = send_email(user.email, "Subject", "Email Body")
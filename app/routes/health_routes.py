@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+from app.services.warmup_service import warm_up
+
+health_bp = Blueprint('health_bp', __name__)
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    # Readiness and warm-up: loads the services and templates and opens the database pool
+    report, error = warm_up()
+    if error:
+        return jsonify({"status": "unavailable", "error": error, **report}), 503
+    return jsonify({"status": "ready", **report}), 200
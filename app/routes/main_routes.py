@@ -1,20 +1,14 @@
-from flask import Blueprint, jsonify, render_template
-from app.services.email_service import send_email, add_email_headers, email_engine
-from app.services.user_service import get_all_users
-from app.services.weather_service import fetch_and_save_weather
-from app.services.news_service import fetch_news, fetch_source_ids
-from app.services.main_service import subscription_router
-from app.models import User
+from flask import Blueprint, jsonify, render_template, request, url_for
 import logging
-from app import db
-import os 
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 main_bp = Blueprint('main_bp', __name__)
 
+# Services are imported inside the views: importing them pulls in requests, the models and
+# the email templates, which a scale-to-zero machine should only pay for on first use
+# (or in /ready, see health_routes).
+
 @main_bp.route('/send', methods=['POST'])
 @main_bp.route('/')
 def index():
@@ -24,49 +18,45 @@ def index():
 
 @main_bp.route('/send_newsletter_to_user', methods=['POST'])
 def send_newsletter_to_user():
-    try:
-        logger.info("Attempting to retrieve users")
-        user = get_all_users()
-        if not user:  # Check if get_all_users returned None
-            logger.warning("No users found in the database")
-            return jsonify({"error": "No users found"}), 404
-
-        logger.info("User selected: %s", user) 
-        
-        # Parse subscriptions
-        user_subscriptions = user.subscriptions.get('subscriptions', [])
-        if not isinstance(user_subscriptions, list):
-            logger.error("Invalid subscriptions format: Expected a list but got %s", type(user_subscriptions))
-            return jsonify({"error": "Invalid subscriptions format"}), 400
-        
-        logger.debug("User subscriptions: %s", user_subscriptions)
-
-        # Call the subscription router to process subscriptions
-        content = subscription_router(user_subscriptions)
-        logger.debug("Generated content: %s", content)
-        
-        if not content:
-            logger.warning("No content generated for newsletter")
-            return jsonify({"error": "No content generated"}), 500
-
-        # Call email_engine to format the content and prepare HTML email
-        formatted_content = email_engine(content)
-        logger.debug("Formatted content: %s", formatted_content)
+    from app.services.job_service import enqueue_newsletter
+    from app.services.user_service import get_all_users
 
-        # Combine all subscription content into a single email body
-        html_body = "".join(html_content for html_content in formatted_content.values())
-        html_with_headers = add_email_headers({"all": html_body})["all"]  # Add headers and footers
-        
-        # Send the email
-        success, message = send_email(user.email, "Daily Newsletter", html_with_headers)
-
-        if not success:
-            logger.error("Failed to send email: %s", message)
-            return jsonify({"error": message}), 500
-
-        logger.info("Newsletter sent to user: %s", user.email)
-        return jsonify({"message": "Newsletter sent to first user successfully"}), 200
+    try:
+        # Both modes queue a job and return its id at once; `flask newsletter-worker` sends it.
+        # mode=all sends to every subscribed user, optionally limited to an id range; the
+        # default sends to the first user only, as a one-task job for that user's id.
+        if request.args.get('mode') == 'all':
+            start_id = request.args.get('start_id', type=int)
+            end_id = request.args.get('end_id', type=int)
+            message = "Newsletter queued"
+        else:
+            logger.info("Attempting to retrieve users")
+            user = get_all_users()
+            if not user:  # Check if get_all_users returned None
+                logger.warning("No users found in the database")
+                return jsonify({"error": "No users found"}), 404
+            logger.info("User selected: %s", user.id)
+            start_id = end_id = user.id
+            message = "Newsletter to first user queued"
+
+        job, error = enqueue_newsletter(start_id=start_id, end_id=end_id)
+        if error:
+            return jsonify({"error": error}), 500
+        return jsonify({
+            "message": message,
+            "job_id": job.id,
+            "status_url": url_for('main_bp.newsletter_job_status', job_id=job.id),
+        }), 202
 
     except Exception as e:
         logger.exception("An error occurred while sending newsletter: %s", str(e))
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+
+@main_bp.route('/newsletter_jobs/<int:job_id>', methods=['GET'])
+def newsletter_job_status(job_id):
+    from app.services.job_service import get_job_status
+    status = get_job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status), 200
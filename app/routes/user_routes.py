@@ -1,10 +1,12 @@
-from flask import Blueprint, request, jsonify
-from app.models import User, db
+import io
+from flask import Blueprint, current_app, request, jsonify
+from app import db
 
 user_bp = Blueprint('user_bp', __name__)
 
 @user_bp.route('/create', methods=['POST'])
 def create_user():
+    from app.models import User
     first_name = request.form['first_name']
     last_name = request.form['last_name']
     email = request.form['email']
@@ -14,3 +16,37 @@ def create_user():
     db.session.commit()
     
     return jsonify({"message": "User created successfully!"}), 201
+
+
+@user_bp.route('/import_users', methods=['POST'])
+def import_users_upload():
+    from app.services.import_service import ImportFormatError, detect_format, import_users
+
+    # A multipart upload in `file` (spooled to disk by Werkzeug), or the raw request body;
+    # either way the rows are read as a stream, never loaded whole
+    upload = request.files.get('file')
+    if upload is not None:
+        raw, fmt = upload.stream, detect_format(upload.filename, upload.content_type)
+    else:
+        raw, fmt = request.stream, detect_format(content_type=request.content_type)
+    fmt = request.args.get('format') or fmt
+    if fmt is None:
+        return jsonify({"error": "Unknown upload format; send a .csv or .ndjson file or pass ?format=csv|ndjson"}), 400
+
+    try:
+        report, error = import_users(
+            io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''),
+            fmt,
+            on_duplicate=request.args.get('on_duplicate', 'skip'),
+            # Bounded so an import fits in the web worker timeout; the CLI has no limit
+            max_records=current_app.config['IMPORT_MAX_REQUEST_RECORDS'],
+        )
+    except ImportFormatError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if error:
+        return jsonify({"error": error, **report}), 500
+    if 'stopped_at_line' in report:
+        # The rows before the unreadable part are imported; the report says where it stopped
+        return jsonify({"error": report['errors'][-1]['error'], **report}), 400
+    return jsonify(report), 200
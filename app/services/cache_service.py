@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import CachedContent
+from app.services.metrics_service import CACHE_REQUESTS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_arguments(arguments):
+    """
+    Normalizes cache arguments so equivalent requests produce the same key.
+
+    Strings are stripped and case-folded, tuples become lists, and dict keys are sorted
+    when serialized.
+
+    Args:
+        arguments: The arguments the content is resolved for (dict, list or scalar).
+
+    Returns:
+        The normalized, JSON-serializable arguments.
+    """
+    if isinstance(arguments, dict):
+        return {str(key): normalize_arguments(value) for key, value in arguments.items()}
+    if isinstance(arguments, (list, tuple)):
+        return [normalize_arguments(value) for value in arguments]
+    if isinstance(arguments, str):
+        return arguments.strip().casefold()
+    return arguments
+
+
+def make_cache_key(subscription_type, arguments):
+    """
+    Returns the sha256 hex digest identifying (subscription_type, arguments) in cached_content.
+    """
+    payload = json.dumps(
+        {'type': subscription_type, 'arguments': normalize_arguments(arguments)},
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_content(subscription_type, arguments):
+    """
+    Looks up unexpired content with a single point lookup on the unique cache_key.
+
+    Args:
+        subscription_type (str): E.g. 'WeatherUpdateNow'.
+        arguments (dict): The arguments the content was resolved for.
+
+    Returns:
+        The cached data, or None on a miss or database error.
+    """
+    cache_key = make_cache_key(subscription_type, arguments)
+    try:
+        with STAGE_SECONDS.time('cache_lookup'):
+            data = db.session.execute(
+                select(CachedContent.data).where(
+                    CachedContent.cache_key == cache_key,
+                    CachedContent.expiration_date > datetime.utcnow(),
+                )
+            ).scalar()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Cache lookup failed for %s: %s", subscription_type, e)
+        data = None
+
+    CACHE_REQUESTS.inc(subscription_type, 'miss' if data is None else 'hit')
+    return data
+
+
+def get_cached_contents(subscription_type, arguments_list):
+    """
+    Looks up many cache entries of one subscription type in a single query.
+
+    Args:
+        subscription_type (str): E.g. 'WeatherUpdateNow'.
+        arguments_list (list): The arguments of each entry.
+
+    Returns:
+        list: Cached data (or None on a miss), in the same order as arguments_list.
+    """
+    cache_keys = [make_cache_key(subscription_type, arguments) for arguments in arguments_list]
+    if not cache_keys:
+        return []
+
+    try:
+        with STAGE_SECONDS.time('cache_lookup'):
+            rows = db.session.execute(
+                select(CachedContent.cache_key, CachedContent.data).where(
+                    CachedContent.cache_key.in_(set(cache_keys)),
+                    CachedContent.expiration_date > datetime.utcnow(),
+                )
+            ).all()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Cache lookup failed for %s: %s", subscription_type, e)
+        rows = []
+
+    found = dict(rows)
+    results = [found.get(cache_key) for cache_key in cache_keys]
+    hits = sum(data is not None for data in results)
+    CACHE_REQUESTS.inc(subscription_type, 'hit', amount=hits)
+    CACHE_REQUESTS.inc(subscription_type, 'miss', amount=len(results) - hits)
+    return results
+
+
+def set_cached_content(subscription_type, arguments, data, ttl=None):
+    """
+    Upserts content into the cache with the subscription type's TTL.
+
+    Args:
+        subscription_type (str): E.g. 'WeatherUpdateNow'.
+        arguments (dict): The arguments the content was resolved for.
+        data: JSON-serializable content.
+        ttl (int): Seconds until expiry. Defaults to CACHE_TTLS[subscription_type].
+
+    Returns:
+        tuple: (success (bool), error_message (str))
+    """
+    return set_cached_contents(subscription_type, [(arguments, data)], ttl)
+
+
+def set_cached_contents(subscription_type, entries, ttl=None):
+    """
+    Upserts many cache entries of one subscription type in a single statement.
+
+    Args:
+        subscription_type (str): E.g. 'WeatherUpdateNow'.
+        entries (list): (arguments, data) tuples.
+        ttl (int): Seconds until expiry. Defaults to CACHE_TTLS[subscription_type].
+
+    Returns:
+        tuple: (success (bool), error_message (str))
+    """
+    if not entries:
+        return True, None
+
+    if ttl is None:
+        ttl = current_app.config['CACHE_TTLS'][subscription_type]
+    now = datetime.utcnow()
+    expiration_date = now + timedelta(seconds=ttl)
+
+    # One row per key; a later entry for the same key wins
+    rows = {}
+    for arguments, data in entries:
+        cache_key = make_cache_key(subscription_type, arguments)
+        rows[cache_key] = {
+            'subscription_type': subscription_type,
+            'cache_key': cache_key,
+            'arguments': normalize_arguments(arguments),
+            'data': data,
+            'cached_at': now,
+            'expiration_date': expiration_date,
+        }
+
+    statement = insert(CachedContent).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=[CachedContent.cache_key],
+        set_={
+            'arguments': statement.excluded.arguments,
+            'data': statement.excluded.data,
+            'cached_at': statement.excluded.cached_at,
+            'expiration_date': statement.excluded.expiration_date,
+        },
+    )
+
+    try:
+        db.session.execute(statement)
+        db.session.commit()
+        return True, None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Cache write failed for %s: %s", subscription_type, e)
+        return False, f"Database error: {str(e)}"
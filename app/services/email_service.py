@@ -1,59 +1,86 @@
-from flask_mail import Message
+from flask_mail import Message, sanitize_address
+from flask import current_app
 from app import mail
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from app.services.weather_service import format_HTML_weather_container
+from app.services.smtp_service import get_smtp_pool
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import quote
+import time
+from email.utils import make_msgid, parseaddr
+from app.services.weather_service import format_HTML_weather_container, DEFAULT_UNITS
 from app.services.news_service import format_HTML_news_container, normalize_news_data
+from app.services.render_service import render_static_template, FragmentCache
+from app.services.metrics_service import EMAILS, STAGE_SECONDS
 import logging
 #from sqlalchemy.engine.row import Row
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
-def email_engine(user_subscription_results):
+def email_engine(user_subscription_results, content_keys=None, fragment_cache=None, units=DEFAULT_UNITS):
     """
     Routes the subscription data to functions that return HTML formatted data.
 
     Args:
         user_subscription_results (dict): A dictionary containing the queried results and/or fetched results.
+        content_keys (dict): Optional subscription slot -> content key the data was resolved from.
+        fragment_cache (FragmentCache): Optional cache shared across users; a section with a
+            content key is rendered once and reused for every user with the same key.
+        units (str): The user's weather units. Sections that depend on them must carry them
+            in their content key.
 
     Returns:
         dict: A dictionary containing the HTML formatted containers for each subscription.
     """
-    logger.info("Started email engine.")
+    logger.debug("Started email engine.")
     formatted_results = {}
-    logger.debug("Raw subscription data received: %s", user_subscription_results)
+    content_keys = content_keys or {}
 
     for key, data in user_subscription_results.items():
-        if key == 'weather':
-            # Process weather data directly as a dictionary
-            if isinstance(data, dict):
-                logger.debug("Processing weather data: %s", data)
-                try:
-                    formatted_results[key] = format_HTML_weather_container(data)
-                except Exception as e:
-                    logger.error("Error formatting weather container: %s", e)
-                    formatted_results[key] = "<div>Error formatting weather data.</div>"
-            else:
-                logger.warning("Unexpected data type for weather: %s", type(data))
-                formatted_results[key] = "<div>Invalid weather data format.</div>"
-        elif key == 'news':
-            logger.debug("Raw news data received: %s", data)
-            try:
-                normalized_news_data = normalize_news_data(data)
-                formatted_results[key] = format_HTML_news_container(normalized_news_data)
-            except Exception as e:
-                logger.error("Error formatting news container: %s", e)
-                formatted_results[key] = "<div>Error formatting news data.</div>"
+        content_key = content_keys.get(key)
+        if fragment_cache is not None and content_key is not None:
+            formatted_results[key] = fragment_cache.get_or_render(key, content_key, lambda: format_section(key, data, units))
         else:
-            logger.warning("Unknown subscription type: %s", key)
+            formatted_results[key] = format_section(key, data, units)
 
-    logger.info("Email engine successfully formatted results.")
+    logger.debug("Email engine successfully formatted results.")
     return formatted_results
 
+
+def format_section(key, data, units=DEFAULT_UNITS):
+    """
+    Formats the data for one subscription slot into its HTML container.
+
+    Args:
+        key (str): The subscription slot, 'weather' or 'news'.
+        data: The resolved content for the slot.
+        units (str): The units weather is displayed in.
+
+    Returns:
+        str: The HTML container, or an error placeholder.
+    """
+    if key == 'weather':
+        # Process weather data directly as a dictionary
+        if isinstance(data, dict):
+            try:
+                return format_HTML_weather_container(data, units)
+            except Exception as e:
+                logger.error("Error formatting weather container: %s", e)
+                return "<div>Error formatting weather data.</div>"
+        logger.warning("Unexpected data type for weather: %s", type(data))
+        return "<div>Invalid weather data format.</div>"
+
+    if key == 'news':
+        try:
+            normalized_news_data = normalize_news_data(data)
+            return format_HTML_news_container(normalized_news_data)
+        except Exception as e:
+            logger.error("Error formatting news container: %s", e)
+            return "<div>Error formatting news data.</div>"
+
+    logger.warning("Unknown subscription type: %s", key)
+    return ""
+
         
 def add_email_headers(html_formatted_user_subscription_results):
     """
@@ -66,106 +93,171 @@ def add_email_headers(html_formatted_user_subscription_results):
         dict: A dictionary containing the HTML formatted email body with proper headers.
     """
     email_with_headers = {}
+    with STAGE_SECONDS.time('add_email_headers'):
+        header = render_static_template('header.html')
+        footer = render_static_template('footer.html')
 
+        # Adding headers and footers to the content
+        for key, content in html_formatted_user_subscription_results.items():
+            email_with_headers[key] = f"{header}{content}{footer}"
 
-    # Header inspired by James Clear's design
-    header = """
-    <html>
-        <head>
-            <style>
-                body {
-                    font-family: 'Tahoma', sans-serif;
-                    color: #333333;
-                    background-color: #FAFAFA;
-                    margin: 0;
-                    padding: 0;
-                }
-                .header-container {
-                    text-align: center;
-                    background-color: #F9F7F5;
-                    padding: 30px 0;
-                    border-bottom: 1px solid #EAEAEA;
-                }
-                .header-title {
-                    font-size: 24px;
-                    font-weight: bold;
-                    margin: 0;
-                    color: #222222;
-                }
-                .header-subtitle {
-                    font-size: 14px;
-                    color: #666666;
-                    margin: 5px 0 0;
-                }
-                .content-container {
-                    background-color: #FFFFFF;
-                    margin: 20px auto;
-                    padding: 30px;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-                    max-width: 600px;
-                    font-family: 'Tahoma', sans-serif;
-                }
-                h1 {
-                    font-size: 22px;
-                    font-weight: bold;
-                    margin-top: 0;
-                    color: #222222;
-                }
-                p {
-                    font-size: 16px;
-                    line-height: 1.6;
-                    color: #555555;
-                }
-                .footer {
-                    text-align: center;
-                    padding: 20px 0;
-                    color: #999999;
-                    font-size: 12px;
-                }
-                .footer a {
-                    color: #888888;
-                    text-decoration: none;
-                }
-                .footer a:hover {
-                    text-decoration: underline;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="header-container">
-                <h1 class="header-title">Today's Newsletter</h1>
-                <p class="header-subtitle">"Content delivered, daily."</p>
-            </div>
-    """
-    
-    # Footer
-    footer = """
-            <div class="footer">
-                <p>You're receiving this email because you subscribed to our newsletter.</p>
-                <p>
-                    <a href="#">Unsubscribe</a> | 
-                    <a href="#">Manage Preferences</a>
-                </p>
-            </div>
-        </body>
-    </html>
-    """
-
-    # Adding headers and footers to the content
-    for key, content in html_formatted_user_subscription_results.items():
-        email_with_headers[key] = f"{header}{content}{footer}"
-
-    logger.info("Added headers and footers to email content.")
+    logger.debug("Added headers and footers to email content.")
     return email_with_headers
 
 
+def render_newsletter(user_subscription_results, content_keys=None, fragment_cache=None, units=DEFAULT_UNITS):
+    """
+    Renders the complete newsletter by concatenating the header, each subscription
+    container and the footer.
+
+    Args:
+        user_subscription_results (dict): A dictionary containing the queried results and/or fetched results.
+        content_keys (dict): Optional subscription slot -> content key, see email_engine().
+        fragment_cache (FragmentCache): Optional cache of rendered sections shared across users.
+        units (str): The user's weather units, see email_engine().
+
+    Returns:
+        str: The HTML email body.
+    """
+    # Timed inline rather than with STAGE_SECONDS.time(): this runs once per user
+    started = time.perf_counter()
+    sections = email_engine(user_subscription_results, content_keys, fragment_cache, units)
+    rendered = time.perf_counter()
+    html = "".join([render_static_template('header.html'), *sections.values(), render_static_template('footer.html')])
+    STAGE_SECONDS.observe(rendered - started, 'email_engine')
+    STAGE_SECONDS.observe(time.perf_counter() - rendered, 'add_email_headers')
+    return html
+
 
 def send_email(to, subject, html_content):
     try:
-        msg = Message(subject, recipients=[to])
-        msg.html = html_content
-        mail.send(msg)
+        if current_app.extensions['mail'].suppress:
+            with STAGE_SECONDS.time('send_email'):
+                mail.send(build_message(to, subject, html_content))  # Testing / MAIL_SUPPRESS_SEND: record the message without connecting
+        else:
+            sender, payload = build_payload(subject, html_content)
+            get_smtp_pool().send(sender, [to], address_payload(payload, to, msgid_domain(sender)))
+        EMAILS.inc('sent')
         return True, "Email sent successfully"
     except Exception as e:
-        return False, str(e)
\ No newline at end of file
+        EMAILS.inc('failed')
+        return False, str(e)
+
+
+def send_bulk_emails(messages, payload_cache=None):
+    """
+    Sends many emails concurrently over the pooled SMTP connections.
+
+    Each distinct (subject, body) is serialized to MIME bytes once; every recipient gets
+    those bytes with their own To, Message-ID and List-Unsubscribe headers prepended.
+    Messages are prepared in the calling thread (which holds the app context), then
+    handed to one worker per pooled connection.
+
+    Args:
+        messages (list): (to, subject, html_content) tuples.
+        payload_cache (FragmentCache): Optional cache of serialized payloads that outlives
+            this call, e.g. one per newsletter run. Defaults to a cache for this call only.
+
+    Returns:
+        list: (success (bool), message (str)) tuples, in the same order as messages.
+    """
+    if current_app.extensions['mail'].suppress:
+        return [send_email(to, subject, html_content) for to, subject, html_content in messages]
+
+    pool = get_smtp_pool()
+    own_cache = payload_cache is None
+    if own_cache:
+        payload_cache = FragmentCache(max(len(messages), 1), name='payload')
+
+    def _send(prepared):
+        if isinstance(prepared, Exception):
+            EMAILS.inc('failed')
+            return False, str(prepared)
+        try:
+            pool.send(*prepared)
+            EMAILS.inc('sent')
+            return True, "Email sent successfully"
+        except Exception as e:
+            EMAILS.inc('failed')
+            return False, str(e)
+
+    prepared = []
+    for to, subject, html_content in messages:
+        try:
+            sender, payload = payload_cache.get_or_render(
+                'payload', (subject, html_content), lambda: build_payload(subject, html_content))
+            prepared.append((sender, [to], address_payload(payload, to, msgid_domain(sender))))
+        except Exception as e:
+            prepared.append(e)
+    if own_cache:
+        payload_cache.publish_metrics()
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        return list(executor.map(_send, prepared))
+
+
+def build_message(to, subject, html_content):
+    msg = Message(subject, recipients=[to])
+    msg.html = html_content
+    unsubscribe = unsubscribe_url(to)
+    if unsubscribe:
+        msg.extra_headers = {'List-Unsubscribe': f"<{unsubscribe}>"}
+    return msg
+
+
+def build_payload(subject, html_content):
+    """
+    Serializes everything about a message that does not depend on the recipient.
+
+    Args:
+        subject (str): The email subject.
+        html_content (str): The HTML body.
+
+    Returns:
+        tuple: (envelope_sender (str), payload (bytes)), the payload being the MIME message
+            without To and Message-ID headers.
+    """
+    msg = Message(subject, html=html_content)
+    mime = msg._message()
+    del mime['To']
+    del mime['Message-ID']
+    return sanitize_address(msg.sender), mime.as_bytes()
+
+
+def address_payload(payload, to, domain=None):
+    """
+    Prepends the per-recipient headers to a payload from build_payload().
+
+    Args:
+        payload (bytes): The serialized, recipient-independent message.
+        to (str): The recipient address.
+        domain (str): Domain for the Message-ID, see msgid_domain().
+
+    Returns:
+        bytes: The complete message, ready for SMTP.
+    """
+    headers = f"To: {sanitize_address(to)}\r\nMessage-ID: {make_msgid(domain=domain)}\r\n"
+    unsubscribe = unsubscribe_url(to)
+    if unsubscribe:
+        headers += f"List-Unsubscribe: <{unsubscribe}>\r\n"
+    return headers.encode('utf-8') + payload
+
+
+def unsubscribe_url(to):
+    """
+    Returns the recipient's unsubscribe link from UNSUBSCRIBE_URL, or None if it is not configured.
+    """
+    template = current_app.config.get('UNSUBSCRIBE_URL')
+    if not template:
+        return None
+    return template.format(email=quote(to, safe='@'))
+
+
+@lru_cache(maxsize=16)
+def msgid_domain(sender):
+    """
+    Returns the sender's domain, used for Message-IDs so make_msgid() does not look up the
+    host name for every message.
+    """
+    _, address = parseaddr(sender)
+    return address.rpartition('@')[2] or None
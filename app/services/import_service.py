@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+import logging
+import re
+import time
+import psycopg2
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson')
+ON_DUPLICATE = ('skip', 'update')
+
+# Same limits as the users columns
+NAME_LENGTHS = {'first_name': 20, 'last_name': 200}
+EMAIL_LENGTH = 255
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+STAGING_COLUMNS = ('line', 'first_name', 'last_name', 'email', 'subscriptions')
+
+# Created, filled and merged inside one transaction, so it also works through the
+# pgbouncer transaction pooler, where session state does not outlive a transaction
+CREATE_STAGING = text("""
+    CREATE TEMP TABLE user_import_staging (
+        line integer NOT NULL,
+        first_name varchar(20) NOT NULL,
+        last_name varchar(200) NOT NULL,
+        email varchar(255) NOT NULL,
+        subscriptions jsonb NOT NULL
+    ) ON COMMIT DROP
+""")
+
+# The last row wins when a chunk repeats an email. RETURNING (xmax = 0) is true for
+# inserted rows and false for rows an ON CONFLICT DO UPDATE touched.
+MERGE = """
+    INSERT INTO users (first_name, last_name, email, subscriptions, created_at)
+    SELECT DISTINCT ON (email) first_name, last_name, email, subscriptions, now()
+    FROM user_import_staging
+    ORDER BY email, line DESC
+    ON CONFLICT (email) DO {action}
+    RETURNING (xmax = 0) AS inserted
+"""
+MERGE_ACTIONS = {
+    'skip': "NOTHING",
+    'update': "UPDATE SET first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name, "
+              "subscriptions = EXCLUDED.subscriptions",
+}
+
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be read as the requested format at all."""
+
+
+def detect_format(filename=None, content_type=None):
+    """
+    Guesses the upload format from a file name or content type.
+
+    Returns:
+        str or None: 'csv', 'ndjson', or None if neither says.
+    """
+    filename = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if filename.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    if filename.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    return None
+
+
+def iter_records(stream, fmt):
+    """
+    Reads an upload one record at a time.
+
+    Args:
+        stream: A text stream, e.g. an open file or a TextIOWrapper around a request body.
+        fmt (str): 'csv' (with a header row) or 'ndjson'.
+
+    Yields:
+        tuple: (line_number (int), record (dict) or None, error_message (str))
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None:
+            return
+        missing = {'first_name', 'last_name', 'email'} - set(reader.fieldnames)
+        if missing:
+            raise ImportFormatError(f"CSV header is missing {', '.join(sorted(missing))}")
+        for record in reader:
+            yield reader.line_num, record, None
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, record, None
+    else:
+        raise ImportFormatError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def validate_record(record):
+    """
+    Checks one record and converts it to a users row.
+
+    Subscriptions may be a {'subscriptions': [...]} object, a bare list of subscriptions,
+    or either of those as a JSON string (as in a CSV column). A missing value means none.
+
+    Returns:
+        tuple: (row (dict) or None, error_message (str))
+    """
+    row = {}
+    for field, max_length in NAME_LENGTHS.items():
+        value = record.get(field)
+        value = value.strip() if isinstance(value, str) else ''
+        if not value:
+            return None, f"{field} is required"
+        if len(value) > max_length:
+            return None, f"{field} is longer than {max_length} characters"
+        row[field] = value
+
+    email = record.get('email')
+    email = email.strip() if isinstance(email, str) else ''
+    if not EMAIL_PATTERN.match(email) or len(email) > EMAIL_LENGTH:
+        return None, "email is missing or invalid"
+    row['email'] = email
+
+    subscriptions = record.get('subscriptions')
+    if isinstance(subscriptions, str):
+        if subscriptions.strip():
+            try:
+                subscriptions = json.loads(subscriptions)
+            except ValueError as e:
+                return None, f"subscriptions is not valid JSON: {e}"
+        else:
+            subscriptions = None
+    if subscriptions is None:
+        subscriptions = {}
+    elif isinstance(subscriptions, list):
+        subscriptions = {'subscriptions': subscriptions}
+    if not isinstance(subscriptions, dict):
+        return None, "subscriptions must be an object or a list"
+
+    items = subscriptions.get('subscriptions', [])
+    if not isinstance(items, list) or not all(isinstance(sub, dict) and isinstance(sub.get('name'), str) for sub in items):
+        return None, "each subscription must be an object with a name"
+    row['subscriptions'] = subscriptions
+    return row, None
+
+
+def import_users(stream, fmt, on_duplicate='skip', chunk_size=None, max_records=None):
+    """
+    Streams users from a CSV or NDJSON upload into the users table.
+
+    Records are validated in chunks of chunk_size. Each chunk is written with COPY into a
+    temporary staging table and merged into users with INSERT ... ON CONFLICT (email) in
+    one transaction, so memory stays flat and a 200k-row upload takes a few hundred round
+    trips instead of one per user.
+
+    Args:
+        stream: A text stream of the upload.
+        fmt (str): 'csv' or 'ndjson'.
+        on_duplicate (str): 'skip' keeps existing users as they are; 'update' replaces their
+            names and subscriptions with the uploaded ones.
+        chunk_size (int): Records per COPY and merge. Defaults to IMPORT_CHUNK_SIZE.
+        max_records (int): Optional number of records to read at most; the import stops at
+            the next one as if the upload stopped being readable there.
+
+    Returns:
+        tuple: (report (dict), error_message (str)). The report counts accepted (inserted),
+            duplicate (email already present or repeated in the upload; updated in 'update'
+            mode) and rejected (invalid) records, and lists the first IMPORT_MAX_REPORTED_ERRORS
+            rejections with their line numbers. On a database error the report covers the
+            chunks committed before it. If the upload stops being readable (a CSV header
+            lacking required columns, bytes that are not UTF-8), the records read so far are
+            still imported, the failure is reported as a rejection and stopped_at_line is set.
+
+    Raises:
+        ImportFormatError: If the format or on_duplicate is unknown.
+    """
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if on_duplicate not in ON_DUPLICATE:
+        raise ImportFormatError(f"Unknown on_duplicate {on_duplicate!r}, expected one of {', '.join(ON_DUPLICATE)}")
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    max_errors = current_app.config['IMPORT_MAX_REPORTED_ERRORS']
+
+    started = time.perf_counter()
+    report = {'accepted': 0, 'duplicate': 0, 'rejected': 0, 'chunks': 0, 'errors': []}
+
+    def reject(line_number, error):
+        report['rejected'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'line': line_number, 'error': error})
+
+    def stop(line_number, error):
+        # Listed even past IMPORT_MAX_REPORTED_ERRORS: it is why the rest was not read
+        report['rejected'] += 1
+        report['errors'].append({'line': line_number, 'error': error})
+        report['stopped_at_line'] = line_number
+        logger.warning("User import stopped at line %d: %s", line_number, error)
+
+    chunk, line_number, read = [], 0, 0
+    records = iter_records(stream, fmt)
+    while True:
+        # The CSV header is checked and the upload decoded as the records are read,
+        # so a bad header or bad bytes surface here rather than when the import starts
+        try:
+            line_number, record, error = next(records)
+        except StopIteration:
+            break
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            # Text streams decode a block at a time, so bad bytes are only known to come
+            # somewhere after the last record read
+            if isinstance(e, UnicodeDecodeError):
+                stop(line_number + 1, f"Upload is not valid UTF-8 after line {line_number}: {e}")
+            else:
+                stop(line_number + 1, str(e))
+            break
+        if max_records is not None and read >= max_records:
+            stop(line_number, f"Upload has more than {max_records} records; import larger files with `flask import-users`")
+            break
+        read += 1
+        if record is not None:
+            row, error = validate_record(record)
+        if error:
+            reject(line_number, error)
+            continue
+        row['line'] = line_number
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            error = _merge_chunk(chunk, on_duplicate, report)
+            if error:
+                return report, error
+            chunk = []
+
+    if chunk:
+        error = _merge_chunk(chunk, on_duplicate, report)
+        if error:
+            return report, error
+
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    logger.info("Imported users: %d accepted, %d duplicate, %d rejected in %.3fs",
+                report['accepted'], report['duplicate'], report['rejected'], report['elapsed_seconds'])
+    return report, None
+
+
+def _merge_chunk(rows, on_duplicate, report):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['line'], row['first_name'], row['last_name'], row['email'],
+                         json.dumps(row['subscriptions'], separators=(',', ':'))])
+    buffer.seek(0)
+
+    try:
+        connection = db.session.connection()
+        connection.execute(CREATE_STAGING)
+        cursor = connection.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY user_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        inserted = connection.execute(text(MERGE.format(action=MERGE_ACTIONS[on_duplicate]))).scalars().all()
+        db.session.commit()
+    except (SQLAlchemyError, psycopg2.Error) as e:
+        db.session.rollback()
+        logger.error("User import failed: Database error: %s", str(e))
+        return f"Database error: {str(e)}"
+
+    accepted = sum(inserted)
+    report['accepted'] += accepted
+    report['duplicate'] += len(rows) - accepted
+    report['chunks'] += 1
+    return None
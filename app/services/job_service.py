@@ -0,0 +1,335 @@
+import logging
+import math
+import os
+import socket
+import time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import NewsletterJob, NewsletterTask
+from app.services.main_service import run_newsletter
+from app.services.user_service import count_subscribed_users, split_subscribed_users
+
+logger = logging.getLogger(__name__)
+
+# Task statuses; queued and running tasks still have work left
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class LeaseLost(Exception):
+    """Raised when a worker's lease on a task expired and another worker may have claimed it."""
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_newsletter(start_id=None, end_id=None, run_key=None, window_seconds=0):
+    """
+    Queues a newsletter send to every subscribed user in an id range.
+
+    The range is split into tasks of NEWSLETTER_TASK_SIZE users so several workers can
+    share one send. With a send window, task i of n becomes available window_seconds * i / n
+    after now, spreading delivery over the window instead of sending in one burst. Tasks are
+    then made small enough for one to start about every NEWSLETTER_SEND_WINDOW_STEP_SECONDS,
+    so a run smaller than NEWSLETTER_TASK_SIZE is spread too.
+
+    Args:
+        start_id (int): Lowest user id to send to (inclusive).
+        end_id (int): Highest user id to send to (inclusive).
+        run_key (str): Optional unique name for the run, e.g. 'daily:2024-11-25T07:00'. A run
+            key that was already queued (by this or another instance) queues nothing.
+        window_seconds (int): Seconds to spread the tasks over.
+
+    Returns:
+        tuple: (job (NewsletterJob), error_message (str)); job is None if run_key was already queued.
+    """
+    try:
+        job_id = db.session.execute(
+            insert(NewsletterJob)
+            .values(run_key=run_key, start_id=start_id, end_id=end_id)
+            .on_conflict_do_nothing(index_elements=[NewsletterJob.run_key])
+            .returning(NewsletterJob.id)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            logger.info("Newsletter run %s was already queued", run_key)
+            return None, None
+
+        task_size = current_app.config['NEWSLETTER_TASK_SIZE']
+        if window_seconds:
+            buckets = max(1, int(window_seconds // current_app.config['NEWSLETTER_SEND_WINDOW_STEP_SECONDS']))
+            users = count_subscribed_users(start_id, end_id)
+            task_size = max(1, min(task_size, math.ceil(users / buckets)))
+        ranges = split_subscribed_users(start_id, end_id, task_size)
+        db.session.add_all([
+            NewsletterTask(
+                job_id=job_id, start_id=first_id, end_id=last_id, status=QUEUED, attempts=0, sent=0, failed=0,
+                available_at=func.now() + timedelta(seconds=window_seconds * index / len(ranges)),
+            )
+            for index, (first_id, last_id) in enumerate(ranges)
+        ])
+        if not ranges:
+            # Nobody to send to
+            db.session.execute(update(NewsletterJob).where(NewsletterJob.id == job_id).values(finished_at=func.now()))
+        db.session.commit()
+        logger.info("Queued newsletter job %s with %d tasks over %ds", job_id, len(ranges), window_seconds)
+        return db.session.get(NewsletterJob, job_id), None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Queueing newsletter failed: Database error: %s", str(e))
+        return None, f"Database error: {str(e)}"
+
+
+def claim_task(worker):
+    """
+    Claims the next available task for a worker.
+
+    Queued tasks whose available_at has passed and running tasks whose lease expired are
+    both claimable; SKIP LOCKED lets concurrent workers claim different tasks without
+    waiting on each other. Expired tasks that used up NEWSLETTER_MAX_ATTEMPTS are failed
+    instead of claimed.
+
+    Args:
+        worker (str): Name of the claiming worker, see worker_name().
+
+    Returns:
+        NewsletterTask or None: The claimed task, leased for NEWSLETTER_VISIBILITY_TIMEOUT seconds.
+    """
+    config = current_app.config
+    now = func.now()
+    expired = and_(NewsletterTask.status == RUNNING, NewsletterTask.locked_until < now)
+
+    failed_job_ids = db.session.execute(
+        update(NewsletterTask)
+        .where(expired, NewsletterTask.attempts >= config['NEWSLETTER_MAX_ATTEMPTS'])
+        .values(status=FAILED, locked_by=None, locked_until=None, updated_at=now,
+                error=func.coalesce(NewsletterTask.error, 'Lease expired on the last attempt'))
+        .returning(NewsletterTask.job_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    close_finished_jobs(set(failed_job_ids))
+
+    candidate = (
+        select(NewsletterTask.id)
+        .where(or_(and_(NewsletterTask.status == QUEUED, NewsletterTask.available_at <= now), expired))
+        .order_by(NewsletterTask.available_at, NewsletterTask.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    task = db.session.execute(
+        update(NewsletterTask)
+        .where(NewsletterTask.id == candidate)
+        .values(
+            status=RUNNING,
+            attempts=NewsletterTask.attempts + 1,
+            locked_by=worker,
+            locked_until=now + timedelta(seconds=config['NEWSLETTER_VISIBILITY_TIMEOUT']),
+            updated_at=now,
+        )
+        .returning(NewsletterTask)
+        .execution_options(synchronize_session=False)
+    ).scalars().first()
+    db.session.commit()
+    return task
+
+
+def record_progress(task_id, worker, last_user_id, sent, failed):
+    """
+    Records a sent batch and extends the worker's lease on the task.
+
+    Raises:
+        LeaseLost: If the task is no longer leased to this worker.
+    """
+    result = db.session.execute(
+        update(NewsletterTask)
+        .where(NewsletterTask.id == task_id, NewsletterTask.locked_by == worker, NewsletterTask.status == RUNNING)
+        .values(
+            last_user_id=last_user_id,
+            sent=NewsletterTask.sent + sent,
+            failed=NewsletterTask.failed + failed,
+            locked_until=func.now() + timedelta(seconds=current_app.config['NEWSLETTER_VISIBILITY_TIMEOUT']),
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount == 0:
+        raise LeaseLost(f"Task {task_id} is no longer leased to {worker}")
+
+
+def finish_task(task_id, worker, error=None):
+    """
+    Marks a task done, or on error re-queues it after NEWSLETTER_RETRY_DELAY seconds until
+    NEWSLETTER_MAX_ATTEMPTS is reached. Closes the job once its last task finishes.
+    """
+    config = current_app.config
+    task = db.session.get(NewsletterTask, task_id, populate_existing=True)
+    if task is None or task.locked_by != worker or task.status != RUNNING:
+        db.session.rollback()
+        logger.warning("Task %s is no longer leased to %s, not finishing it", task_id, worker)
+        return
+
+    if error is None:
+        task.status = DONE
+    elif task.attempts < config['NEWSLETTER_MAX_ATTEMPTS']:
+        task.status = QUEUED
+        task.available_at = func.now() + timedelta(seconds=config['NEWSLETTER_RETRY_DELAY'] * task.attempts)
+    else:
+        task.status = FAILED
+    task.error = error
+    task.locked_by = None
+    task.locked_until = None
+    task.updated_at = func.now()
+    db.session.flush()
+
+    close_finished_jobs([task.job_id])
+    db.session.commit()
+
+
+def close_finished_jobs(job_ids):
+    """
+    Sets finished_at on those of the given jobs that have no queued or running tasks left.
+    Runs in the caller's transaction.
+    """
+    if not job_ids:
+        return
+    open_jobs = select(NewsletterTask.job_id).where(NewsletterTask.status.in_([QUEUED, RUNNING]))
+    db.session.execute(
+        update(NewsletterJob)
+        .where(NewsletterJob.id.in_(list(job_ids)), NewsletterJob.finished_at.is_(None), NewsletterJob.id.not_in(open_jobs))
+        .values(finished_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def process_task(task, worker):
+    """
+    Sends the newsletter for one claimed task, resuming after the task's last_user_id.
+
+    Delivery is at-least-once: a batch sent just before a crash, but not yet recorded,
+    is sent again by the next worker to claim the task.
+
+    Returns:
+        dict: The run report from run_newsletter().
+    """
+    start_id = task.last_user_id + 1 if task.last_user_id is not None else task.start_id
+    task_id = task.id
+    logger.info("Worker %s processing task %s (users %s..%s, attempt %d)", worker, task_id, start_id, task.end_id, task.attempts)
+
+    try:
+        report = run_newsletter(
+            start_id=start_id,
+            end_id=task.end_id,
+            on_batch=lambda last_id, sent, failed: record_progress(task_id, worker, last_id, sent, failed),
+        )
+    except LeaseLost as e:
+        logger.warning("%s, abandoning it", e)
+        return None
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Task %s failed", task_id)
+        finish_task(task_id, worker, error=str(e))
+        return None
+
+    finish_task(task_id, worker)
+    return report
+
+
+def run_worker(worker=None, burst=False, poll_interval=None, tick=None):
+    """
+    Claims and processes newsletter tasks until stopped.
+
+    An error in an iteration (a pooler restart, a failed statement) is logged, its
+    transaction rolled back and the loop carries on after poll_interval: tasks leased at
+    the time are retried once their lease expires, so the worker only has to stay up.
+
+    Args:
+        worker (str): Worker name. Defaults to worker_name().
+        burst (bool): Exit once no task is claimable instead of polling. Errors are
+            raised instead of retried, so a one-off run does not poll a broken database forever.
+        poll_interval (float): Seconds to wait when the queue is empty. Defaults to
+            NEWSLETTER_WORKER_POLL_SECONDS.
+        tick (callable): Optional function called before every claim, e.g. the scheduler's
+            fire_due_runs() so workers also queue scheduled runs.
+
+    Returns:
+        int: The number of tasks processed.
+    """
+    worker = worker or worker_name()
+    poll_interval = poll_interval if poll_interval is not None else current_app.config['NEWSLETTER_WORKER_POLL_SECONDS']
+    processed = 0
+    logger.info("Newsletter worker %s started", worker)
+
+    while True:
+        try:
+            if tick is not None:
+                tick()
+            task = claim_task(worker)
+            if task is not None:
+                process_task(task, worker)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Newsletter worker %s iteration failed", worker)
+            if burst:
+                raise
+            time.sleep(poll_interval)
+            continue
+
+        if task is None:
+            if burst:
+                logger.info("Newsletter worker %s found no work, exiting", worker)
+                return processed
+            time.sleep(poll_interval)
+            continue
+        processed += 1
+
+
+def get_job_status(job_id):
+    """
+    Summarizes a newsletter job's progress from its tasks.
+
+    Returns:
+        dict or None: Job status with task counts by status and sent/failed user counts,
+            or None if the job does not exist.
+    """
+    job = db.session.get(NewsletterJob, job_id)
+    if job is None:
+        return None
+
+    rows = db.session.execute(
+        select(NewsletterTask.status, func.count(), func.coalesce(func.sum(NewsletterTask.sent), 0),
+               func.coalesce(func.sum(NewsletterTask.failed), 0))
+        .where(NewsletterTask.job_id == job_id)
+        .group_by(NewsletterTask.status)
+    ).all()
+
+    tasks = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+    sent = failed = 0
+    for status, count, task_sent, task_failed in rows:
+        tasks[status] = count
+        sent += task_sent
+        failed += task_failed
+
+    if job.finished_at is not None:
+        status = FAILED if tasks[FAILED] else 'completed'
+    elif tasks[RUNNING] or tasks[DONE] or tasks[FAILED]:
+        status = RUNNING
+    else:
+        status = QUEUED
+
+    return {
+        'job_id': job.id,
+        'status': status,
+        'start_id': job.start_id,
+        'end_id': job.end_id,
+        'tasks': tasks,
+        'sent': sent,
+        'failed': failed,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -1,73 +1,577 @@
-import requests
-from app.models import User, SubscriptionContent
-from datetime import datetime, time
-from app.services.weather_service import fetch_and_save_weather, fetch_weather_from_db_raw
+from app.services.weather_service import fetch_and_save_weather_batch, get_weather_locations, normalize_units
 from app.services.news_service import fetch_news, fetch_news_from_db_raw
-import os
+from app.services.email_service import send_email, send_bulk_emails, render_newsletter
+from app.services.user_service import iter_subscribed_users, distinct_subscriptions
+from app.services.upstream_service import run_alongside, run_concurrently, get_upstream_stats
+from app.services.cache_service import get_cached_content, get_cached_contents, set_cached_content, set_cached_contents
+from app.services.render_service import FragmentCache
+from app.services.metrics_service import STAGE_SECONDS
+from flask import current_app
+import time
+from functools import partial
 from app import db 
 import logging
 
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def subscription_router(user_subscriptions):
+# Results slot each subscription type fills in the router output
+SUBSCRIPTION_SLOTS = {
+    'WeatherUpdateNow': 'weather',
+    'NewsTopStories': 'news',
+}
+
+
+def normalize_categories(categories):
+    """
+    Normalizes news categories into a sorted tuple so equal category sets share a key.
+
+    Args:
+        categories (str or list): A comma-separated string or a list of categories.
+
+    Returns:
+        tuple: Sorted, de-duplicated category names.
+    """
+    if not categories:
+        categories = ['general']
+    elif isinstance(categories, str):
+        categories = categories.split(',')
+    return tuple(sorted({c.strip() for c in categories if c and c.strip()}))
+
+
+def content_key(sub):
+    """
+    Returns the hashable key identifying the content a subscription needs.
+
+    Users whose subscriptions produce the same key receive the same content, so each
+    key only has to be resolved once per run.
+
+    Args:
+        sub (dict): A single subscription from the user's subscriptions list.
+
+    Returns:
+        tuple or None: The content key, or None for unknown subscription types.
+    """
+    details = sub.get('details') or {}
+
+    if sub.get('name') == 'WeatherUpdateNow':
+        # Units are left out: weather is cached in canonical units and converted when rendered
+        return ('WeatherUpdateNow', details.get('location'))
+
+    if sub.get('name') == 'NewsTopStories':
+        language = details.get('language', 'en')
+        categories = normalize_categories(details.get('categories', 'general'))
+        limit = normalize_limit(details.get('limit'))  # this represents the number of articles the user wants to recieve.
+        return ('NewsTopStories', language, categories, limit)
+
+    return None
+
+
+def normalize_limit(limit):
+    """
+    Returns a news limit as a positive int, or None if the subscription does not set a usable one.
+    """
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+def news_feed_key(key):
+    """
+    Returns the key of the news feed a NewsTopStories content key is sliced from.
+
+    Users who read the same language and categories share one feed, fetched and cached at
+    the largest limit any of them wants, whatever their own limits are.
+    """
+    _, language, categories, _ = key
+    return ('NewsTopStories', language, categories)
+
+
+def weather_units(user_subscriptions):
+    """
+    Returns the units a user's weather is displayed in, from their WeatherUpdateNow subscription.
+    """
+    for sub in user_subscriptions:
+        if sub.get('name') == 'WeatherUpdateNow':
+            return normalize_units((sub.get('details') or {}).get('units'))
+    return normalize_units(None)
+
+
+def cache_arguments(key):
+    """
+    Returns the content cache arguments a content key is stored under.
+
+    Weather keys have none of their own: weather is cached per city, see weather_cache_arguments().
+    """
+    if key[0] == 'NewsTopStories':
+        # News content keys and the feed keys they are sliced from share one cache entry
+        return {'language': key[1], 'categories': key[2]}
+    raise ValueError(f"Unknown content key: {key!r}")
+
+
+def weather_cache_arguments(city_id):
+    """
+    Returns the content cache arguments a city's weather is stored under.
+
+    Keyed by the OpenWeatherMap city ID a location resolves to rather than by the location
+    as typed, so every spelling of a city shares one entry.
+    """
+    return {'city_id': city_id}
+
+
+def resolve_news_feed(feed_key, limit, check_cache=True):
+    """
+    Resolves a news feed with at least limit articles from the content cache, the article
+    store or the upstream API, in that order, and caches it.
+
+    Args:
+        feed_key (tuple): A key produced by news_feed_key().
+        limit (int): The most articles any reader of the feed wants.
+        check_cache (bool): False when the caller already looked the feed up in the cache.
+
+    Returns:
+        The feed, with the limit it was resolved for under 'fetched_limit', or an error placeholder.
+    """
+    _, language, categories = feed_key
+    arguments = cache_arguments(feed_key)
+    logger.debug("Fetching news for language: %s, limit: %s, categories: %s", language, limit, categories)
+
+    # Check the content cache for existing data
+    news_content = get_cached_content('NewsTopStories', arguments) if check_cache else None
+    if news_feed_covers(news_content, limit):
+        logger.info("News data fetched from cache.")
+        return news_content
+
+    # Then today's articles already in the article store
+    with STAGE_SECONDS.time('db_lookup'):
+        news_content, error = fetch_news_from_db_raw(language, list(categories), limit)
+    if news_content and len(news_content['data']) >= limit:
+        logger.info("News data fetched from article store.")
+        news_content['fetched_limit'] = limit
+        set_cached_content('NewsTopStories', arguments, news_content)
+        return news_content
+
+    logger.info("News for %s/%s not stored, fetching", language, ",".join(categories))
+    # End the lookups' transaction before the fetch and its retries: through the
+    # transaction pooler an open transaction pins a Postgres backend for as long as it lasts
+    db.session.close()
+    with STAGE_SECONDS.time('upstream_fetch'):
+        news_content, news_error = fetch_news(None, limit=limit, categories=list(categories), language=language)
+    if news_error:
+        logger.error("News fetch failed: %s", news_error)
+        return f"Failed to fetch news: {news_error}"
+    news_content['fetched_limit'] = limit  # The API may return fewer; asking again would not get more
+    set_cached_content('NewsTopStories', arguments, news_content)
+    logger.info("News for %s/%s fetched successfully", language, ",".join(categories))
+    return news_content
+
+
+def news_feed_covers(news_content, limit):
+    """
+    Returns whether a cached news feed was resolved for at least limit articles.
+    """
+    if not isinstance(news_content, dict) or 'data' not in news_content:
+        return False
+    return news_content.get('fetched_limit', len(news_content['data'])) >= limit
+
+
+def slice_news(news_content, limit):
+    """
+    Returns a reader's share of a news feed: its first limit articles. Error placeholders pass through.
+    """
+    if not isinstance(news_content, dict) or 'data' not in news_content:
+        return news_content
+    return {'data': news_content['data'][:limit]}
+
+
+def resolve_news_keys(keys, cached=None):
+    """
+    Resolves many news keys with one cache query and one resolve per news feed.
+
+    Keys sharing a language and categories are resolved from the same feed, at the largest
+    limit among them, and each key gets the first articles of it up to its own limit. Upstream
+    calls therefore depend only on the distinct category sets, not on the limits users chose.
+
+    Args:
+        keys (list): NewsTopStories content keys.
+        cached (set): Optional set to add the keys served from the content cache to.
+
+    Returns:
+        dict: Mapping of content key to news data or an error placeholder.
+    """
+    default_limit = current_app.config['NEWS_DEFAULT_LIMIT']
+    limits = {}
+    for key in keys:
+        feed_key = news_feed_key(key)
+        limits[feed_key] = max(limits.get(feed_key, 0), key[3] or default_limit)
+
+    feed_keys = list(limits)
+    contents = get_cached_contents('NewsTopStories', [cache_arguments(key) for key in feed_keys])
+    feeds = {key: content for key, content in zip(feed_keys, contents) if news_feed_covers(content, limits[key])}
+    if cached is not None:
+        cached.update(key for key in keys if news_feed_key(key) in feeds)
+
+    misses = [key for key in feed_keys if key not in feeds]
+    if misses:
+        logger.info("Resolving %d uncached news feeds for %d news keys", len(misses), len(keys))
+        db.session.close()  # Don't hold the cache lookup's connection while the feeds are fetched
+        contents = run_concurrently(lambda key: resolve_news_feed(key, limits[key], check_cache=False), misses)
+        feeds.update(zip(misses, contents))
+
+    return {key: slice_news(feeds[news_feed_key(key)], key[3] or default_limit) for key in keys}
+
+
+def plan_subscriptions(subscription_lists):
+    """
+    Collects the distinct content keys needed by a group of users.
+
+    Args:
+        subscription_lists (iterable): One subscriptions list per user.
+
+    Returns:
+        set: The distinct content keys across all users.
+    """
+    keys = set()
+    for user_subscriptions in subscription_lists:
+        for sub in user_subscriptions:
+            key = content_key(sub)
+            if key is not None:
+                keys.add(key)
+    return keys
+
+
+def resolve_content_keys(keys, cached=None):
+    """
+    Resolves each content key exactly once.
+
+    Weather keys are looked up in the cache together and their misses fetched in batches
+    from the group endpoint. News keys are resolved per feed and sliced to each key's
+    limit, see resolve_news_keys(), however few of them there are. Weather and news are
+    resolved concurrently with each other.
+
+    Args:
+        keys (iterable): Content keys produced by plan_subscriptions().
+        cached (set): Optional set to add the keys served from the content cache to.
+
+    Returns:
+        dict: Mapping of content key to resolved content.
+    """
+    by_type = {}
+    for key in keys:
+        by_type.setdefault(key[0], []).append(key)
+
+    # Every key goes to its type's resolver, however few keys of that type there are:
+    # news keys must be sliced to their own limit even when they are the only one.
+    # The resolvers run at the same time, so the weather batch and the news fetches overlap.
+    resolved = {}
+    results = run_alongside([partial(KEY_RESOLVERS[subscription_type], type_keys, cached)
+                             for subscription_type, type_keys in by_type.items()])
+    for result in results:
+        resolved.update(result)
+
+    logger.info("Resolved %d distinct content keys", len(resolved))
+    return resolved
+
+
+def resolve_weather_keys(keys, cached=None):
+    """
+    Resolves many weather keys with one location lookup, one cache query and batched
+    upstream fetches.
+
+    Each location is mapped to its canonical city through weather_locations, and weather
+    is cached per city, so "New York", "new york" and "New York, US" share one entry once
+    each spelling has been seen.
+
+    Args:
+        keys (list): WeatherUpdateNow content keys.
+        cached (set): Optional set to add the keys served from the content cache to.
+
+    Returns:
+        dict: Mapping of content key to weather data or an error placeholder.
+    """
+    locations = get_weather_locations([location for _, location in keys])
+    city_ids = list(dict.fromkeys(location['city_id'] for location in locations.values()))
+    contents = get_cached_contents('WeatherUpdateNow', [weather_cache_arguments(city_id) for city_id in city_ids])
+    by_city = {city_id: data for city_id, data in zip(city_ids, contents) if data is not None}
+
+    resolved = {}
+    for key in keys:
+        location = locations.get(key[1])
+        if location and location['city_id'] in by_city:
+            resolved[key] = by_city[location['city_id']]
+    if cached is not None:
+        cached.update(resolved)
+
+    misses = [key for key in keys if key not in resolved]
+    if misses:
+        logger.info("Fetching weather for %d uncached locations", len(misses))
+        db.session.close()  # Don't hold the lookups' connection across upstream calls and retries
+        with STAGE_SECONDS.time('upstream_fetch'):
+            results = fetch_and_save_weather_batch([location for _, location in misses], locations)
+
+        fresh = {}
+        for key in misses:
+            weather_content, weather_error = results.get(key[1], (None, "No location"))
+            if weather_error or not weather_content:
+                logger.error("Weather fetch failed for %s: %s", key[1], weather_error)
+                resolved[key] = {"error": f"Failed to fetch weather: {weather_error}"}
+            else:
+                resolved[key] = weather_content
+                if 'id' in weather_content:
+                    fresh[weather_content['id']] = weather_content
+        set_cached_contents('WeatherUpdateNow', [
+            (weather_cache_arguments(city_id), weather_content) for city_id, weather_content in fresh.items()
+        ])
+
+    return resolved
+
+
+# Batch resolver for each subscription type's content keys
+KEY_RESOLVERS = {
+    'WeatherUpdateNow': resolve_weather_keys,
+    'NewsTopStories': resolve_news_keys,
+}
+
+
+def warm_content_cache():
+    """
+    Resolves every content key any subscribed user needs, so a following send reads
+    all of its content from the database.
+
+    Distinct subscriptions are collected in SQL, then resolved with resolve_content_keys():
+    cached keys are skipped, weather is fetched through the group endpoint and other keys
+    concurrently within the per-upstream limits, and results are written to the content cache.
+
+    Returns:
+        dict: Report with the number of keys, how many were already cached, how many were
+            fetched (from the article store or upstream) and cached now, the failed keys
+            with their errors, upstream requests made and elapsed seconds.
+    """
+    started = time.perf_counter()
+    upstream_before = sum(counters['requests'] for counters in get_upstream_stats().values())
+
+    keys = plan_subscriptions([distinct_subscriptions()])
+    cached = set()
+    resolved = resolve_content_keys(keys, cached=cached)
+
+    failed, fetched = [], 0
+    for key, content in resolved.items():
+        error = content_error(content)
+        if error:
+            failed.append({'key': list(key), 'error': error})
+        elif key not in cached:
+            fetched += 1
+
+    report = {
+        'keys': len(keys),
+        'cached': len(cached),
+        'fetched': fetched,
+        'failed': failed,
+        'upstream_requests': sum(counters['requests'] for counters in get_upstream_stats().values()) - upstream_before,
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info("Content cache warm-up: %d keys, %d already cached, %d fetched, %d failed in %.3fs",
+                report['keys'], report['cached'], report['fetched'], len(failed), report['elapsed_seconds'])
+    return report
+
+
+def content_error(content):
+    """
+    Returns the error for a placeholder produced by resolve_content_keys(), or None for real content.
+    """
+    if content is None:
+        return "No content"
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict) and 'error' in content:
+        return content['error']
+    return None
+
+
+def subscription_router(user_subscriptions, resolved=None):
     """
     Routes the subscriptions to relevant API functions and sends the API response.
 
     Args:
         user_subscriptions (list): List of user's subscriptions.
+        resolved (dict): Optional content already resolved by resolve_content_keys(),
+            shared across users. Keys missing from it are resolved on demand.
 
     Returns:
         dict: A dictionary containing the combined results from all APIs.
     """
-    logger.info("Started subscription router with %d subscriptions", len(user_subscriptions))
+    logger.debug("Started subscription router with %d subscriptions", len(user_subscriptions))
     results = {}
+    resolved = resolved if resolved is not None else {}
+
+    keys = []
+    for sub in user_subscriptions:
+        key = content_key(sub)
+        if key is None:
+            logger.warning("Unknown subscription: %s", sub.get('name'))
+            continue
+        keys.append(key)
+
+    # Fetch whatever is not already resolved concurrently, then fill the slots in order
+    missing = [key for key in dict.fromkeys(keys) if key not in resolved]
+    fetched = resolve_content_keys(missing) if missing else {}
+
+    for key in keys:
+        results[SUBSCRIPTION_SLOTS[key[0]]] = resolved[key] if key in resolved else fetched[key]
 
+    return results
+
+
+def build_newsletter(user, resolved=None, fragment_cache=None):
+    """
+    Resolves and renders the daily newsletter body for a single user.
+
+    Args:
+        user: A User (or a row exposing email and subscriptions).
+        resolved (dict): Optional shared content from resolve_content_keys().
+        fragment_cache (FragmentCache): Optional cache of rendered sections shared across users.
+
+    Returns:
+        tuple: (html_body (str), error_message (str))
+    """
+    user_subscriptions = (user.subscriptions or {}).get('subscriptions', [])
+    if not isinstance(user_subscriptions, list):
+        logger.error("Invalid subscriptions format for %s: Expected a list but got %s", user.email, type(user_subscriptions))
+        return None, "Invalid subscriptions format"
+
+    # Call the subscription router to process subscriptions
+    content = subscription_router(user_subscriptions, resolved)
+    if not content:
+        logger.warning("No content generated for newsletter to %s", user.email)
+        return None, "No content generated"
+
+    # Sections are cached by the content key they were resolved from, and weather also by
+    # the units it is converted to
+    units = weather_units(user_subscriptions)
+    content_keys = {}
     for sub in user_subscriptions:
-        if sub['name'] == 'WeatherUpdateNow':
-            location = sub['details'].get('location')
-            units = sub['details'].get('units', 'imperial')
-
-            logger.debug("Fetching weather for location: %s, units: %s", location, units)
-
-            # Check the database for existing data
-            weather_content, error = fetch_weather_from_db_raw(location)
-            if weather_content:
-                logger.info("Weather data fetched from database: %s", weather_content)
-                results['weather'] = weather_content  # Store as a raw dictionary
-            elif error:
-                logger.warning("Weather data not found in database: %s", error)
-                weather_content, weather_error = fetch_and_save_weather(location, units)
-                if weather_error:
-                    results['weather'] = {"error": f"Failed to fetch weather: {weather_error}"}
-                    logger.error("Weather fetch failed: %s", weather_error)
-                else:
-                    results['weather'] = weather_content  # Store as a raw dictionary
-                    logger.info("Weather fetched successfully: %s", weather_content)
-
-
-        if sub['name'] == 'NewsTopStories':
-            language = sub['details'].get('language', 'en')
-            limit = sub['details'].get('limit') # this represents the number of articles the user wants to recieve. 
-            categories = sub['details'].get('categories', 'general')
-            
-            logger.debug("Fetching news for language: %s, limit: %s, categories: %s", language, limit, categories)
-            
-            # Check the database for existing data
-            news_content, error = fetch_news_from_db_raw(language, categories, limit)
-            if news_content:
-                logger.info("News data fetched from database.")
-                results['news'] = news_content
-            elif error:
-                logger.warning("News data not found in database: %s", error)
-                news_content, news_error = fetch_news(language, limit)
-                if news_error:
-                    results['news'] = f"Failed to fetch news: {news_error}"
-                    logger.error("News fetch failed: %s", news_error)
-                else:
-                    results['news'] = news_content
-                    logger.info("News fetched successfully: %s", news_content)
-
-    return results
\ No newline at end of file
+        key = content_key(sub)
+        if key is not None:
+            content_keys[SUBSCRIPTION_SLOTS[key[0]]] = key + (units,) if key[0] == 'WeatherUpdateNow' else key
+
+    return render_newsletter(content, content_keys, fragment_cache, units), None
+
+
+def send_newsletter(user, resolved=None):
+    """
+    Resolves, renders and sends the daily newsletter for a single user.
+
+    Args:
+        user: A User (or a row exposing email and subscriptions).
+        resolved (dict): Optional shared content from resolve_content_keys().
+
+    Returns:
+        tuple: (success (bool), message (str))
+    """
+    html_with_headers, error = build_newsletter(user, resolved)
+    if error:
+        return False, error
+    return send_email(user.email, "Daily Newsletter", html_with_headers)
+
+
+def run_newsletter(start_id=None, end_id=None, batch_size=None, on_batch=None):
+    """
+    Sends the newsletter to every subscribed user, streaming users in batches.
+
+    Args:
+        start_id (int): Lowest user id to send to (inclusive), used to resume or split a run.
+        end_id (int): Highest user id to send to (inclusive).
+        batch_size (int): Users loaded per query. Defaults to NEWSLETTER_BATCH_SIZE.
+        on_batch (callable): Optional progress hook, called after each batch is sent with
+            (last_id, sent, failed) for that batch. Exceptions it raises stop the run.
+
+    Returns:
+        dict: Run report with sent/failed counts, the last processed id, elapsed seconds, users/sec
+            and fragment/payload cache hit/miss counts.
+    """
+    batch_size = batch_size or current_app.config['NEWSLETTER_BATCH_SIZE']
+    logger.info("Starting newsletter run for ids %s..%s (batch size %d)", start_id, end_id, batch_size)
+
+    sent = failed = 0
+    last_id = None
+    started = time.perf_counter()
+
+    resolved = {}
+    fragment_cache = FragmentCache(current_app.config['FRAGMENT_CACHE_SIZE'])
+    payload_cache = FragmentCache(current_app.config['FRAGMENT_CACHE_SIZE'], name='payload')
+    users = iter_subscribed_users(start_id, end_id, batch_size)
+
+    for batch in _batched(users, batch_size):
+        # Planning stage: resolve content the batch needs that earlier batches did not
+        subscription_lists = [_user_subscriptions(user) for user in batch]
+        missing = plan_subscriptions(subscription_lists) - resolved.keys()
+        with STAGE_SECONDS.time('resolve_content'):
+            resolved.update(resolve_content_keys(missing))
+        # Hand the connection back before rendering and sending: through the transaction
+        # pooler an open transaction pins a Postgres backend for as long as it lasts
+        db.session.close()
+
+        # Render every newsletter in the batch, then send them over the pooled SMTP connections
+        outgoing = []
+        batch_sent = batch_failed = 0
+        for user in batch:
+            try:
+                html_with_headers, error = build_newsletter(user, resolved, fragment_cache)
+            except Exception as e:
+                logger.exception("Unexpected error building newsletter for user %s", user.id)
+                html_with_headers, error = None, str(e)
+
+            if error:
+                batch_failed += 1
+                logger.error("Failed to build newsletter for user %s: %s", user.id, error)
+            else:
+                outgoing.append((user, html_with_headers))
+
+        results = send_bulk_emails([(user.email, "Daily Newsletter", html) for user, html in outgoing], payload_cache)
+        for (user, _), (success, message) in zip(outgoing, results):
+            if success:
+                batch_sent += 1
+            else:
+                batch_failed += 1
+                logger.error("Failed to send newsletter to user %s: %s", user.id, message)
+
+        sent += batch_sent
+        failed += batch_failed
+        last_id = batch[-1].id
+        fragment_cache.publish_metrics()
+        payload_cache.publish_metrics()
+        if on_batch is not None:
+            on_batch(last_id, batch_sent, batch_failed)
+
+    elapsed = time.perf_counter() - started
+    processed = sent + failed
+    report = {
+        "sent": sent,
+        "failed": failed,
+        "last_id": last_id,
+        "content_keys": len(resolved),
+        "elapsed_seconds": round(elapsed, 3),
+        "users_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "fragment_cache": fragment_cache.stats(),
+        "payload_cache": payload_cache.stats(),
+    }
+    logger.info("Newsletter run finished: %s", report)
+    return report
+
+
+def _user_subscriptions(user):
+    user_subscriptions = (user.subscriptions or {}).get('subscriptions', [])
+    return user_subscriptions if isinstance(user_subscriptions, list) else []
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
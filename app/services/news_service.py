@@ -1,16 +1,19 @@
-import requests
-from app.models import User, SubscriptionContent
+from app.models import NewsArticle
 from datetime import datetime, timezone, timedelta
 import os
 from app import db 
 import logging
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.services.upstream_service import upstream_get
+from flask import current_app
+from app.services.render_service import render_email_template
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+EST = timezone(timedelta(hours=-5))
+
 
 def fetch_news(api_token, limit=10, domains=None, categories=None, language='en'):
     """
@@ -25,7 +28,7 @@ def fetch_news(api_token, limit=10, domains=None, categories=None, language='en'
     Returns:
         tuple: (news_content (list or dict), error_message (str))
     """
-    base_url = "https://api.thenewsapi.com/v1/news/top"
+    base_url = f"{current_app.config['NEWS_API_BASE_URL']}/v1/news/top"
     api_token = os.getenv('NEWS_API_KEY')
 
     # Set default domains if none provided
@@ -54,7 +57,7 @@ def fetch_news(api_token, limit=10, domains=None, categories=None, language='en'
 
     # Make the API request
     try:
-        response = requests.get(base_url, params=params)
+        response = upstream_get('thenewsapi', base_url, params=params)
         
         # Ensure we check the 'data' key in the response
         if response.status_code == 200:
@@ -73,90 +76,134 @@ def fetch_news(api_token, limit=10, domains=None, categories=None, language='en'
 
 
 def save_news_data_to_db(news_data):
+    """
+    Upserts the articles of a TheNewsAPI response into news_articles, keyed by article uuid.
+
+    An article returned by several fetches is stored once; later fetches refresh it.
+
+    Args:
+        news_data (dict): The API response, with the articles under 'data'.
+
+    Returns:
+        tuple: (saved_count (int), error_message (str))
+    """
+    now = datetime.utcnow()
+    rows = {}
+    for article in normalize_news_data(news_data):
+        row = article_to_row(article, now)
+        if row:
+            rows[row['uuid']] = row  # ON CONFLICT cannot touch the same row twice in one statement
+
+    if not rows:
+        return 0, None
+
+    statement = insert(NewsArticle).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=[NewsArticle.uuid],
+        set_={column: statement.excluded[column] for column in (
+            'title', 'description', 'snippet', 'url', 'image_url', 'source',
+            'language', 'categories', 'published_at', 'fetched_at',
+        )},
+    )
+
     try:
-        # Create a new SubscriptionContent entry without providing the 'id' field
-        new_subscription_content = SubscriptionContent(
-            subscription_type="NewsTopStories",  # Example subscription type
-            result=news_data,  # Weather data from the API response
-            fetch_date=datetime.utcnow()  # Current UTC time
-        )
-        
-        # Add to the session and commit the transaction to save it in the database
-        db.session.add(new_subscription_content)
+        db.session.execute(statement)
         db.session.commit()
-        logging.info("News data saved successfully")
-
+        logger.info("Saved %d news articles", len(rows))
+        return len(rows), None
     except SQLAlchemyError as e:
-        # Handle any SQLAlchemy errors (like unique constraint violations)
-        db.session.rollback()  # Rollback the transaction if error occurs
-        logging.error(f"News fetch failed: Database error: {str(e)}")
-        return None, f"Database error: {str(e)}"
+        db.session.rollback()
+        logger.error("News save failed: Database error: %s", str(e))
+        return 0, f"Database error: {str(e)}"
+
+
+def article_to_row(article, fetched_at):
+    """
+    Maps a TheNewsAPI article to a news_articles row, or None if it lacks a uuid or date.
+    """
+    try:
+        published_at = datetime.strptime(article['published_at'], "%Y-%m-%dT%H:%M:%S.%fZ")
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not article.get('uuid'):
+        return None
+
+    categories = article.get('categories') or []
+    if isinstance(categories, str):
+        categories = categories.split(',')
+
+    return {
+        'uuid': article['uuid'],
+        'title': article.get('title') or '',
+        'description': article.get('description'),
+        'snippet': article.get('snippet'),
+        'url': article.get('url') or '',
+        'image_url': article.get('image_url'),
+        'source': article.get('source'),
+        'language': article.get('language') or 'en',
+        'categories': [c for c in categories if c],
+        'published_at': published_at,
+        'fetched_at': fetched_at,
+    }
 
-    except Exception as e:
-        # Handle any other unexpected errors
-        logging.error(f"Unexpected error occurred while saving weaNewsther data: {str(e)}")
-        return None, f"Error: {str(e)}"
 
-    return new_subscription_content, None  # Return the saved record and no error
-from sqlalchemy.sql import text
-from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime
-import logging
 def fetch_news_from_db_raw(language='en', categories=None, limit=None):
     """
-    Fetch news data using a raw SQL query with filtering for language, categories, and limit.
+    Fetch today's top articles for a language and any of the given categories from news_articles.
+
+    Runs on the (language, published_at DESC) and GIN(categories) indexes.
+
+    Returns:
+        tuple: (news_data (dict shaped like the API response, articles under 'data'), error_message (str))
     """
     if categories is None:
         categories = ['general']  # Default category if none provided
+    elif isinstance(categories, str):
+        categories = categories.split(',')
 
     try:
-        # Get today's date in UTC
-        utc_now = datetime.utcnow().date()
-
-        # Prepare the query
-        query = text(f"""
-            SELECT result
-            FROM (
-                SELECT result
-                FROM subscription_content
-                WHERE subscription_type = :subscription_type
-                AND result->'data'->0->>'language' = :language
-                AND result->'data'->0->>'categories' = :categories
-                AND fetch_date >= :fetch_date
-                ORDER BY fetch_date DESC
-            ) sub
-            LIMIT :limit
-        """)
-
-        parameters = {
-            'subscription_type': 'NewsTopStories',
-            'language': language,
-            'categories': categories[0],  # Use the first category from the list
-            'fetch_date': utc_now,
-            'limit': limit
-        }
-
-        try:
-            logger.info("Searching parameters in DB: %s", parameters)
-            result = db.session.execute(query, parameters).fetchall()
-            db.session.commit()  # Ensure transaction is committed
-        except SQLAlchemyError as e:
-            db.session.rollback()  # Rollback if there is an error
-            logging.error(f"Database error: {e}")
-
-        if result:
-            # Process the results
-            news_data = [row[0] for row in result]
-            logger.info("News data result from DB: %s", news_data)
-            return news_data, None
+        # Start of today in UTC
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        query = (
+            select(NewsArticle)
+            .where(
+                NewsArticle.language == language,
+                NewsArticle.categories.overlap(list(categories)),
+                NewsArticle.published_at >= today,
+            )
+            .order_by(NewsArticle.published_at.desc())
+            .limit(limit)
+        )
+        articles = db.session.execute(query).scalars().all()
+
+        if articles:
+            logger.info("Found %d news articles in DB for %s/%s", len(articles), language, ",".join(categories))
+            return {'data': [article_to_dict(article) for article in articles]}, None
         else:
             return None, "No matching news data found in the database."
-    except Exception as e:
-        logger.exception("Error fetching news data using raw SQL: %s", str(e))
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.exception("Error fetching news articles: %s", str(e))
         return None, f"Error fetching news data: {str(e)}"
 
 
-
+def article_to_dict(article):
+    """
+    Converts a NewsArticle back into the TheNewsAPI article shape used by the renderers.
+    """
+    return {
+        'uuid': article.uuid,
+        'title': article.title,
+        'description': article.description,
+        'snippet': article.snippet,
+        'url': article.url,
+        'image_url': article.image_url,
+        'source': article.source,
+        'language': article.language,
+        'categories': list(article.categories or []),
+        'published_at': article.published_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+    }
 
 
 def normalize_news_data(news_data):
@@ -186,80 +233,43 @@ def format_HTML_news_container(articles):
     Returns:
         str: HTML formatted news data.
     """
-    try:
-        # Initialize the main container
-        html_content = """
-        <div style="font-family: 'Arial', sans-serif; color: #333; padding: 10px; background-color: #FFF; max-width: 600px; margin: 0 auto;">
-        """
-
-        # Add a header for the news section
-        html_content += """
-        <div style="text-align: left; margin-bottom: 15px; border-bottom: 1px solid #EAEAEA; padding-bottom: 10px;">
-            <h1 style="font-size: 18px; margin: 0; color: #222;">News</h1>
-        </div>
-        """
-
-        # Loop through each article and format the content
-        for article in articles:
-            title = article.get("title", "Unknown title")
-            description = article.get("description", "N/A")
-            published_at = article.get("published_at", "N/A")
-            url = article.get("url", "#")
-            source = article.get("source", "Unknown source")
-            image_url = article.get("image_url", "")
-
-            # Remove .com from source
-            source = remove_suffix(source)
-
-            published_at = format_datetime_to_est(published_at)
-            # Create the article block
-            html_content += f"""
-            <div style="display: flex; align-items: flex-start; margin-bottom: 10px; padding: 8px; border-bottom: 1px solid #EAEAEA;">
-
-                <!-- Image Section -->
-                {"<div style='flex: 0 0 100px; margin-right: 10px;'><img src='" + image_url + "' alt='Article Image' style='width: 80px; height: 80px; object-fit: cover; border-radius: 4px;'></div>" if image_url else ""}
-
-                <!-- Text Section -->
-                <div style="flex: 1;">
-
-                    <!-- Title -->
-                    <h2 style="font-size: 16px; margin: 0 0 5px; color: #222; font-weight: bold; line-height: 1.2;">{title}</h2>
-
-                    <!-- Description -->
-                    <p style="font-size: 11px; color: #666; margin: 0 0 8px; line-height: 1.4;">{description}</p>
-
-                    <!-- Meta Info -->
-                    <p style="font-size: 9px; color: #999; margin: 0;">
-                        <span><strong>{source}</strong></span> &bull; <span>{published_at}</span> &bull; <span><a href="{url}" target="_blank" style="display: inline-block; margin-bottom: 2px; padding: 2px 4px; background-color: #CFA488; color: #FFF; font-size: 8px; font-weight: bold; text-decoration: none; border-radius: 4px;">Read More</a></span>
-                    </p>
-                </div>
-            </div>
-            """
-
-        # Close the main container
-        html_content += "</div>"
-
-        return html_content
+    return render_email_template('news.html', articles=news_template_context(articles))
 
-    except Exception as e:
-        print(f"Error formatting news container: {str(e)}")
-        return "<div>Error formatting news data.</div>"
+
+def news_template_context(articles):
+    """
+    Extracts the values the news template displays for each article.
+
+    Args:
+        articles (list): List of dictionaries containing news article data.
+
+    Returns:
+        list: One dict of template values per article.
+    """
+    return [{
+        "title": article.get("title", "Unknown title"),
+        "description": article.get("description", "N/A"),
+        "published_at": format_datetime_to_est(article.get("published_at", "N/A")),
+        "url": article.get("url", "#"),
+        "source": remove_suffix(article.get("source") or "Unknown source"),  # Remove .com from source
+        "image_url": article.get("image_url", ""),
+    } for article in articles]
 
 def format_datetime_to_est(timestamp):
     try:
-        # Parse the original timestamp (assumes it is in UTC, indicated by "Z")
-        dt_utc = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
-        dt_utc = dt_utc.replace(tzinfo=timezone.utc)
+        # Parse the original timestamp (UTC, indicated by "Z"); fromisoformat is much cheaper than strptime
+        dt_utc = datetime.fromisoformat(timestamp)
+        if dt_utc.tzinfo is None:
+            dt_utc = dt_utc.replace(tzinfo=timezone.utc)
         
         # Convert to EST (UTC-5, or UTC-4 during daylight saving time)
-        est_offset = timedelta(hours=-5)  # Adjust for standard time
-        dt_est = dt_utc.astimezone(timezone(est_offset))
+        dt_est = dt_utc.astimezone(EST)  # Adjust for standard time
         
         # Format the date and time without seconds
         return dt_est.strftime("%I:%M %p EST")
     
     except Exception as e:
-        print("Error formatting datetime:", str(e))
+        logger.warning("Error formatting datetime %r: %s", timestamp, str(e))
         return "Invalid date"
     
 def remove_suffix(domain: str) -> str:
@@ -283,7 +293,7 @@ def fetch_source_ids(api_token, categories=None, language='en', page=1):
     Returns:
         dict: JSON response containing source details.
     """
-    base_url = "https://api.thenewsapi.com/v1/news/sources"
+    base_url = f"{current_app.config['NEWS_API_BASE_URL']}/v1/news/sources"
     
     # Construct query parameters
     params = {
@@ -296,8 +306,8 @@ def fetch_source_ids(api_token, categories=None, language='en', page=1):
         params["categories"] = categories
     
     # Make the API request
-    response = requests.get(base_url, params=params)
-    print("Full URL:", response.url)  # Debugging: print the final URL with query parameters
+    response = upstream_get('thenewsapi', base_url, params=params)
+    logger.debug("Fetched sources page %s: status %s", page, response.status_code)
     
     # Check if the request was successful
     if response.status_code == 200:
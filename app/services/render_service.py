@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from app.services.metrics_service import CACHE_REQUESTS
+
+# Email templates live next to the web templates, under templates/email
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+
+# auto_reload is off so a template is compiled once per process and served from the
+# environment's cache afterwards; autoescaping covers every upstream-provided string.
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+
+# Changes whenever any email template's source changes; part of every fragment cache key
+TEMPLATE_VERSION = None
+
+
+def precompile_templates():
+    """
+    Compiles every email template into the environment's cache and records TEMPLATE_VERSION.
+
+    Returns:
+        list: The names of the compiled templates.
+    """
+    global TEMPLATE_VERSION
+    names = _env.list_templates(extensions=['html'])
+    digest = hashlib.sha1()
+    for name in names:
+        source, _, _ = _env.loader.get_source(_env, name)
+        digest.update(name.encode('utf-8') + b'\0' + source.encode('utf-8'))
+        _env.get_template(name)
+    TEMPLATE_VERSION = digest.hexdigest()[:12]
+    return names
+
+
+def render_email_template(name, **context):
+    """
+    Renders one of the cached email templates.
+
+    Args:
+        name (str): Template file name, e.g. 'weather.html'.
+        **context: Template variables.
+
+    Returns:
+        str: The rendered HTML.
+    """
+    return _env.get_template(name).render(**context)
+
+
+_static = {}
+
+
+def render_static_template(name):
+    """
+    Renders a template that takes no variables (e.g. the header and footer) once per process.
+
+    Args:
+        name (str): Template file name, e.g. 'header.html'.
+
+    Returns:
+        str: The rendered HTML.
+    """
+    html = _static.get(name)
+    if html is None:
+        html = _static.setdefault(name, render_email_template(name))
+    return html
+
+
+class FragmentCache:
+    """
+    A bounded LRU cache of rendered newsletter sections.
+
+    Entries are keyed by (TEMPLATE_VERSION, section, content key), so users whose
+    subscriptions resolve to the same content share one rendered fragment. The cache is
+    meant to live for one run, while the content behind each key is fixed. The sending
+    path uses a second instance for serialized MIME payloads, keyed by subject and body.
+    """
+
+    def __init__(self, maxsize, name='fragment'):
+        self.maxsize = maxsize
+        self.name = name  # The cache label in newsletter_cache_requests_total
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._published = (0, 0)  # hits and misses already added to CACHE_REQUESTS
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, section, content_key, render):
+        """
+        Returns the cached fragment for a section, rendering and storing it on a miss.
+
+        Args:
+            section (str): The subscription slot, e.g. 'weather' or 'news'.
+            content_key (tuple): The content key the section was resolved from.
+            render (callable): Called with no arguments to produce the HTML on a miss.
+
+        Returns:
+            str: The rendered fragment.
+        """
+        key = (TEMPLATE_VERSION, section, content_key)
+        with self._lock:
+            html = self._fragments.get(key)
+            if html is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = render()
+
+        with self._lock:
+            self._fragments[key] = html
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+                self.evictions += 1
+        return html
+
+    def publish_metrics(self):
+        """
+        Adds the hits and misses since the last call to newsletter_cache_requests_total.
+
+        Lookups are counted here rather than on every get_or_render() call, so the
+        per-user rendering path does not pay for a second lock.
+        """
+        with self._lock:
+            hits, misses = self.hits - self._published[0], self.misses - self._published[1]
+            self._published = (self.hits, self.misses)
+        CACHE_REQUESTS.inc(self.name, 'hit', amount=hits)
+        CACHE_REQUESTS.inc(self.name, 'miss', amount=misses)
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, evictions and the current number of fragments.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._fragments),
+            }
+
+
+precompile_templates()
@@ -0,0 +1,161 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# subscription_content is range-partitioned by fetch_date, one partition per UTC day
+PARTITION_PREFIX = 'subscription_content_p'
+PARTITION_NAME = re.compile(r'^subscription_content_p(\d{8})$')
+
+
+def partition_name(day):
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def list_partitions():
+    """
+    Returns the daily partitions of subscription_content.
+
+    Returns:
+        dict: Mapping of partition day (date) to partition table name.
+    """
+    rows = db.session.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'subscription_content'
+    """)).scalars()
+
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[datetime.strptime(match.group(1), '%Y%m%d').date()] = name
+    return partitions
+
+
+def ensure_partitions(days_ahead=None):
+    """
+    Creates the daily partitions for today and the next days_ahead days if they are missing.
+
+    Each day is created as a plain table and then attached, which locks the parent only
+    in SHARE UPDATE EXCLUSIVE mode, so inserts carry on. There is no default partition
+    (it would rule out detaching concurrently, see drop_expired_partitions()), so rows
+    for a day without a partition are refused: days_ahead is the margin for maintenance
+    not running. A day that fails is rolled back and skipped, so the other days and the
+    rest of maintenance run.
+
+    Args:
+        days_ahead (int): Days to create in advance. Defaults to CONTENT_PARTITION_PREMAKE_DAYS.
+
+    Returns:
+        list: Names of the partitions that were created.
+    """
+    if days_ahead is None:
+        days_ahead = current_app.config['CONTENT_PARTITION_PREMAKE_DAYS']
+
+    existing = list_partitions()
+    today = datetime.utcnow().date()
+    created = []
+
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        name = partition_name(day)
+        start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+        try:
+            db.session.execute(text(
+                f'CREATE TABLE "{name}" (LIKE subscription_content INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            ))
+            db.session.execute(text(
+                f'ALTER TABLE subscription_content ATTACH PARTITION "{name}" '
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error("Could not create partition %s: %s", name, e)
+            continue
+        created.append(name)
+
+    return created
+
+
+def drop_expired_partitions(retention_days=None):
+    """
+    Drops whole daily partitions that are entirely older than the retention window.
+
+    Dropping a partition releases its heap and TOAST storage at once, without the
+    row-by-row cost and bloat of a DELETE. Dropping an attached partition would lock the
+    parent in ACCESS EXCLUSIVE mode and stall every insert, so each partition is first
+    detached CONCURRENTLY, which cannot run inside a transaction, and then dropped. A
+    detach interrupted by a previous run is finished with FINALIZE.
+
+    Args:
+        retention_days (int): Days of content to keep. Defaults to CONTENT_RETENTION_DAYS.
+
+    Returns:
+        list: Names of the partitions that were dropped.
+    """
+    if retention_days is None:
+        retention_days = current_app.config['CONTENT_RETENTION_DAYS']
+
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    expired = [name for day, name in sorted(list_partitions().items()) if day < cutoff]
+    pending = set(db.session.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhdetachpending
+    """)).scalars())
+    db.session.commit()
+
+    dropped = []
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for name in expired:
+            mode = 'FINALIZE' if name in pending else 'CONCURRENTLY'
+            try:
+                connection.execute(text(f'ALTER TABLE subscription_content DETACH PARTITION "{name}" {mode}'))
+                connection.execute(text(f'DROP TABLE "{name}"'))
+            except SQLAlchemyError as e:
+                logger.error("Could not drop partition %s: %s", name, e)
+                continue
+            dropped.append(name)
+
+    return dropped
+
+
+def run_content_maintenance(retention_days=None, days_ahead=None):
+    """
+    Runs the periodic maintenance for stored content.
+
+    Creates upcoming subscription_content partitions, drops expired ones, and deletes
+    expired cached_content rows and news articles published more than
+    NEWS_ARTICLE_RETENTION_DAYS ago.
+
+    Returns:
+        dict: Report of created and dropped partitions and purged row counts.
+    """
+    report = {
+        'created_partitions': ensure_partitions(days_ahead),
+        'dropped_partitions': drop_expired_partitions(retention_days),
+    }
+
+    report['purged_cache_rows'] = db.session.execute(
+        text("DELETE FROM cached_content WHERE expiration_date < :now"), {'now': datetime.utcnow()}
+    ).rowcount
+    report['purged_news_articles'] = db.session.execute(
+        text("DELETE FROM news_articles WHERE published_at < :cutoff"),
+        {'cutoff': datetime.utcnow() - timedelta(days=current_app.config['NEWS_ARTICLE_RETENTION_DAYS'])}
+    ).rowcount
+    db.session.commit()
+
+    logger.info("Content maintenance finished: %s", report)
+    return report
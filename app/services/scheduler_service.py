@@ -0,0 +1,192 @@
+import logging
+import time
+from datetime import datetime, timedelta
+import pytz
+from flask import current_app
+from app import db
+from app.services.job_service import enqueue_newsletter
+from app.services.main_service import warm_content_cache
+from app.services.retention_service import run_content_maintenance
+
+logger = logging.getLogger(__name__)
+
+# Run keys this process already queued or saw queued, so due runs cost no query afterwards
+_fired = set()
+
+
+def parse_schedule(schedule):
+    """
+    Parses a NEWSLETTER_SCHEDULE value into send times.
+
+    Args:
+        schedule (str): Comma-separated HH:MM times, e.g. "07:00,18:30".
+
+    Returns:
+        list: (hour, minute) tuples.
+
+    Raises:
+        ValueError: If a time is not HH:MM.
+    """
+    times = []
+    for value in (schedule or '').split(','):
+        value = value.strip()
+        if value:
+            parsed = datetime.strptime(value, '%H:%M')
+            times.append((parsed.hour, parsed.minute))
+    return times
+
+
+def send_times(now):
+    """
+    Returns the scheduled send times of yesterday, today and tomorrow around now.
+
+    Args:
+        now (datetime): Aware current time.
+
+    Returns:
+        list: Aware send times in NEWSLETTER_TIMEZONE.
+    """
+    tz = pytz.timezone(current_app.config['NEWSLETTER_TIMEZONE'])
+    today = now.astimezone(tz).date()
+    times = []
+    for day in (today - timedelta(days=1), today, today + timedelta(days=1)):
+        for hour, minute in parse_schedule(current_app.config['NEWSLETTER_SCHEDULE']):
+            times.append(tz.localize(datetime(day.year, day.month, day.day, hour, minute)))
+    return times
+
+
+def due_runs(now=None):
+    """
+    Returns the scheduled runs that should be queued now.
+
+    A run is due from its send time until NEWSLETTER_SCHEDULE_GRACE_MINUTES later, so an
+    instance that was down at the send time still queues it when it comes back.
+
+    Args:
+        now (datetime): Aware current time. Defaults to the current time.
+
+    Returns:
+        list: (run_key (str), send_time (datetime)) tuples.
+    """
+    now = now or datetime.now(pytz.utc)
+    grace = timedelta(minutes=current_app.config['NEWSLETTER_SCHEDULE_GRACE_MINUTES'])
+    return [
+        (f"daily:{send_time:%Y-%m-%dT%H:%M}", send_time)
+        for send_time in send_times(now)
+        if send_time <= now < send_time + grace
+    ]
+
+
+def due_warmups(now=None):
+    """
+    Returns the scheduled sends whose cache warm-up should run now, i.e. those starting
+    within the next NEWSLETTER_WARM_LEAD_MINUTES.
+
+    Args:
+        now (datetime): Aware current time. Defaults to the current time.
+
+    Returns:
+        list: (warmup_key (str), send_time (datetime)) tuples.
+    """
+    now = now or datetime.now(pytz.utc)
+    lead = timedelta(minutes=current_app.config['NEWSLETTER_WARM_LEAD_MINUTES'])
+    return [
+        (f"warm:{send_time:%Y-%m-%dT%H:%M}", send_time)
+        for send_time in send_times(now)
+        if send_time - lead <= now < send_time
+    ]
+
+
+def fire_due_runs(now=None):
+    """
+    Runs the daily content maintenance, warms the content cache ahead of upcoming sends
+    and queues every due scheduled run that has not been queued yet.
+
+    Each run is queued under its run key, which is unique in newsletter_jobs, so when
+    several instances run the scheduler exactly one of them queues a given run. Tasks
+    are spread over NEWSLETTER_SEND_WINDOW_MINUTES. A warm-up repeated by another
+    instance finds the content cached and makes no upstream calls.
+
+    Args:
+        now (datetime): Aware current time. Defaults to the current time.
+
+    Returns:
+        list: Ids of the jobs this call queued.
+    """
+    run_due_maintenance(now)
+
+    for warmup_key, send_time in due_warmups(now):
+        if warmup_key in _fired:
+            continue
+        _fired.add(warmup_key)
+        try:
+            report = warm_content_cache()
+        except Exception as e:
+            # The send reads through to the upstreams on its own; a failed warm-up must not
+            # stop this tick from queueing it
+            db.session.rollback()
+            logger.exception("Skipping the content warm-up for the %s send: %s", send_time.isoformat(), e)
+            continue
+        logger.info("Warmed content for the %s send: %s", send_time.isoformat(), report)
+
+    window_seconds = current_app.config['NEWSLETTER_SEND_WINDOW_MINUTES'] * 60
+    queued = []
+
+    for run_key, send_time in due_runs(now):
+        if run_key in _fired:
+            continue
+        job, error = enqueue_newsletter(run_key=run_key, window_seconds=window_seconds)
+        if error:
+            logger.error("Failed to queue scheduled run %s: %s", run_key, error)
+            continue
+        _fired.add(run_key)
+        if job is not None:
+            logger.info("Queued scheduled run %s (send time %s) as job %s", run_key, send_time.isoformat(), job.id)
+            queued.append(job.id)
+
+    return queued
+
+
+def run_due_maintenance(now=None):
+    """
+    Runs run_content_maintenance() once per UTC day in this process, so partitions are
+    always made ahead without a separate cron. Maintenance is idempotent, so another
+    instance repeating it only finds nothing left to do.
+
+    Args:
+        now (datetime): Aware current time. Defaults to the current time.
+
+    Returns:
+        dict: The maintenance report, or None if it already ran today or failed.
+    """
+    now = now or datetime.now(pytz.utc)
+    maintenance_key = f"maintenance:{now.astimezone(pytz.utc):%Y-%m-%d}"
+    if maintenance_key in _fired:
+        return None
+    _fired.add(maintenance_key)
+    try:
+        return run_content_maintenance()
+    except Exception as e:
+        logger.exception("Content maintenance failed: %s", e)
+        return None
+
+
+def run_scheduler(poll_interval=30, once=False):
+    """
+    Checks the schedule every poll_interval seconds and queues due runs.
+
+    Args:
+        poll_interval (float): Seconds between schedule checks.
+        once (bool): Check a single time and return.
+
+    Returns:
+        list: Ids of the jobs queued.
+    """
+    queued = []
+    logger.info("Newsletter scheduler started with schedule %r (%s)",
+                current_app.config['NEWSLETTER_SCHEDULE'], current_app.config['NEWSLETTER_TIMEZONE'])
+    while True:
+        queued.extend(fire_due_runs())
+        if once:
+            return queued
+        time.sleep(poll_interval)
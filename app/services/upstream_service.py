@@ -0,0 +1,255 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from app.services.metrics_service import UPSTREAM_ERRORS, UPSTREAM_REQUESTS, UPSTREAM_RETRIES, UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limited or a temporary upstream failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_semaphores = {}
+_executor = None
+_session = None
+_stats = defaultdict(lambda: {'requests': 0, 'errors': 0, 'retries': 0, 'latency_seconds': 0.0})
+
+
+@contextmanager
+def upstream_slot(source):
+    """
+    Holds one of the concurrency slots for an upstream API while a request is in flight.
+
+    The number of slots per source comes from UPSTREAM_CONCURRENCY and keeps concurrent
+    fetching inside each provider's rate limits.
+
+    Args:
+        source (str): The upstream name, e.g. 'openweathermap' or 'thenewsapi'.
+    """
+    semaphore = _semaphores.get(source)
+    if semaphore is None:
+        limit = current_app.config['UPSTREAM_CONCURRENCY'].get(source, 1)
+        with _lock:
+            semaphore = _semaphores.setdefault(source, threading.BoundedSemaphore(limit))
+
+    with semaphore:
+        yield
+
+
+def _get_executor(app):
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=app.config['UPSTREAM_MAX_WORKERS'],
+                    thread_name_prefix='upstream',
+                )
+    return _executor
+
+
+def run_concurrently(func, items):
+    """
+    Calls func(item) for every item on the shared upstream thread pool.
+
+    Each call runs inside its own app context, so it gets its own db.session and the
+    session is removed when the call finishes.
+
+    Args:
+        func (callable): The function to call for each item.
+        items (iterable): Arguments, one per call.
+
+    Returns:
+        list: The results, in the same order as items.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    app = current_app._get_current_object()
+
+    def _call(item):
+        with app.app_context():
+            return func(item)
+
+    return list(_get_executor(app).map(_call, items))
+
+
+def run_alongside(funcs):
+    """
+    Calls every func() at once: the first in this thread, the others in threads of their own.
+
+    For resolvers that fan out onto the shared pool themselves (see run_concurrently()).
+    Running them as jobs of that pool would leave pool threads waiting on pool work, which
+    deadlocks once every thread is waiting. Each extra call runs inside its own app context.
+
+    Args:
+        funcs (list): Callables taking no arguments.
+
+    Returns:
+        list: The results, in the same order as funcs.
+
+    Raises:
+        Exception: The first exception raised by any of the calls, once all have finished.
+    """
+    funcs = list(funcs)
+    if len(funcs) <= 1:
+        return [func() for func in funcs]
+
+    app = current_app._get_current_object()
+    outcomes = [None] * len(funcs)
+
+    def _call(index):
+        try:
+            with app.app_context():
+                outcomes[index] = (funcs[index](), None)
+        except Exception as e:
+            outcomes[index] = (None, e)
+
+    threads = [threading.Thread(target=_call, args=(index,), name=f"resolve-{index}", daemon=True)
+               for index in range(1, len(funcs))]
+    for thread in threads:
+        thread.start()
+    try:
+        outcomes[0] = (funcs[0](), None)
+    except Exception as e:
+        outcomes[0] = (None, e)
+    for thread in threads:
+        thread.join()
+
+    for _, error in outcomes:
+        if error is not None:
+            raise error
+    return [result for result, _ in outcomes]
+
+
+def get_http_session():
+    """
+    Returns the process-wide requests.Session used for every upstream API call.
+
+    Sharing one session keeps TCP+TLS connections alive between calls; the adapter pool
+    is sized so every upstream worker thread can hold a connection per host.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                pool_size = current_app.config['UPSTREAM_MAX_WORKERS']
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def upstream_get(source, url, params=None):
+    """
+    Performs a GET against an upstream API with timeouts, retries and bookkeeping.
+
+    The request holds an upstream_slot() for the source while in flight. 429 and 5xx
+    responses, connection errors and timeouts are retried with jittered exponential
+    backoff, honoring Retry-After when the upstream sends it. Per-host request, retry,
+    error and latency counters are available from get_upstream_stats().
+
+    Args:
+        source (str): The upstream name used for concurrency limits, e.g. 'openweathermap'.
+        url (str): The URL to fetch.
+        params (dict): Query string parameters.
+
+    Returns:
+        requests.Response: The final response, which may still be an error status.
+
+    Raises:
+        requests.exceptions.RequestException: If the last attempt failed to get a response.
+    """
+    config = current_app.config
+    host = urlsplit(url).hostname
+    timeout = config['UPSTREAM_HOST_TIMEOUTS'].get(host, (config['UPSTREAM_CONNECT_TIMEOUT'], config['UPSTREAM_READ_TIMEOUT']))
+    attempts = config['UPSTREAM_MAX_RETRIES'] + 1
+    session = get_http_session()
+
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        started = time.perf_counter()
+        try:
+            with upstream_slot(source):
+                response = session.get(url, params=params, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _record(source, host, time.perf_counter() - started, error=True, retry=not last_attempt)
+            if last_attempt:
+                raise
+            delay = _backoff(attempt)
+            logger.warning("%s request to %s failed (%s), retrying in %.2fs", source, host, e, delay)
+            time.sleep(delay)
+            continue
+
+        elapsed = time.perf_counter() - started
+        if response.status_code in RETRY_STATUSES and not last_attempt:
+            _record(source, host, elapsed, error=True, retry=True)
+            delay = _retry_after(response) or _backoff(attempt)
+            logger.warning("%s returned %s from %s, retrying in %.2fs", source, response.status_code, host, delay)
+            time.sleep(delay)
+            continue
+
+        _record(source, host, elapsed, error=response.status_code >= 400)
+        return response
+
+
+def get_upstream_stats():
+    """
+    Returns a snapshot of the per-host upstream counters.
+
+    Returns:
+        dict: host -> {'requests', 'errors', 'retries', 'latency_seconds'}
+    """
+    with _lock:
+        return {host: dict(counters) for host, counters in _stats.items()}
+
+
+def _record(source, host, latency, error=False, retry=False):
+    UPSTREAM_REQUESTS.inc(source)
+    UPSTREAM_SECONDS.observe(latency, source)
+    if error:
+        UPSTREAM_ERRORS.inc(source)
+    if retry:
+        UPSTREAM_RETRIES.inc(source)
+
+    with _lock:
+        counters = _stats[host]
+        counters['requests'] += 1
+        counters['latency_seconds'] += latency
+        if error:
+            counters['errors'] += 1
+        if retry:
+            counters['retries'] += 1
+
+
+def _backoff(attempt):
+    config = current_app.config
+    ceiling = min(config['UPSTREAM_MAX_BACKOFF'], config['UPSTREAM_BACKOFF_BASE'] * (2 ** attempt))
+    return random.uniform(0, ceiling)  # Full jitter
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), current_app.config['UPSTREAM_MAX_BACKOFF'])
@@ -2,20 +2,20 @@ from app.models import User  # Ensure User is imported correctly
 import logging
 from app import db
 from sqlalchemy import text
+from app.services.metrics_service import STAGE_SECONDS, USERS_LOADED
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# ->0 is NULL for empty lists and non-list values alike
+SUBSCRIBED = "(users.subscriptions->'subscriptions'->0) IS NOT NULL"
+
 def get_all_users():
     logger.info("Attempting to retrieve the first user from the database")
 
     try:
-        # Test the database connection
-        logger.debug("Testing database connection...")
-        result = db.session.execute(text('SELECT 1'))  # Simple query to check DB connection
-        logger.debug("Database connection successful: %s", result)
-
-        user = User.query.get(1)  # Retrieve the first user
+        # Stale pooled connections are caught by pool_pre_ping, so no separate SELECT 1 here
+        user = db.session.get(User, 1)  # Retrieve the first user
         if user:
             logger.info("Successfully retrieved user: %s", user)
         else:
@@ -26,3 +26,104 @@ def get_all_users():
     except Exception as e:
         logger.error("Error fetching user: %s", e)
         return None
+
+
+def iter_subscribed_users(start_id=None, end_id=None, batch_size=500):
+    """
+    Streams every user with at least one subscription, ordered by id.
+
+    Users are read with keyset pagination on users.id, one batch at a time, so
+    memory stays flat regardless of audience size. Rows are plain column tuples
+    rather than ORM instances, which keeps them out of the session identity map.
+
+    Args:
+        start_id (int): Lowest user id to include (inclusive). Defaults to the first user.
+        end_id (int): Highest user id to include (inclusive). Defaults to the last user.
+        batch_size (int): Number of users fetched per round trip.
+
+    Yields:
+        Row: A row exposing id, email, first_name and subscriptions.
+    """
+    last_id = start_id - 1 if start_id is not None else None
+
+    while True:
+        query = db.session.query(User.id, User.email, User.first_name, User.subscriptions).filter(text(SUBSCRIBED))
+        if last_id is not None:
+            query = query.filter(User.id > last_id)
+        if end_id is not None:
+            query = query.filter(User.id <= end_id)
+
+        with STAGE_SECONDS.time('load_users'):
+            batch = query.order_by(User.id).limit(batch_size).all()
+        if not batch:
+            return
+        USERS_LOADED.inc(amount=len(batch))
+
+        logger.debug("Loaded batch of %d users starting at id %s", len(batch), batch[0].id)
+        yield from batch
+
+        last_id = batch[-1].id
+        if len(batch) < batch_size:
+            return
+
+
+def count_subscribed_users(start_id=None, end_id=None):
+    """
+    Counts the subscribed users in an id range (inclusive; None means unbounded).
+    """
+    return db.session.execute(text(f"""
+        SELECT count(*) FROM users
+        WHERE {SUBSCRIBED}
+          AND (CAST(:start_id AS integer) IS NULL OR id >= :start_id)
+          AND (CAST(:end_id AS integer) IS NULL OR id <= :end_id)
+    """), {'start_id': start_id, 'end_id': end_id}).scalar()
+
+
+def split_subscribed_users(start_id=None, end_id=None, size=5000):
+    """
+    Splits the subscribed users into consecutive id ranges of about size users each.
+
+    Args:
+        start_id (int): Lowest user id to include (inclusive). Defaults to the first user.
+        end_id (int): Highest user id to include (inclusive). Defaults to the last user.
+        size (int): Subscribed users per range.
+
+    Returns:
+        list: (start_id, end_id) tuples covering the requested range; the last end_id is the
+            requested end_id, which may be None.
+    """
+    boundaries = db.session.execute(text(f"""
+        SELECT id FROM (
+            SELECT id, row_number() OVER (ORDER BY id) AS position
+            FROM users
+            WHERE {SUBSCRIBED}
+              AND (CAST(:start_id AS integer) IS NULL OR id >= :start_id)
+              AND (CAST(:end_id AS integer) IS NULL OR id <= :end_id)
+        ) numbered
+        WHERE (position - 1) % :size = 0
+        ORDER BY id
+    """), {'start_id': start_id, 'end_id': end_id, 'size': size}).scalars().all()
+
+    ranges = []
+    for index, first_id in enumerate(boundaries):
+        last_id = boundaries[index + 1] - 1 if index + 1 < len(boundaries) else end_id
+        ranges.append((first_id, last_id))
+    return ranges
+
+
+def distinct_subscriptions():
+    """
+    Returns each distinct subscription object found across users' subscription lists.
+
+    The de-duplication happens in Postgres, so only one row per distinct subscription
+    (e.g. one per city) leaves the database regardless of the number of users.
+
+    Returns:
+        list: Subscription dicts, e.g. {'name': 'WeatherUpdateNow', 'details': {...}}.
+    """
+    return db.session.execute(text("""
+        SELECT DISTINCT subscription
+        FROM users, jsonb_array_elements(users.subscriptions->'subscriptions') AS subscription
+        WHERE jsonb_typeof(users.subscriptions->'subscriptions') = 'array'
+          AND jsonb_typeof(subscription) = 'object'
+    """)).scalars().all()
@@ -0,0 +1,98 @@
+import importlib
+import logging
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Everything the routes and the newsletter pipeline import on first use; main_service
+# pulls in the weather, news, email, render and cache services with it
+SERVICE_MODULES = (
+    'app.models',
+    'app.services.main_service',
+    'app.services.job_service',
+)
+
+_lock = threading.Lock()
+_preloaded = None
+
+
+def preload_modules():
+    """
+    Imports the service modules and compiles the email templates, once per process.
+
+    Needs no app context or database, so gunicorn runs it in the master before forking
+    (see gunicorn.conf.py) and every worker inherits the loaded modules.
+
+    Returns:
+        dict: Milliseconds spent on 'imports' and 'templates' by the call that did the work.
+    """
+    global _preloaded
+    with _lock:
+        if _preloaded is None:
+            started = time.perf_counter()
+            for name in SERVICE_MODULES:
+                importlib.import_module(name)
+            imported = time.perf_counter()
+
+            from app.services.render_service import precompile_templates
+            precompile_templates()
+
+            _preloaded = {
+                'imports': round((imported - started) * 1000, 2),
+                'templates': round((time.perf_counter() - imported) * 1000, 2),
+            }
+            logger.info("Preloaded service modules and templates: %s", _preloaded)
+    return _preloaded
+
+
+def open_database_pool(connections=None):
+    """
+    Checks out up to `connections` pooled connections at once and returns them to the pool,
+    so the first requests after a cold start do not each pay for a new connection.
+
+    Args:
+        connections (int): Connections to open. Defaults to WARMUP_DB_CONNECTIONS.
+
+    Returns:
+        float: Milliseconds taken.
+    """
+    connections = connections or current_app.config['WARMUP_DB_CONNECTIONS']
+    started = time.perf_counter()
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = db.engine.connect()
+            opened.append(connection)
+            connection.execute(text('SELECT 1'))
+    finally:
+        for connection in opened:
+            connection.close()
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def warm_up():
+    """
+    Preloads modules and templates and opens the database pool.
+
+    Module loading happens once per process; the database is checked on every call, so
+    this doubles as the readiness check.
+
+    Returns:
+        tuple: (report (dict), error_message (str)). The report holds the create_app()
+            timings ('startup_ms'), the preload timings ('preload_ms') and the time taken
+            to reach the database ('database_ms').
+    """
+    report = {
+        'startup_ms': current_app.extensions.get('startup_timings', {}),
+        'preload_ms': preload_modules(),
+    }
+    try:
+        report['database_ms'] = open_database_pool()
+    except Exception as e:
+        logger.error("Readiness check could not reach the database: %s", e)
+        return report, f"Database unavailable: {str(e)}"
+    return report, None
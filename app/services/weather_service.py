@@ -1,187 +1,330 @@
 import requests
 import os
-from app.models import User, SubscriptionContent
+import re
+from app.models import SubscriptionContent, WeatherLocation
 import logging
 #from sqlalchemy import func
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 from app import db
-import pytz
-from sqlalchemy import text
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.services.upstream_service import upstream_get, run_concurrently
+from app.services.metrics_service import CACHE_REQUESTS
+from flask import current_app
+from app.services.render_service import render_email_template
 #from sqlalchemy.dialects.postgresql import JSONB
 #from sqlalchemy import cast, Date
 #from sqlalchemy import String
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
 
-def fetch_and_save_weather(location, units="metric"): # I dont think units work in this api call request? 
-    url = f'https://api.openweathermap.org/data/2.5/weather?q={location}&appid={WEATHER_API_KEY}&units={units}'
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
+# The OpenWeatherMap group endpoint accepts at most this many city IDs per call
+GROUP_BATCH_SIZE = 20
 
-        response = response.json()
-        #logger.info("Response going into save weathe data: ", response)
+# Weather is fetched, stored and cached in one unit system and converted per user when
+# rendered, so one fetch per location serves imperial and metric users alike
+CANONICAL_UNITS = 'metric'
+DEFAULT_UNITS = 'imperial'  # For subscriptions that do not say
+UNIT_LABELS = {'imperial': '°F', 'metric': '°C', 'standard': 'K'}
 
-        # Save weather data to Subscription Content table
-        save_weather_data(response)
 
-        # Save the resp into the Sbscription Content Dict. 
-        return response, None
+def normalize_units(units):
+    """
+    Returns a user's units as one of UNIT_LABELS, falling back to DEFAULT_UNITS.
+    """
+    units = units.strip().lower() if isinstance(units, str) else None
+    return units if units in UNIT_LABELS else DEFAULT_UNITS
+
+
+def convert_temperature(celsius, units):
+    """
+    Converts a temperature in CANONICAL_UNITS (°C) to the given units.
+    """
+    if units == 'imperial':
+        return celsius * 9 / 5 + 32
+    if units == 'standard':
+        return celsius + 273.15
+    return celsius
+
+
+def fetch_weather(location):
+    """
+    Fetches current weather for one location by name, in CANONICAL_UNITS, without saving it.
+
+    Returns:
+        tuple: (weather_data (dict), error_message (str))
+    """
+    url = f"{current_app.config['OPENWEATHER_BASE_URL']}/data/2.5/weather"
+    params = {'q': location, 'appid': WEATHER_API_KEY, 'units': CANONICAL_UNITS}
+    try:
+        response = upstream_get('openweathermap', url, params=params)
+        response.raise_for_status()
+        return response.json(), None
     except requests.exceptions.RequestException as e:
         return None, f"Error: {str(e)}"
 
-# Assuming SubscriptionContent and db are already imported
-def save_weather_data(weather_data):
-    try:
-        # Create a new SubscriptionContent entry without providing the 'id' field
-        new_subscription_content = SubscriptionContent(
-            subscription_type="WeatherUpdateNow",  # Example subscription type
-            result=weather_data,  # Weather data from the API response
-            fetch_date=datetime.utcnow()  # Current UTC time
-        )
-        
-        # Add to the session and commit the transaction to save it in the database
-        db.session.add(new_subscription_content)
-        db.session.commit()
-        logging.info("Weather data saved successfully")
 
+def fetch_weather_group(city_ids):
+    """
+    Fetches current weather for many cities using the group endpoint, 20 city IDs per call,
+    in CANONICAL_UNITS.
+
+    Args:
+        city_ids (iterable): OpenWeatherMap city IDs.
+
+    Returns:
+        tuple: (weather_by_id (dict of city ID -> weather data), errors (dict of city ID -> message))
+    """
+    city_ids = list(dict.fromkeys(city_ids))
+    url = f"{current_app.config['OPENWEATHER_BASE_URL']}/data/2.5/group"
+    weather_by_id, errors = {}, {}
+
+    for start in range(0, len(city_ids), GROUP_BATCH_SIZE):
+        chunk = city_ids[start:start + GROUP_BATCH_SIZE]
+        params = {'id': ",".join(str(city_id) for city_id in chunk), 'appid': WEATHER_API_KEY, 'units': CANONICAL_UNITS}
+        try:
+            response = upstream_get('openweathermap', url, params=params)
+            response.raise_for_status()
+            for item in response.json().get('list', []):
+                weather_by_id[item['id']] = item
+        except (requests.exceptions.RequestException, ValueError) as e:
+            for city_id in chunk:
+                errors[city_id] = f"Error: {str(e)}"
+
+    for city_id in city_ids:
+        if city_id not in weather_by_id and city_id not in errors:
+            errors[city_id] = "City missing from group response"
+
+    return weather_by_id, errors
+
+
+def fetch_and_save_weather_batch(locations, known_locations=None):
+    """
+    Fetches weather for many locations with as few upstream calls as possible and saves
+    every result in one bulk insert.
+
+    Locations are resolved to city IDs once (see get_weather_locations()), then known
+    cities are fetched 20 at a time from the group endpoint. A spelling seen for the first
+    time is resolved with a by-name call, whose response doubles as its weather.
+
+    Args:
+        locations (iterable): Location names as entered by users.
+        known_locations (dict): Optional result of get_weather_locations() for these
+            locations, when the caller already looked them up.
+
+    Returns:
+        dict: location -> (weather_data (dict), error_message (str))
+    """
+    locations = list(dict.fromkeys(locations))
+    results = {}
+
+    if known_locations is None:
+        known_locations = get_weather_locations(locations)
+        db.session.close()  # Don't hold the lookup's connection across upstream calls
+    city_ids = {location: known_locations[location]['city_id'] for location in locations if location in known_locations}
+
+    # First sighting of a spelling: the by-name call resolves the city ID and returns its weather
+    unknown = [location for location in locations if location not in city_ids]
+    resolved = {}
+    for location, (data, error) in zip(unknown, run_concurrently(fetch_weather, unknown)):
+        results[location] = (data, error)
+        if data and 'id' in data:
+            city_ids[location] = data['id']
+            resolved[location] = data
+    save_weather_locations(resolved)
+
+    known = [location for location in locations if location not in results]
+    weather_by_id, errors = fetch_weather_group([city_ids[location] for location in known])
+    for location in known:
+        city_id = city_ids[location]
+        results[location] = (weather_by_id.get(city_id), errors.get(city_id))
+
+    save_weather_data_bulk([data for data, error in results.values() if data])
+    return results
+
+
+def normalize_location(location):
+    """
+    Returns the spelling a location is stored under in weather_locations: case-folded,
+    with runs of whitespace collapsed and commas followed by a single space, so
+    " New  York,US" and "new york, us" share a row.
+    """
+    location = re.sub(r'\s*,\s*', ', ', str(location or ''))
+    return " ".join(location.split()).casefold()[:255]
+
+
+def location_from_weather(weather_data):
+    """
+    Extracts the canonical city of an OpenWeatherMap current weather response.
+    """
+    coord = weather_data.get('coord') or {}
+    return {
+        'city_id': weather_data['id'],
+        'name': weather_data.get('name') or '',
+        'country': (weather_data.get('sys') or {}).get('country'),
+        'lat': coord.get('lat'),
+        'lon': coord.get('lon'),
+    }
+
+
+def get_weather_locations(locations):
+    """
+    Looks up the city each location was resolved to, with one query on weather_locations.
+
+    Lookups are counted in newsletter_cache_requests_total under cache="WeatherLocation".
+
+    Args:
+        locations (iterable): Location names as entered by users.
+
+    Returns:
+        dict: location -> {'city_id', 'name', 'country', 'lat', 'lon'}, for the locations
+            whose spelling has been resolved before.
+    """
+    spellings = {location: normalize_location(location) for location in locations if location}
+    if not spellings:
+        return {}
+
+    try:
+        rows = db.session.execute(
+            select(WeatherLocation).where(WeatherLocation.location.in_(set(spellings.values())))
+        ).scalars().all()
     except SQLAlchemyError as e:
-        # Handle any SQLAlchemy errors (like unique constraint violations)
-        db.session.rollback()  # Rollback the transaction if error occurs
-        logging.error(f"Weather fetch failed: Database error: {str(e)}")
-        return None, f"Database error: {str(e)}"
-
-    except Exception as e:
-        # Handle any other unexpected errors
-        logging.error(f"Unexpected error occurred while saving weather data: {str(e)}")
-        return None, f"Error: {str(e)}"
+        db.session.rollback()
+        logger.error("Weather location lookup failed: %s", e)
+        rows = []
 
-    return new_subscription_content, None  # Return the saved record and no error
+    by_spelling = {row.location: {
+        'city_id': row.city_id, 'name': row.name, 'country': row.country, 'lat': row.lat, 'lon': row.lon,
+    } for row in rows}
+    found = {location: by_spelling[spelling] for location, spelling in spellings.items() if spelling in by_spelling}
+    CACHE_REQUESTS.inc('WeatherLocation', 'hit', amount=len(found))
+    CACHE_REQUESTS.inc('WeatherLocation', 'miss', amount=len(spellings) - len(found))
+    return found
 
-from sqlalchemy.sql import text
-from datetime import datetime
 
-def fetch_weather_from_db_raw(location):
+def save_weather_locations(weather_by_location):
     """
-    Fetch weather data using a raw SQL query.
+    Records the city each newly seen location resolved to, so later lookups of the same
+    spelling skip the by-name call and share the city's cached weather.
+
+    Args:
+        weather_by_location (dict): location -> the weather response a by-name call returned for it.
+
+    Returns:
+        tuple: (saved_count (int), error_message (str))
+    """
+    now = datetime.utcnow()
+    rows = {}
+    for location, weather_data in weather_by_location.items():
+        spelling = normalize_location(location)
+        if spelling and weather_data and 'id' in weather_data:
+            rows[spelling] = {'location': spelling, **location_from_weather(weather_data), 'resolved_at': now}
+    if not rows:
+        return 0, None
+
+    statement = pg_insert(WeatherLocation).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=[WeatherLocation.location],
+        set_={column: statement.excluded[column] for column in ('city_id', 'name', 'country', 'lat', 'lon', 'resolved_at')},
+    )
+    try:
+        db.session.execute(statement)
+        db.session.commit()
+        logger.info("Resolved %d new weather locations", len(rows))
+        return len(rows), None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Weather location save failed: Database error: %s", str(e))
+        return 0, f"Database error: {str(e)}"
+
+
+def save_weather_data_bulk(weather_data_list):
+    """
+    Saves many weather responses to subscription_content with a single INSERT.
+
+    The table is a dated record of what was fetched, kept for CONTENT_RETENTION_DAYS; nothing
+    reads it back to resolve weather, so it carries no lookup indexes.
+
+    Returns:
+        tuple: (saved_count (int), error_message (str))
     """
+    if not weather_data_list:
+        return 0, None
+
+    now = datetime.utcnow()
     try:
-        # Get today's date in UTC
-        utc_now = datetime.utcnow().date()
-
-        # Raw SQL query
-        query = text("""
-            SELECT *
-            FROM subscription_content
-            WHERE subscription_type = :subscription_type
-              AND result->>'name' = :location
-              AND fetch_date >= :fetch_date
-            ORDER BY fetch_date DESC
-            LIMIT 1;
-        """)
-
-        # Execute the query with bound parameters
-        result = db.session.execute(query, {
-            'subscription_type': 'WeatherUpdateNow',
-            'location': location,
-            'fetch_date': utc_now
-        }).fetchone()
-
-        if result:
-            # Safely convert Row to a dictionary
-            result_dict = dict(result._mapping)
-            logger.info("Weather data result from DB: %s", result_dict)
-            result_dict = result_dict['result']
-            logger.info("Weather data after indexed: %s", result_dict)
-            return result_dict, None
-        else:
-            return None, "No matching weather data found in the database."
-    except Exception as e:
-        logger.exception("Error fetching weather data using raw SQL: %s", str(e))
-        return None, f"Error fetching weather data: {str(e)}"
-
-
-def format_HTML_weather_container(weather_data):
+        db.session.execute(insert(SubscriptionContent), [
+            {'subscription_type': 'WeatherUpdateNow', 'result': weather_data, 'fetch_date': now}
+            for weather_data in weather_data_list
+        ])
+        db.session.commit()
+        logger.info("Saved %d weather results", len(weather_data_list))
+        return len(weather_data_list), None
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error("Bulk weather save failed: Database error: %s", str(e))
+        return 0, f"Database error: {str(e)}"
+
+def format_HTML_weather_container(weather_data, units=DEFAULT_UNITS):
     """
     Formats weather results into a minimal and clean HTML container, inspired by James Clear's newsletter style.
 
     Args:
-        weather_data (dict): Dictionary containing weather results.
+        weather_data (dict): Dictionary containing weather results, in CANONICAL_UNITS.
+        units (str): The units to display, 'imperial', 'metric' or 'standard'.
 
     Returns:
         str: HTML formatted weather data.
     """
+    return render_email_template('weather.html', weather=weather_template_context(weather_data, units))
+
+
+def weather_template_context(weather_data, units=DEFAULT_UNITS):
+    """
+    Extracts the values the weather template displays from a weather API response,
+    converting temperatures from CANONICAL_UNITS to the user's units.
+
+    Args:
+        weather_data (dict): Dictionary containing weather results, in CANONICAL_UNITS.
+        units (str): The units to display, 'imperial', 'metric' or 'standard'.
+
+    Returns:
+        dict or None: Template values, or None if the data cannot be displayed.
+    """
     try:
-        logger.info("Formatting weather data: %s", weather_data)
-        
-        # Extract weather data
-        location = weather_data.get("name", "Unknown Location")
-        temperature = round_temperature(weather_data["main"].get("temp", "N/A"))  # Round temp
-        temp_min = round_temperature(weather_data["main"].get("temp_min", "N/A"))  # Round temp_min
-        temp_max = round_temperature(weather_data["main"].get("temp_max", "N/A"))  # Round temp_max
         condition = weather_data["weather"][0].get("description", "N/A").capitalize()  # Capitalize condition
-        
+
         # Get current date and day of the week
         today = datetime.today()
-        day_of_week = today.strftime("%A")
-        current_date = today.strftime("%d %b %Y")
-        
-        # Define a placeholder icon
-        weather_icon = get_weather_icon(condition)
-        
-        # Create the HTML content for the weather update
-        html = f"""
-            <div style="font-family: 'Quicksands', sans-serif; color: #333333; padding: 20px; background-color: #FFFFFF; border-radius: 8px; max-width: 600px; margin: 20px auto; box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);">
-
-                <!-- Header -->
-                <div style="text-align: left; margin-bottom: 20px; border-bottom: 1px solid #EAEAEA; padding-bottom: 10px;">
-                    <h1 style="font-size: 20px; margin: 5px 0; color: #222;">Latest Weather</h1>
-                </div>
-                
-                <div style="margin-bottom: 20px; padding: 10px; border: 1px solid #CFA488; border-radius: 8px; background-color: #FFFFFF;">
-                    <!-- Date -->
-                    <div style="text-align: left; margin-bottom: 15px;">
-                        <h3 style="font-size: 16px; margin: 5px 0; color: #777;">{day_of_week}</h3>
-                        <p style="font-size: 12px; margin: 0; color: #777;">{current_date}</p>
-                        <p style="font-size: 12px; margin: 0; color: #777;">{location}, {weather_data.get('sys', {}).get('country', '')}</p>
-                    </div>
-                    
-                    <!-- Weather Icon and Temperature in Columns -->
-                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                        <!-- Weather Icon -->
-                        <div style="flex: 1; text-align: center;">
-                            <div style="font-size: 40px; margin-bottom: 5px; color: #CFA488;">{weather_icon}</div>
-                        </div>
-                        
-                        <!-- Temperature -->
-                        <div style="flex: 2; text-align: center;">
-                            <p style="font-size: 48px; margin: 0; color: #222;">{temperature}°F</p>
-                            <p style="font-size: 16px; margin: 5px 0; color: #666;">{condition}</p>
-                        </div>
-                    </div>
-                    
-                    <!-- High/Low Temperatures -->
-                    <div style="display: flex; justify-content: space-evenly; align-items: center; font-size: 14px; color: #555;">
-                        <div style="text-align: center;">
-                            <p style="margin: 0; font-size: 12px; color: #CFA488;">&#x25B2; {temp_max}°F</p>
-                        </div>
-                        <div style="text-align: center;">
-                            <p style="margin: 0; font-size: 12px; color: #87AFC7;">&#x25BC; {temp_min}°F</p>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            """
-
-        return html
-    except Exception as e:
+
+        return {
+            "location": weather_data.get("name", "Unknown Location"),
+            "country": weather_data.get('sys', {}).get('country', ''),
+            "temperature": display_temperature(weather_data["main"].get("temp", "N/A"), units),
+            "temp_min": display_temperature(weather_data["main"].get("temp_min", "N/A"), units),
+            "temp_max": display_temperature(weather_data["main"].get("temp_max", "N/A"), units),
+            "unit_label": UNIT_LABELS[units],
+            "condition": condition,
+            "icon": get_weather_icon(condition),
+            "day_of_week": today.strftime("%A"),
+            "current_date": today.strftime("%d %b %Y"),
+        }
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
         logger.error("Error formatting weather container: %s", str(e))
-        return "<div>Error formatting weather data.</div>"
+        return None
+
+def display_temperature(value, units):
+    """
+    Converts a temperature in CANONICAL_UNITS to the given units and rounds it, or returns 'N/A'.
+    """
+    try:
+        return round_temperature(convert_temperature(float(value), units))
+    except (ValueError, TypeError):
+        return "N/A"
+
 
 def round_temperature(value):
     """
@@ -227,46 +370,3 @@ def get_weather_icon(description):
         return "🌦️"  # Drizzle icon
     else:
         return "❓"  # Unknown/Default icon
-    
-
-
-
-        html = f"""
-        <div style="font-family: 'Quicksands', sans-serif; color: #333; padding: 10px; background-color: #FFF; border-radius: 8px; max-width: 600px; margin: 10px auto; box-shadow: 0 1px 2px rgba(0, 0, 0, 0.1);">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-
-                <!-- First Column: Large Temperature -->
-                <div style="flex: 0 0 25%; text-align: center;">
-                    <p style="font-size: 40px; font-weight: bold; color: #CFA488; margin: 5px 0;">{temperature}°F</p>
-                </div>
-                
-                <!-- Second Column: Icon and Min/Max Temps -->
-                <div style="flex: 0 0 15%; text-align: center;">
-                    <!-- Weather Icon -->
-                    <div style="font-size: 30px; color: #CFA488; margin-bottom: 5px;">{weather_icon}</div>
-                    <!-- Min/Max Temps -->
-                    <div style="font-size: 12px; color: #555;">
-                        <p style="margin: 0; color: #CFA488;">&#x25B2; {temp_max}°F</p>
-                        <p style="margin: 0; color: #87AFC7;">&#x25BC; {temp_min}°F</p>
-                    </div>
-                </div>
-                
-                <!-- Third Column: Date and Location -->
-                <div style="flex: 0 0 60%; padding-left: 10px; display: flex; flex-direction: column; justify-content: space-between;">
-                    <!-- Location and Country -->
-                    <div style="font-size: 12px; text-align: left; color: #555;">
-                        <p style="margin: 2px 0;">{location}, {weather_data.get('sys', {}).get('country', '')}</p>
-                    </div>
-                    <!-- Date -->
-                    <div style="font-size: 12px; text-align: left; color: #555;">
-                        <p style="margin: 2px 0;">{day_of_week}</p>
-                        <p style="margin: 2px 0;">{current_date}</p>
-                    </div>
-                    <!-- Condition -->
-                    <div style="font-size: 12px; text-align: right; color: rgba(102, 102, 102, 0.8); margin-top: auto;">
-                        <p style="margin: 2px 0; font-style: italic;">{condition}</p>
-                    </div>
-                </div>
-            </div>
-        </div>
-        """
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Measures cold start of the web process against a budget.
+
+Times a bare `import run` (interpreter start, imports and create_app) in fresh
+interpreters, then starts gunicorn with gunicorn.conf.py and polls /ready until it
+answers 200, as Fly's check does on a machine started from zero. Reports the time to
+the first ready response, the startup and warm-up timings /ready returns, and the
+latency of a second, warm /ready. Prints JSON and exits with status 1 if the time to
+ready exceeds --budget-ms.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/newsletter_bench \
+        python benchmarks/cold_start.py --budget-ms 3000
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def time_import(env, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import run'], cwd=ROOT, env=env, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'min_ms': round(min(timings), 1), 'p50_ms': round(statistics.median(timings), 1)}
+
+
+def get_ready(url):
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=10) as response:
+        body = json.load(response)
+    return body, round((time.perf_counter() - started) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--budget-ms', type=float, default=3000, help="Allowed time from process start to ready")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters timed for `import run`")
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=os.environ['BENCH_DATABASE_URL'], LOG_FILE='',
+               LOG_LEVEL='WARNING', PORT=str(port), WEB_CONCURRENCY=str(args.workers))
+    report = {'budget_ms': args.budget_ms, 'workers': args.workers, 'import_run': time_import(env, args.repeat)}
+
+    url = f"http://127.0.0.1:{port}/ready"
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                body, _ = get_ready(url)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.perf_counter() - started > args.timeout or server.poll() is not None:
+                    raise SystemExit(f"Web process was not ready within {args.timeout}s")
+                time.sleep(0.01)
+        report['time_to_ready_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        report['first_ready'] = body
+        report['warm_ready_ms'] = get_ready(url)[1]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=10)
+
+    report['within_budget'] = report['time_to_ready_ms'] <= args.budget_ms
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['within_budget'] else 1)
+
+
+if __name__ == '__main__':
+    main()
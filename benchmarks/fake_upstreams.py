@@ -0,0 +1,135 @@
+"""
+Local stand-ins for the OpenWeatherMap and TheNewsAPI endpoints the app calls.
+
+Responses have the same shape as the real APIs and are deterministic for a given input.
+Every request is counted per path so benchmarks can report upstream call volume.
+"""
+import json
+import socket
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def canonical_name(location):
+    # Like OpenWeatherMap, matching ignores case, extra whitespace and a trailing country code
+    return " ".join(location.split(',')[0].split()).title()
+
+
+def city_id(location):
+    return zlib.crc32(canonical_name(location).casefold().encode('utf-8')) % 10_000_000
+
+
+def weather_for(city, name, units='metric'):
+    temp = 5 + city % 25  # Celsius
+    if units == 'imperial':
+        temp = temp * 9 / 5 + 32
+    elif units == 'standard':
+        temp = temp + 273.15
+    return {
+        'id': city,
+        'name': name,
+        'coord': {'lat': round((city % 180) - 90 + 0.5, 4), 'lon': round((city % 360) - 180 + 0.5, 4)},
+        'sys': {'country': 'US'},
+        'main': {'temp': temp, 'temp_min': temp - 3, 'temp_max': temp + 4},
+        'weather': [{'description': ('clear sky', 'light rain', 'broken clouds', 'snow')[city % 4]}],
+    }
+
+
+def articles_for(language, categories, limit):
+    today = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.000000Z')
+    return [{
+        'uuid': f"{language}-{category}-{index}",
+        'title': f"{category.title()} story {index}",
+        'description': f"Synthetic {category} article {index}.",
+        'url': f"https://news.example.com/{language}/{category}/{index}",
+        'image_url': '',
+        'language': language,
+        'published_at': today,
+        'source': 'example.com',
+        'categories': [category],
+    } for index in range(limit) for category in categories][:limit]
+
+
+class FakeUpstreams:
+    """
+    Serves fake upstream APIs on a local port until stop() is called.
+
+    Attributes:
+        url (str): Base URL to use for OPENWEATHER_BASE_URL and NEWS_API_BASE_URL.
+        calls (Counter): Requests served per path.
+        spans (list): (path, started, finished) per request, in time.monotonic() seconds.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def _handler(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; don't let Nagle delay the body
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                started = time.monotonic()
+                with upstreams._lock:
+                    upstreams.calls[parts.path] += 1
+                if upstreams.latency:
+                    threading.Event().wait(upstreams.latency)
+                with upstreams._lock:
+                    upstreams.spans.append((parts.path, started, time.monotonic()))
+
+                units = query.get('units', 'standard')
+                if parts.path == '/data/2.5/weather':
+                    body = weather_for(city_id(query['q']), canonical_name(query['q']), units)
+                elif parts.path == '/data/2.5/group':
+                    ids = [int(value) for value in query['id'].split(',')]
+                    body = {'cnt': len(ids), 'list': [weather_for(value, f"City {value}", units) for value in ids]}
+                elif parts.path == '/v1/news/top':
+                    categories = [c for c in query.get('categories', 'general').split(',') if c]
+                    body = {'meta': {}, 'data': articles_for(query.get('language', 'en'), categories, int(query.get('limit', 3)))}
+                else:
+                    self.send_error(404)
+                    return
+
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,322 @@
+"""
+Frozen copy of the f-string renderers the newsletter used before the Jinja2 templates,
+kept only so benchmarks/render.py can compare against them. Not used by the app.
+"""
+from datetime import datetime, timezone, timedelta
+
+
+def format_HTML_weather_container(weather_data):
+    """
+    Formats weather results into a minimal and clean HTML container, inspired by James Clear's newsletter style.
+
+    Args:
+        weather_data (dict): Dictionary containing weather results.
+
+    Returns:
+        str: HTML formatted weather data.
+    """
+    try:
+        # Extract weather data
+        location = weather_data.get("name", "Unknown Location")
+        temperature = round_temperature(weather_data["main"].get("temp", "N/A"))  # Round temp
+        temp_min = round_temperature(weather_data["main"].get("temp_min", "N/A"))  # Round temp_min
+        temp_max = round_temperature(weather_data["main"].get("temp_max", "N/A"))  # Round temp_max
+        condition = weather_data["weather"][0].get("description", "N/A").capitalize()  # Capitalize condition
+        
+        # Get current date and day of the week
+        today = datetime.today()
+        day_of_week = today.strftime("%A")
+        current_date = today.strftime("%d %b %Y")
+        
+        # Define a placeholder icon
+        weather_icon = get_weather_icon(condition)
+        
+        # Create the HTML content for the weather update
+        html = f"""
+            <div style="font-family: 'Quicksands', sans-serif; color: #333333; padding: 20px; background-color: #FFFFFF; border-radius: 8px; max-width: 600px; margin: 20px auto; box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);">
+
+                <!-- Header -->
+                <div style="text-align: left; margin-bottom: 20px; border-bottom: 1px solid #EAEAEA; padding-bottom: 10px;">
+                    <h1 style="font-size: 20px; margin: 5px 0; color: #222;">Latest Weather</h1>
+                </div>
+                
+                <div style="margin-bottom: 20px; padding: 10px; border: 1px solid #CFA488; border-radius: 8px; background-color: #FFFFFF;">
+                    <!-- Date -->
+                    <div style="text-align: left; margin-bottom: 15px;">
+                        <h3 style="font-size: 16px; margin: 5px 0; color: #777;">{day_of_week}</h3>
+                        <p style="font-size: 12px; margin: 0; color: #777;">{current_date}</p>
+                        <p style="font-size: 12px; margin: 0; color: #777;">{location}, {weather_data.get('sys', {}).get('country', '')}</p>
+                    </div>
+                    
+                    <!-- Weather Icon and Temperature in Columns -->
+                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
+                        <!-- Weather Icon -->
+                        <div style="flex: 1; text-align: center;">
+                            <div style="font-size: 40px; margin-bottom: 5px; color: #CFA488;">{weather_icon}</div>
+                        </div>
+                        
+                        <!-- Temperature -->
+                        <div style="flex: 2; text-align: center;">
+                            <p style="font-size: 48px; margin: 0; color: #222;">{temperature}°F</p>
+                            <p style="font-size: 16px; margin: 5px 0; color: #666;">{condition}</p>
+                        </div>
+                    </div>
+                    
+                    <!-- High/Low Temperatures -->
+                    <div style="display: flex; justify-content: space-evenly; align-items: center; font-size: 14px; color: #555;">
+                        <div style="text-align: center;">
+                            <p style="margin: 0; font-size: 12px; color: #CFA488;">&#x25B2; {temp_max}°F</p>
+                        </div>
+                        <div style="text-align: center;">
+                            <p style="margin: 0; font-size: 12px; color: #87AFC7;">&#x25BC; {temp_min}°F</p>
+                        </div>
+                    </div>
+                </div>
+            </div>
+            """
+
+        return html
+    except Exception as e:
+        return "<div>Error formatting weather data.</div>"
+
+
+def round_temperature(value):
+    """
+    Rounds the temperature value to the nearest whole number.
+
+    Args:
+        value (float): The temperature value.
+
+    Returns:
+        int or str: The rounded temperature value as an integer, or 'N/A' if the input is invalid.
+    """
+    try:
+        return round(float(value))
+    except (ValueError, TypeError):
+        return "N/A"
+
+
+def get_weather_icon(description):
+    """
+    Returns an emoji representing the weather based on the description.
+    
+    :param description: str, a brief weather description (e.g., 'clear sky', 'light rain')
+    :return: str, an emoji representing the weather
+    """
+    description = description.lower()  # Normalize to lowercase for matching
+    
+    # Mapping descriptions to icons
+    if "clear" in description:
+        if "night" in description:
+            return "🌙"  # Night icon
+        return "☀️"  # Sun icon
+    elif "cloud" in description or "clouds" in description:
+        return "☁️"  # Cloud icon
+    elif "rain" in description or "shower" in description:
+        return "🌧️"  # Rain icon
+    elif "snow" in description:
+        return "❄️"  # Snow icon
+    elif "thunder" in description or "storm" in description:
+        return "🌩️"  # Thunderstorm icon
+    elif "mist" in description or "fog" in description or "haze" in description:
+        return "🌫️"  # Mist/Fog icon
+    elif "drizzle" in description:
+        return "🌦️"  # Drizzle icon
+    else:
+        return "❓"  # Unknown/Default icon
+
+
+def format_HTML_news_container(articles):
+    """
+    Formats news results into an HTML container with an improved layout and readability.
+    Args:
+        articles (list): List of dictionaries containing news article data.
+    Returns:
+        str: HTML formatted news data.
+    """
+    try:
+        # Initialize the main container
+        html_content = """
+        <div style="font-family: 'Arial', sans-serif; color: #333; padding: 10px; background-color: #FFF; max-width: 600px; margin: 0 auto;">
+        """
+
+        # Add a header for the news section
+        html_content += """
+        <div style="text-align: left; margin-bottom: 15px; border-bottom: 1px solid #EAEAEA; padding-bottom: 10px;">
+            <h1 style="font-size: 18px; margin: 0; color: #222;">News</h1>
+        </div>
+        """
+
+        # Loop through each article and format the content
+        for article in articles:
+            title = article.get("title", "Unknown title")
+            description = article.get("description", "N/A")
+            published_at = article.get("published_at", "N/A")
+            url = article.get("url", "#")
+            source = article.get("source", "Unknown source")
+            image_url = article.get("image_url", "")
+
+            # Remove .com from source
+            source = remove_suffix(source)
+
+            published_at = format_datetime_to_est(published_at)
+            # Create the article block
+            html_content += f"""
+            <div style="display: flex; align-items: flex-start; margin-bottom: 10px; padding: 8px; border-bottom: 1px solid #EAEAEA;">
+
+                <!-- Image Section -->
+                {"<div style='flex: 0 0 100px; margin-right: 10px;'><img src='" + image_url + "' alt='Article Image' style='width: 80px; height: 80px; object-fit: cover; border-radius: 4px;'></div>" if image_url else ""}
+
+                <!-- Text Section -->
+                <div style="flex: 1;">
+
+                    <!-- Title -->
+                    <h2 style="font-size: 16px; margin: 0 0 5px; color: #222; font-weight: bold; line-height: 1.2;">{title}</h2>
+
+                    <!-- Description -->
+                    <p style="font-size: 11px; color: #666; margin: 0 0 8px; line-height: 1.4;">{description}</p>
+
+                    <!-- Meta Info -->
+                    <p style="font-size: 9px; color: #999; margin: 0;">
+                        <span><strong>{source}</strong></span> &bull; <span>{published_at}</span> &bull; <span><a href="{url}" target="_blank" style="display: inline-block; margin-bottom: 2px; padding: 2px 4px; background-color: #CFA488; color: #FFF; font-size: 8px; font-weight: bold; text-decoration: none; border-radius: 4px;">Read More</a></span>
+                    </p>
+                </div>
+            </div>
+            """
+
+        # Close the main container
+        html_content += "</div>"
+
+        return html_content
+
+    except Exception as e:
+        return "<div>Error formatting news data.</div>"
+
+
+def format_datetime_to_est(timestamp):
+    try:
+        # Parse the original timestamp (assumes it is in UTC, indicated by "Z")
+        dt_utc = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
+        dt_utc = dt_utc.replace(tzinfo=timezone.utc)
+        
+        # Convert to EST (UTC-5, or UTC-4 during daylight saving time)
+        est_offset = timedelta(hours=-5)  # Adjust for standard time
+        dt_est = dt_utc.astimezone(timezone(est_offset))
+        
+        # Format the date and time without seconds
+        return dt_est.strftime("%I:%M %p EST")
+    
+    except Exception as e:
+        return "Invalid date"
+
+
+def remove_suffix(domain: str) -> str:
+    # Check if the string ends with '.com'
+    if domain.endswith('.com'):
+        # Remove the suffix '.com'
+        return domain[:-4]  # Slice off the last 4 characters
+    return domain  # Return the original string if no '.com'
+
+
+def add_email_headers(html_formatted_user_subscription_results):
+    """
+    Extracts each HTML subscription container from the dict and adds email header and footer.
+
+    Args:
+        html_formatted_user_subscription_results (dict): A dictionary containing the HTML formatted containers for each subscription.
+
+    Returns:
+        dict: A dictionary containing the HTML formatted email body with proper headers.
+    """
+    email_with_headers = {}
+
+
+    # Header inspired by James Clear's design
+    header = """
+    <html>
+        <head>
+            <style>
+                body {
+                    font-family: 'Tahoma', sans-serif;
+                    color: #333333;
+                    background-color: #FAFAFA;
+                    margin: 0;
+                    padding: 0;
+                }
+                .header-container {
+                    text-align: center;
+                    background-color: #F9F7F5;
+                    padding: 30px 0;
+                    border-bottom: 1px solid #EAEAEA;
+                }
+                .header-title {
+                    font-size: 24px;
+                    font-weight: bold;
+                    margin: 0;
+                    color: #222222;
+                }
+                .header-subtitle {
+                    font-size: 14px;
+                    color: #666666;
+                    margin: 5px 0 0;
+                }
+                .content-container {
+                    background-color: #FFFFFF;
+                    margin: 20px auto;
+                    padding: 30px;
+                    border-radius: 8px;
+                    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+                    max-width: 600px;
+                    font-family: 'Tahoma', sans-serif;
+                }
+                h1 {
+                    font-size: 22px;
+                    font-weight: bold;
+                    margin-top: 0;
+                    color: #222222;
+                }
+                p {
+                    font-size: 16px;
+                    line-height: 1.6;
+                    color: #555555;
+                }
+                .footer {
+                    text-align: center;
+                    padding: 20px 0;
+                    color: #999999;
+                    font-size: 12px;
+                }
+                .footer a {
+                    color: #888888;
+                    text-decoration: none;
+                }
+                .footer a:hover {
+                    text-decoration: underline;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="header-container">
+                <h1 class="header-title">Today's Newsletter</h1>
+                <p class="header-subtitle">"Content delivered, daily."</p>
+            </div>
+    """
+    
+    # Footer
+    footer = """
+            <div class="footer">
+                <p>You're receiving this email because you subscribed to our newsletter.</p>
+                <p>
+                    <a href="#">Unsubscribe</a> | 
+                    <a href="#">Manage Preferences</a>
+                </p>
+            </div>
+        </body>
+    </html>
+    """
+
+    # Adding headers and footers to the content
+    for key, content in html_formatted_user_subscription_results.items():
+        email_with_headers[key] = f"{header}{content}{footer}"
+
+    return email_with_headers
@@ -0,0 +1,136 @@
+"""
+Measures weather cache hit rates when users spell the same city differently.
+
+Seeds --users users with one weather subscription each, their cities drawn from a
+long-tailed distribution and each written in one of several spellings ("City 12",
+"city 12", " CITY  12 ", "City 12, US", ...). Then runs run_newsletter() against local
+fake upstreams and an SMTP sink three times:
+
+  cold      empty caches
+  warm      everything cached
+  expired   weather cache entries dropped, as after WEATHER_CACHE_TTL, with the
+            location spellings already known
+
+Each run reports weather upstream calls by endpoint and the hits and misses of every
+cache consulted (newsletter_cache_requests_total), with hit ratios. Run it on two commits
+to compare them. Prints JSON.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/newsletter_bench \
+        python benchmarks/location_keys.py --users 5000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert, make_url, text  # noqa: E402
+from benchmarks.fake_upstreams import FakeUpstreams  # noqa: E402
+from benchmarks.pipeline import SCHEMA, git_commit  # noqa: E402
+from benchmarks.smtp_sink import SMTPSink  # noqa: E402
+from app.config import Config  # noqa: E402
+
+SPELLINGS = ["City {}", "city {}", "CITY {}", " City  {} ", "City {}, US", "city {},us"]
+
+
+def seed(db, users, cities, seed_value):
+    from app.models import User
+
+    db.session.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    db.session.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    db.session.commit()
+    db.create_all()
+
+    rng = random.Random(seed_value)
+    rows, seen_cities = [], set()
+    for index in range(users):
+        city = min(int(rng.paretovariate(1.2)) - 1, cities - 1)
+        seen_cities.add(city)
+        rows.append({
+            'first_name': f"User{index}",
+            'last_name': "Bench",
+            'email': f"user{index}@example.com",
+            'subscriptions': {'subscriptions': [{'name': 'WeatherUpdateNow', 'details': {
+                'location': rng.choice(SPELLINGS).format(city), 'units': 'imperial'}}]},
+        })
+    for start in range(0, len(rows), 5000):
+        db.session.execute(insert(User), rows[start:start + 5000])
+    db.session.commit()
+    return {
+        'spellings': len({row['subscriptions']['subscriptions'][0]['details']['location'] for row in rows}),
+        'cities': len(seen_cities),
+    }
+
+
+def cache_requests():
+    from app.services.metrics_service import CACHE_REQUESTS
+    return CACHE_REQUESTS.values()
+
+
+def measure(upstreams, run):
+    before = cache_requests()
+    upstreams.calls.clear()
+    report = run()
+    after = cache_requests()
+
+    caches = {}
+    for (cache, result), count in after.items():
+        caches.setdefault(cache, {'hit': 0, 'miss': 0})[result] += count - before.get((cache, result), 0)
+    for counts in caches.values():
+        total = counts['hit'] + counts['miss']
+        counts['hit_ratio'] = round(counts['hit'] / total, 3) if total else None
+    return {
+        'sent': report['sent'],
+        'failed': report['failed'],
+        'upstream_calls': dict(upstreams.calls),
+        'caches': {cache: counts for cache, counts in sorted(caches.items()) if cache != 'NewsTopStories'},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams().start()
+    sink = SMTPSink().start()
+    Config.SQLALCHEMY_DATABASE_URI = make_url(os.environ['BENCH_DATABASE_URL']).update_query_dict(
+        {'options': f"-csearch_path={SCHEMA}"}).render_as_string(hide_password=False)
+    Config.OPENWEATHER_BASE_URL = Config.NEWS_API_BASE_URL = upstreams.url
+    Config.MAIL_SERVER, Config.MAIL_PORT = sink.host, sink.port
+    Config.MAIL_USE_TLS, Config.MAIL_USERNAME, Config.MAIL_PASSWORD = False, None, None
+    Config.MAIL_DEFAULT_SENDER = 'newsletter@example.com'
+    Config.LOG_LEVEL, Config.LOG_FILE = 'WARNING', ''
+
+    from app import create_app, db
+    from app.services.main_service import run_newsletter
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.ERROR)
+    report = {'commit': git_commit(), 'users': args.users}
+
+    with app.app_context():
+        report.update(seed(db, args.users, args.cities, args.seed))
+        report['cold'] = measure(upstreams, run_newsletter)
+        report['warm'] = measure(upstreams, run_newsletter)
+        db.session.execute(text("DELETE FROM cached_content WHERE subscription_type = 'WeatherUpdateNow'"))
+        db.session.commit()
+        report['expired'] = measure(upstreams, run_newsletter)
+
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    upstreams.stop()
+    sink.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
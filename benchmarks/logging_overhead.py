@@ -0,0 +1,135 @@
+"""
+Measures how logging affects newsletter build throughput (users/sec).
+
+Each user's newsletter is built with build_newsletter() from shared resolved
+content and a fragment cache, as in run_newsletter, under three setups:
+
+  legacy           DEBUG level, synchronous StreamHandler + FileHandler (the old
+                   basicConfig setup), plus the per-user payload lines the old
+                   router and email engine logged (whole API responses at INFO
+                   and DEBUG).
+  queue_info       configure_logging() at INFO: QueueHandler/QueueListener and
+                   the current log lines only.
+  queue_debug      configure_logging() at DEBUG with the old payload lines
+                   re-enabled, to show the cost left once they are truncated and
+                   written off-thread.
+
+Log output goes to a temporary file and /dev/null. Prints JSON.
+
+Usage:
+    python benchmarks/logging_overhead.py --users 5000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.fake_upstreams import articles_for, weather_for  # noqa: E402
+from app import create_app, logging_setup  # noqa: E402
+from app.services.main_service import build_newsletter, content_key  # noqa: E402
+from app.services.render_service import FragmentCache  # noqa: E402
+
+payload_logger = logging.getLogger('app.services.main_service')
+
+
+def log_payloads(content):
+    # The per-user lines the router and email engine used to log
+    payload_logger.info("Weather data fetched from database: %s", content['weather'])
+    payload_logger.info("News fetched successfully: %s", content['news'])
+    payload_logger.debug("Raw subscription data received: %s", content)
+    payload_logger.debug("Processing weather data: %s", content['weather'])
+    payload_logger.debug("Raw news data received: %s", content['news'])
+
+
+def reset_logging():
+    logging_setup.stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def legacy_logging(log_file, stream):
+    reset_logging()
+    logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(stream), logging.FileHandler(log_file)])
+
+
+def queue_logging(app, level, log_file, stream):
+    reset_logging()
+    app.config.update(LOG_LEVEL=level, LOG_FILE=log_file)
+    stderr, sys.stderr = sys.stderr, stream  # The listener's StreamHandler binds sys.stderr
+    try:
+        logging_setup.configure_logging(app)
+    finally:
+        sys.stderr = stderr
+
+
+def measure(users, resolved, payloads):
+    cache = FragmentCache(1024)
+    started = time.perf_counter()
+    for user in users:
+        if payloads:
+            log_payloads({'weather': resolved[content_key(user.subscriptions['subscriptions'][0])],
+                          'news': resolved[content_key(user.subscriptions['subscriptions'][1])]})
+        build_newsletter(user, resolved, cache)
+    elapsed = time.perf_counter() - started
+    logging_setup.stop_logging()  # Include draining the queue in the measurement
+    total = time.perf_counter() - started
+    return {
+        'users_per_second': round(len(users) / elapsed, 1),
+        'users_per_second_incl_flush': round(len(users) / total, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--cities', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    resolved = {}
+    users = []
+    for index in range(args.users):
+        subscriptions = [
+            {'name': 'WeatherUpdateNow', 'details': {'location': f"City {index % args.cities}"}},
+            {'name': 'NewsTopStories', 'details': {'language': 'en', 'categories': 'tech', 'limit': 10}},
+        ]
+        users.append(SimpleNamespace(id=index, email=f"user{index}@example.com", subscriptions={'subscriptions': subscriptions}))
+    for index in range(args.cities):
+        resolved[content_key(users[index].subscriptions['subscriptions'][0])] = weather_for(1000 + index, f"City {index}", 'imperial')
+    resolved[content_key(users[0].subscriptions['subscriptions'][1])] = {'data': articles_for('en', ['tech'], 10)}
+
+    report = {'users': args.users}
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull, app.app_context():
+        log_file = os.path.join(directory, 'app.log')
+
+        legacy_logging(log_file, devnull)
+        report['legacy'] = measure(users, resolved, payloads=True)
+        report['legacy']['log_mb'] = round(os.path.getsize(log_file) / 1e6, 1)
+        os.remove(log_file)
+
+        queue_logging(app, 'INFO', log_file, devnull)
+        report['queue_info'] = measure(users, resolved, payloads=False)
+        report['queue_info']['log_mb'] = round(os.path.getsize(log_file) / 1e6, 1)
+        os.remove(log_file)
+
+        queue_logging(app, 'DEBUG', log_file, devnull)
+        report['queue_debug'] = measure(users, resolved, payloads=True)
+        report['queue_debug']['log_mb'] = round(os.path.getsize(log_file) / 1e6, 1)
+        reset_logging()
+
+    report['throughput_gain'] = round(
+        report['queue_info']['users_per_second_incl_flush'] / report['legacy']['users_per_second_incl_flush'], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures message serialization CPU for a bulk send: a fresh flask_mail Message
+per recipient versus one cached MIME payload per distinct body with only the
+To, Message-ID and List-Unsubscribe headers added per recipient.
+
+Nothing is sent; only the bytes handed to SMTP are produced. The per-recipient
+path takes milliseconds per message, so by default it runs on the first
+--legacy-recipients recipients and its total is projected to the full list.
+
+Usage:
+    python benchmarks/mime.py --recipients 100000 --distinct 50
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('MAIL_DEFAULT_SENDER', 'newsletter@example.com')
+os.environ.setdefault('UNSUBSCRIBE_URL', 'https://example.com/unsubscribe?email={email}')
+
+from benchmarks.fake_upstreams import articles_for, weather_for  # noqa: E402
+from app import create_app  # noqa: E402
+from app.services.email_service import address_payload, build_message, build_payload, msgid_domain, render_newsletter  # noqa: E402
+from app.services.render_service import FragmentCache  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--recipients', type=int, default=100000)
+    parser.add_argument('--distinct', type=int, default=50, help="Distinct newsletter bodies among the recipients")
+    parser.add_argument('--legacy-recipients', type=int, default=10000, help="Recipients serialized the old way")
+    args = parser.parse_args()
+
+    app = create_app()
+    logging.disable(logging.CRITICAL)
+    report = {'recipients': args.recipients, 'distinct_bodies': args.distinct}
+
+    with app.app_context():
+        bodies = [render_newsletter({
+            'weather': weather_for(1000 + index, f"City {index}", 'imperial'),
+            'news': {'data': articles_for('en', [f"category{index}"], 10)},
+        }) for index in range(args.distinct)]
+        recipients = [(f"user{index}@example.com", bodies[index % args.distinct]) for index in range(args.recipients)]
+
+        sample = recipients[:args.legacy_recipients]
+        started = time.perf_counter()
+        for to, html in sample:
+            build_message(to, "Daily Newsletter", html).as_bytes()
+        elapsed = time.perf_counter() - started
+        report['per_recipient_message'] = {
+            'measured_recipients': len(sample),
+            'us_per_message': round(elapsed / len(sample) * 1e6, 1),
+            'projected_seconds': round(elapsed / len(sample) * args.recipients, 1),
+        }
+
+        cache = FragmentCache(args.distinct, name='payload')
+        started = time.perf_counter()
+        size = 0
+        for to, html in recipients:
+            sender, payload = cache.get_or_render('payload', ("Daily Newsletter", html),
+                                                  lambda: build_payload("Daily Newsletter", html))
+            size += len(address_payload(payload, to, msgid_domain(sender)))
+        elapsed = time.perf_counter() - started
+        report['cached_payload'] = {
+            'seconds': round(elapsed, 3),
+            'us_per_message': round(elapsed / args.recipients * 1e6, 1),
+            'mb': round(size / 1e6, 1),
+            'cache': cache.stats(),
+        }
+
+    report['speedup'] = round(
+        report['per_recipient_message']['us_per_message'] / report['cached_payload']['us_per_message'], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+End-to-end benchmark of a full newsletter run: subscription_router -> email_engine -> send_email.
+
+Seeds --users synthetic users with varied subscriptions into a scratch schema, points the
+app at local stand-ins for OpenWeatherMap and TheNewsAPI (benchmarks/fake_upstreams.py)
+and at a discarding SMTP server (benchmarks/smtp_sink.py), then calls run_newsletter()
+--runs times. The first run starts with empty caches; later runs show the warm path.
+
+Each run reports users/sec, p50/p99 per-user latency (building the user's newsletter
+plus handing it to SMTP; content resolution happens per batch and is reported under
+stage_seconds), upstream calls by endpoint, messages delivered and the process's peak
+RSS. The fake servers run in threads of the same process, so peak RSS includes them.
+Results are printed as JSON with the current commit, so runs can be compared across
+commits.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/newsletter_bench \
+        python benchmarks/pipeline.py --users 5000 --output bench.json
+
+Never point BENCH_DATABASE_URL at production: the script creates and drops its own schema.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert, make_url, text  # noqa: E402
+from benchmarks.fake_upstreams import FakeUpstreams  # noqa: E402
+from benchmarks.smtp_sink import SMTPSink  # noqa: E402
+from app.config import Config  # noqa: E402
+
+SCHEMA = 'bench_pipeline'
+
+CATEGORIES = ['general', 'tech', 'business', 'politics', 'science', 'health', 'sports', 'entertainment']
+LANGUAGES = ['en'] * 8 + ['es', 'fr']
+UNITS = ['imperial'] * 3 + ['metric']
+LIMITS = [3, 5, 10]
+
+
+def synthetic_subscriptions(rng, cities):
+    """
+    Returns a subscriptions list mixing weather and news the way real users do: most have
+    both, some only one, and cities, units, categories and limits vary between users.
+    """
+    subscriptions = []
+    if rng.random() < 0.9:
+        city = min(int(rng.paretovariate(1.2)) - 1, cities - 1)  # A few popular cities, a long tail
+        subscriptions.append({'name': 'WeatherUpdateNow', 'details': {
+            'location': f"City {city}",
+            'units': rng.choice(UNITS),
+        }})
+    if not subscriptions or rng.random() < 0.8:
+        subscriptions.append({'name': 'NewsTopStories', 'details': {
+            'language': rng.choice(LANGUAGES),
+            'categories': ",".join(rng.sample(CATEGORIES, rng.choice([1, 1, 2]))),
+            'limit': rng.choice(LIMITS),
+        }})
+    return subscriptions
+
+
+def seed(db, users, cities, seed_value):
+    from app.models import User
+
+    db.session.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    db.session.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    db.session.commit()
+    db.create_all()
+
+    rng = random.Random(seed_value)
+    rows = [{
+        'first_name': f"User{index}",
+        'last_name': "Bench",
+        'email': f"user{index}@example.com",
+        'subscriptions': {'subscriptions': synthetic_subscriptions(rng, cities)},
+    } for index in range(users)]
+    for start in range(0, len(rows), 5000):
+        db.session.execute(insert(User), rows[start:start + 5000])
+    db.session.commit()
+
+
+class LatencyRecorder:
+    """
+    Wraps build_newsletter() and SMTPPool.send() to time each user's share of a run,
+    keyed by recipient address.
+    """
+
+    def __init__(self):
+        self.build = {}
+        self.send = {}
+
+    def install(self):
+        from app.services import main_service
+        from app.services.smtp_service import SMTPPool
+
+        build_newsletter, send = main_service.build_newsletter, SMTPPool.send
+        recorder = self
+
+        def timed_build(user, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return build_newsletter(user, *args, **kwargs)
+            finally:
+                recorder.build[user.email] = time.perf_counter() - started
+
+        def timed_send(pool, from_addr, to_addrs, msg_bytes):
+            started = time.perf_counter()
+            try:
+                return send(pool, from_addr, to_addrs, msg_bytes)
+            finally:
+                recorder.send[to_addrs[0]] = time.perf_counter() - started
+
+        main_service.build_newsletter = timed_build
+        SMTPPool.send = timed_send
+
+    def reset(self):
+        self.build.clear()
+        self.send.clear()
+
+    def summary(self):
+        latencies = sorted(seconds + self.send[email] for email, seconds in self.build.items() if email in self.send)
+        if not latencies:
+            return {}
+        return {
+            'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3),
+        }
+
+
+def stage_totals():
+    """Returns the seconds recorded so far in newsletter_stage_seconds, per stage."""
+    from app.services.metrics_service import STAGE_SECONDS
+
+    totals = defaultdict(float)
+    for name, labels, value in STAGE_SECONDS.samples():
+        if name.endswith('_sum'):
+            totals[labels.split('"')[1]] += value
+    return totals
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is KiB on Linux
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--cities', type=int, default=500, help="Distinct weather locations users pick from")
+    parser.add_argument('--runs', type=int, default=2, help="Newsletter runs; the first starts with empty caches")
+    parser.add_argument('--batch-size', type=int, default=None, help="Users per batch (default: NEWSLETTER_BATCH_SIZE)")
+    parser.add_argument('--upstream-latency', type=float, default=0.02, help="Seconds each fake upstream request takes")
+    parser.add_argument('--smtp-latency', type=float, default=0.0, help="Seconds the SMTP sink takes per message")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(latency=args.upstream_latency).start()
+    sink = SMTPSink(latency=args.smtp_latency).start()
+
+    Config.SQLALCHEMY_DATABASE_URI = make_url(os.environ['BENCH_DATABASE_URL']).update_query_dict(
+        {'options': f"-csearch_path={SCHEMA}"}).render_as_string(hide_password=False)
+    Config.OPENWEATHER_BASE_URL = Config.NEWS_API_BASE_URL = upstreams.url
+    Config.MAIL_SERVER, Config.MAIL_PORT = sink.host, sink.port
+    Config.MAIL_USE_TLS, Config.MAIL_USERNAME, Config.MAIL_PASSWORD = False, None, None
+    Config.MAIL_DEFAULT_SENDER = 'newsletter@example.com'
+    Config.LOG_LEVEL, Config.LOG_FILE = 'WARNING', ''
+
+    from app import create_app, db
+    from app.services.main_service import run_newsletter
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.ERROR)  # Keep per-user failures from dominating the timings
+    recorder = LatencyRecorder()
+    recorder.install()
+    report = {
+        'commit': git_commit(),
+        'users': args.users,
+        'cities': args.cities,
+        'upstream_latency': args.upstream_latency,
+        'smtp_latency': args.smtp_latency,
+        'runs': [],
+    }
+
+    with app.app_context():
+        started = time.perf_counter()
+        seed(db, args.users, args.cities, args.seed)
+        report['seed_seconds'] = round(time.perf_counter() - started, 2)
+        report['rss_after_seed_mb'] = peak_rss_mb()
+
+        for index in range(args.runs):
+            recorder.reset()
+            upstreams.calls.clear()
+            sink.reset()
+            stages_before = stage_totals()
+
+            started = time.perf_counter()
+            result = run_newsletter(batch_size=args.batch_size)
+            elapsed = time.perf_counter() - started
+
+            stages = stage_totals()
+            report['runs'].append({
+                'run': 'cold' if index == 0 else 'warm',
+                'sent': result['sent'],
+                'failed': result['failed'],
+                'content_keys': result['content_keys'],
+                'seconds': round(elapsed, 3),
+                'users_per_second': round((result['sent'] + result['failed']) / elapsed, 1),
+                'latency': recorder.summary(),
+                'upstream_calls': upstreams.total_calls(),
+                'upstream_calls_by_path': dict(upstreams.calls),
+                'smtp': sink.stats(),
+                'stage_seconds': {stage: round(seconds - stages_before.get(stage, 0.0), 3)
+                                  for stage, seconds in sorted(stages.items())},
+                'peak_rss_mb': peak_rss_mb(),
+            })
+
+        if not args.keep:
+            db.session.remove()
+            db.engine.dispose()
+            with db.engine.begin() as connection:
+                connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    upstreams.stop()
+    sink.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
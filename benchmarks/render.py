@@ -0,0 +1,81 @@
+"""
+Microbenchmark: the pre-Jinja2 f-string renderers versus the cached templates.
+
+Renders the same weather + news content N times with the legacy path
+(format_HTML_* containers joined and wrapped by add_email_headers), with
+email_service.render_newsletter, and with render_newsletter backed by a
+FragmentCache whose content keys cycle through --distinct variants (as if
+the users were spread over that many city/news combinations). Prints
+per-render timings as JSON.
+
+Usage:
+    python benchmarks/render.py --renders 5000 --articles 10 --distinct 50
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks import legacy_render  # noqa: E402
+from benchmarks.fake_upstreams import articles_for, weather_for  # noqa: E402
+from app.services.email_service import render_newsletter  # noqa: E402
+from app.services.render_service import FragmentCache  # noqa: E402
+
+
+def legacy_newsletter(content):
+    html_body = (legacy_render.format_HTML_weather_container(content['weather'])
+                 + legacy_render.format_HTML_news_container(content['news']['data']))
+    return legacy_render.add_email_headers({'all': html_body})['all']
+
+
+def measure(render, content, renders):
+    started = time.perf_counter()
+    for _ in range(renders):
+        html = render(content)
+    elapsed = time.perf_counter() - started
+    return {'us_per_render': round(elapsed / renders * 1e6, 1), 'bytes': len(html)}
+
+
+def measure_cached(content, renders, distinct):
+    cache = FragmentCache(maxsize=2 * distinct)
+    keys = [{'weather': ('WeatherUpdateNow', f'City {i}', 'imperial'),
+             'news': ('NewsTopStories', 'en', (f'category{i}',), 10)} for i in range(distinct)]
+    started = time.perf_counter()
+    for i in range(renders):
+        html = render_newsletter(content, keys[i % distinct], cache)
+    elapsed = time.perf_counter() - started
+    return {'us_per_render': round(elapsed / renders * 1e6, 1), 'bytes': len(html), 'cache': cache.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--renders', type=int, default=5000)
+    parser.add_argument('--articles', type=int, default=10)
+    parser.add_argument('--distinct', type=int, default=50, help='Distinct content keys for the fragment cache run')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # Time rendering, not log formatting
+    content = {
+        'weather': weather_for(4930956, 'Boston', 'imperial'),
+        'news': {'data': articles_for('en', ['general', 'tech'], args.articles)},
+    }
+
+    report = {
+        'renders': args.renders,
+        'articles': args.articles,
+        'legacy': measure(legacy_newsletter, content, args.renders),
+        'templates': measure(render_newsletter, content, args.renders),
+        'fragment_cache': measure_cached(content, args.renders, args.distinct),
+    }
+    report['speedup'] = round(report['legacy']['us_per_render'] / report['templates']['us_per_render'], 2)
+    report['fragment_cache_speedup'] = round(
+        report['legacy']['us_per_render'] / report['fragment_cache']['us_per_render'], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Counts database round trips per newsletter.
+
+Seeds synthetic users the way benchmarks/pipeline.py does, then sends with local fake
+upstreams and an SMTP sink while counting, per engine:
+
+  statements     cursor executions (queries, inserts, updates)
+  transactions   COMMITs and ROLLBACKs issued by SQLAlchemy
+  checkouts      connections taken from the pool; with pool_pre_ping each one is a
+                 ping round trip
+
+Reported for the one-user job POST /send_newsletter_to_user queues (the run_newsletter()
+a worker makes for it) and for a warm full-audience run_newsletter(), as totals and per
+newsletter. Prints JSON.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/newsletter_bench \
+        python benchmarks/round_trips.py --users 2000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event, make_url, text  # noqa: E402
+from benchmarks.fake_upstreams import FakeUpstreams  # noqa: E402
+from benchmarks.pipeline import SCHEMA, seed  # noqa: E402
+from benchmarks.smtp_sink import SMTPSink  # noqa: E402
+from app.config import Config  # noqa: E402
+
+
+class RoundTripCounter:
+    def __init__(self, engine):
+        self.counts = Counter()
+        event.listen(engine, 'before_cursor_execute', lambda *args: self._count('statements'))
+        event.listen(engine, 'commit', lambda *args: self._count('transactions'))
+        event.listen(engine, 'rollback', lambda *args: self._count('transactions'))
+        event.listen(engine.pool, 'checkout', lambda *args: self._count('checkouts'))
+
+    def _count(self, name):
+        self.counts[name] += 1
+
+    def measure(self, func, newsletters):
+        self.counts.clear()
+        func()
+        counts = dict(self.counts)
+        total = sum(counts.values())
+        return {**counts, 'total': total, 'per_newsletter': round(total / newsletters, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams().start()
+    sink = SMTPSink().start()
+    Config.SQLALCHEMY_DATABASE_URI = make_url(os.environ['BENCH_DATABASE_URL']).update_query_dict(
+        {'options': f"-csearch_path={SCHEMA}"}).render_as_string(hide_password=False)
+    Config.OPENWEATHER_BASE_URL = Config.NEWS_API_BASE_URL = upstreams.url
+    Config.MAIL_SERVER, Config.MAIL_PORT = sink.host, sink.port
+    Config.MAIL_USE_TLS, Config.MAIL_USERNAME, Config.MAIL_PASSWORD = False, None, None
+    Config.MAIL_DEFAULT_SENDER = 'newsletter@example.com'
+    Config.LOG_LEVEL, Config.LOG_FILE = 'WARNING', ''
+
+    from app import create_app, db
+    from app.services.main_service import run_newsletter
+    from app.services.user_service import get_all_users
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.ERROR)
+    report = {'users': args.users, 'engine_options': {
+        key: value for key, value in app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).items() if key != 'connect_args'}}
+
+    with app.app_context():
+        seed(db, args.users, args.cities, args.seed)
+        counter = RoundTripCounter(db.engine)
+        run_newsletter()  # Fill the caches, so both measurements below are warm
+
+        def single_user():
+            with app.app_context():
+                user_id = get_all_users().id
+                run_newsletter(start_id=user_id, end_id=user_id)
+
+        report['single_user'] = counter.measure(single_user, 1)
+        report['full_run'] = counter.measure(lambda: run_newsletter(), args.users)
+
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    upstreams.stop()
+    sink.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
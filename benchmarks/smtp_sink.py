@@ -0,0 +1,114 @@
+"""
+A local SMTP server that accepts and discards every message.
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT),
+without STARTTLS or AUTH. Messages and connections are counted so benchmarks can
+check what the pooled sender delivered.
+"""
+import socket
+import socketserver
+import threading
+
+
+class SMTPSink:
+    """
+    Serves a discarding SMTP server on a local port until stop() is called.
+
+    Attributes:
+        host (str): Address to use for MAIL_SERVER.
+        port (int): Port to use for MAIL_PORT.
+        messages (int): Messages accepted.
+        recipients (int): Recipients accepted.
+        bytes (int): Message bytes received.
+        connections (int): Connections opened.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = self.recipients = self.bytes = self.connections = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.messages = self.recipients = self.bytes = self.connections = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'messages': self.messages,
+                'recipients': self.recipients,
+                'mb': round(self.bytes / 1e6, 2),
+                'connections': self.connections,
+            }
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def _handler(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sink._count(connections=1)
+
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+                self.wfile.flush()
+
+            def handle(self):
+                self.reply('220 localhost SMTP sink ready')
+                recipients = 0
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line[:4].upper()
+
+                    if command == b'EHLO':
+                        self.reply('250-localhost')
+                        self.reply('250 8BITMIME')
+                    elif command == b'HELO':
+                        self.reply('250 localhost')
+                    elif command == b'MAIL':
+                        recipients = 0
+                        self.reply('250 OK')
+                    elif command == b'RCPT':
+                        recipients += 1
+                        self.reply('250 OK')
+                    elif command == b'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        size = 0
+                        for data in self.rfile:
+                            if data == b'.\r\n':
+                                break
+                            size += len(data)
+                        if sink.latency:
+                            threading.Event().wait(sink.latency)
+                        sink._count(messages=1, recipients=recipients, bytes=size)
+                        self.reply('250 OK queued')
+                    elif command in (b'RSET', b'NOOP'):
+                        self.reply('250 OK')
+                    elif command == b'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        return Handler
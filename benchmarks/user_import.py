@@ -0,0 +1,115 @@
+"""
+Compares one-user-per-request inserts with the COPY-based bulk import.
+
+Writes --users synthetic users to a temporary NDJSON file, inserts the first
+--legacy-users of them the way POST /create does (one User added and committed per
+user, projected to the full list), then imports the whole file with
+import_service.import_users() into a fresh table. Runs in a scratch schema and
+prints JSON.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/newsletter_bench \
+        python benchmarks/user_import.py --users 200000
+
+Never point BENCH_DATABASE_URL at production: the script creates and drops its own schema.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import make_url, text  # noqa: E402
+from app.config import Config  # noqa: E402
+
+SCHEMA = 'bench_user_import'
+
+
+def write_upload(path, users):
+    with open(path, 'w') as f:
+        for index in range(users):
+            f.write(json.dumps({
+                'first_name': f"User{index}",
+                'last_name': "Bench",
+                'email': f"user{index}@example.com",
+                'subscriptions': [{'name': 'WeatherUpdateNow', 'details': {'location': f"City {index % 500}"}}],
+            }) + '\n')
+
+
+def reset_schema(db):
+    db.session.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    db.session.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    db.session.commit()
+    db.create_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--legacy-users', type=int, default=2000, help="Users inserted one commit at a time")
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args()
+
+    Config.SQLALCHEMY_DATABASE_URI = make_url(os.environ['BENCH_DATABASE_URL']).update_query_dict(
+        {'options': f"-csearch_path={SCHEMA}"}).render_as_string(hide_password=False)
+    Config.LOG_LEVEL, Config.LOG_FILE = 'WARNING', ''
+
+    from app import create_app, db
+    from app.models import User
+    from app.services.import_service import import_users
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.ERROR)
+    report = {'users': args.users}
+
+    with tempfile.TemporaryDirectory() as directory, app.app_context():
+        path = os.path.join(directory, 'users.ndjson')
+        write_upload(path, args.users)
+        report['upload_mb'] = round(os.path.getsize(path) / 1e6, 1)
+
+        reset_schema(db)
+        with open(path) as stream:
+            records = [json.loads(next(stream)) for _ in range(min(args.legacy_users, args.users))]
+        started = time.perf_counter()
+        for record in records:
+            db.session.add(User(record['first_name'], record['last_name'], record['email'],
+                                {'subscriptions': record['subscriptions']}))
+            db.session.commit()
+        elapsed = time.perf_counter() - started
+        report['per_user_commit'] = {
+            'measured_users': len(records),
+            'users_per_second': round(len(records) / elapsed, 1),
+            'projected_seconds': round(elapsed / len(records) * args.users, 1),
+        }
+
+        reset_schema(db)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with open(path, newline='') as stream:
+            result, error = import_users(stream, 'ndjson', chunk_size=args.chunk_size)
+        report['bulk_import'] = {
+            'seconds': result.get('elapsed_seconds'),
+            'users_per_second': round(result['accepted'] / result['elapsed_seconds'], 1) if not error else None,
+            'accepted': result['accepted'],
+            'duplicate': result['duplicate'],
+            'rejected': result['rejected'],
+            'chunks': result['chunks'],
+            'rss_growth_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+            'error': error,
+        }
+
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    if report['bulk_import']['seconds']:
+        report['speedup'] = round(report['per_user_commit']['projected_seconds'] / report['bulk_import']['seconds'], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares upstream call volume for per-location weather fetching and the batched
+group endpoint, against a local stand-in for OpenWeatherMap.
+
+Usage:
+    python benchmarks/weather_batch.py --cities 5000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.fake_upstreams import FakeUpstreams  # noqa: E402
+from app import create_app  # noqa: E402
+from app.services.weather_service import fetch_weather, fetch_weather_group  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cities', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds the fake upstream waits per request")
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(latency=args.latency).start()
+    app = create_app()
+    app.config['OPENWEATHER_BASE_URL'] = upstreams.url
+    logging.getLogger().setLevel(logging.WARNING)
+    locations = [f"City {index}" for index in range(args.cities)]
+    report = {'cities': args.cities}
+
+    with app.app_context():
+        started = time.perf_counter()
+        city_ids = []
+        for location in locations:
+            data, error = fetch_weather(location)
+            city_ids.append(data['id'])
+        report['per_location'] = {
+            'calls': upstreams.total_calls(),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+        upstreams.calls.clear()
+        started = time.perf_counter()
+        weather_by_id, errors = fetch_weather_group(city_ids)
+        report['grouped'] = {
+            'calls': upstreams.total_calls(),
+            'seconds': round(time.perf_counter() - started, 3),
+            'errors': len(errors),
+        }
+
+    report['call_reduction'] = round(report['per_location']['calls'] / max(report['grouped']['calls'], 1), 1)
+    upstreams.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for the web process: `gunicorn -c gunicorn.conf.py run:app`.
+
+The app is loaded once in the master (preload_app), and the service modules and email
+templates are loaded there before any worker forks, so workers share them copy-on-write
+instead of each paying for them on its first request. Database connections are never
+shared across the fork: each worker drops the master's pool and opens its own, which
+/ready does ahead of traffic.
+
+Metrics are per process, so each worker writes snapshots of its counters to METRICS_DIR
+and the master serves their sum on METRICS_PORT. That port is internal (Fly scrapes it)
+rather than a route on the public app, and every scrape sees every worker.
+"""
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.environ.setdefault('WEB_CONCURRENCY', '2'))  # Set before the app loads; it sizes each worker's DB pool
+preload_app = True
+# Kept short so a hung worker is replaced quickly. POST /import_users reads at most
+# IMPORT_MAX_REQUEST_RECORDS to stay inside it; bigger files go through `flask import-users`.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+
+metrics_dir = os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'newsletter-metrics'))
+metrics_port = int(os.getenv('METRICS_PORT', '9091'))
+
+
+def on_starting(server):
+    # Snapshots from a previous master would be summed into this one's counters
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    # Runs in the master once the socket is bound, before the first worker forks
+    from app.services.warmup_service import preload_modules
+    from app.services.metrics_service import start_metrics_server
+    server.log.info("Preloaded for workers: %s", preload_modules())
+    start_metrics_server(metrics_port, directory=metrics_dir)
+
+
+def post_fork(server, worker):
+    from app import db
+    from app.services.metrics_service import start_snapshot_writer
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)  # Leave the master's connections, if any, to the master
+    start_snapshot_writer(metrics_dir)
+
+
+def worker_exit(server, worker):
+    from app.services.metrics_service import write_snapshot
+    write_snapshot(metrics_dir)  # Keep what the worker counted since its last snapshot
@@ -0,0 +1,35 @@
+"""Add cached_content as an argument-keyed content cache
+
+Revision ID: 1f6c2d9e8a47
+Revises: 5b7b7a6ca334
+Create Date: 2026-10-17 09:12:41.305118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '1f6c2d9e8a47'
+down_revision = '5b7b7a6ca334'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # cached_content was dropped again by 5b7b7a6ca334; recreate it keyed by a normalized argument hash
+    op.create_table('cached_content',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('subscription_type', sa.String(length=100), nullable=False),
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('arguments', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('cached_at', sa.DateTime(), nullable=False),
+    sa.Column('expiration_date', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cache_key')
+    )
+
+
+def downgrade():
+    op.drop_table('cached_content')
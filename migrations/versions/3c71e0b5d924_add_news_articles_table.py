@@ -0,0 +1,43 @@
+"""Add news_articles table
+
+Revision ID: 3c71e0b5d924
+Revises: a6b94f0d2c18
+Create Date: 2026-10-17 12:48:03.551472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3c71e0b5d924'
+down_revision = 'a6b94f0d2c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('news_articles',
+    sa.Column('uuid', sa.String(length=36), nullable=False),
+    sa.Column('title', sa.Text(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('snippet', sa.Text(), nullable=True),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('image_url', sa.Text(), nullable=True),
+    sa.Column('source', sa.String(length=255), nullable=True),
+    sa.Column('language', sa.String(length=10), nullable=False),
+    sa.Column('categories', postgresql.ARRAY(sa.String(length=50)), nullable=False),
+    sa.Column('published_at', sa.DateTime(), nullable=False),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('uuid')
+    )
+    op.create_index('ix_news_articles_language_published_at', 'news_articles', ['language', sa.text('published_at DESC')])
+    op.create_index('ix_news_articles_categories', 'news_articles', ['categories'], postgresql_using='gin')
+    op.create_index('ix_news_articles_source', 'news_articles', ['source'])
+
+
+def downgrade():
+    op.drop_index('ix_news_articles_source', table_name='news_articles')
+    op.drop_index('ix_news_articles_categories', table_name='news_articles')
+    op.drop_index('ix_news_articles_language_published_at', table_name='news_articles')
+    op.drop_table('news_articles')
@@ -0,0 +1,54 @@
+"""Add newsletter job queue tables
+
+Revision ID: 7b2f4c9d1e63
+Revises: 3c71e0b5d924
+Create Date: 2026-10-17 16:05:41.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2f4c9d1e63'
+down_revision = '3c71e0b5d924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('newsletter_jobs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('start_id', sa.Integer(), nullable=True),
+    sa.Column('end_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('newsletter_tasks',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('start_id', sa.Integer(), nullable=True),
+    sa.Column('end_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_user_id', sa.Integer(), nullable=True),
+    sa.Column('sent', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['newsletter_jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_newsletter_tasks_job_id'), 'newsletter_tasks', ['job_id'], unique=False)
+    op.create_index('ix_newsletter_tasks_claim', 'newsletter_tasks', ['status', 'available_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_newsletter_tasks_claim', table_name='newsletter_tasks')
+    op.drop_index(op.f('ix_newsletter_tasks_job_id'), table_name='newsletter_tasks')
+    op.drop_table('newsletter_tasks')
+    op.drop_table('newsletter_jobs')
@@ -0,0 +1,59 @@
+"""JSONB and lookup indexes for subscription_content
+
+Revision ID: 8d3e5b71c0f2
+Revises: 1f6c2d9e8a47
+Create Date: 2026-10-17 10:04:18.772310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8d3e5b71c0f2'
+down_revision = '1f6c2d9e8a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subscription_content', schema=None) as batch_op:
+        batch_op.alter_column('result',
+               existing_type=sa.JSON(),
+               type_=postgresql.JSONB(astext_type=sa.Text()),
+               existing_nullable=False,
+               postgresql_using='result::jsonb')
+
+    # Latest rows of a type (retention, "fetched today" scans)
+    op.create_index('ix_subscription_content_type_fetch_date', 'subscription_content',
+                    ['subscription_type', sa.text('fetch_date DESC')])
+
+    # fetch_weather_from_db_raw: result->>'name' = :location AND fetch_date >= :fetch_date
+    op.create_index('ix_subscription_content_weather_name', 'subscription_content',
+                    [sa.text("(result->>'name')"), sa.text('fetch_date DESC')],
+                    postgresql_where=sa.text("subscription_type = 'WeatherUpdateNow'"))
+
+    # fetch_news_from_db_raw: first article's language and categories
+    op.create_index('ix_subscription_content_news_language', 'subscription_content',
+                    [sa.text("(result->'data'->0->>'language')"),
+                     sa.text("(result->'data'->0->>'categories')"),
+                     sa.text('fetch_date DESC')],
+                    postgresql_where=sa.text("subscription_type = 'NewsTopStories'"))
+
+    # Containment (@>) lookups on any other field
+    op.create_index('ix_subscription_content_result', 'subscription_content', ['result'],
+                    postgresql_using='gin', postgresql_ops={'result': 'jsonb_path_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_subscription_content_result', table_name='subscription_content')
+    op.drop_index('ix_subscription_content_news_language', table_name='subscription_content')
+    op.drop_index('ix_subscription_content_weather_name', table_name='subscription_content')
+    op.drop_index('ix_subscription_content_type_fetch_date', table_name='subscription_content')
+
+    with op.batch_alter_table('subscription_content', schema=None) as batch_op:
+        batch_op.alter_column('result',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               type_=sa.JSON(),
+               existing_nullable=False,
+               postgresql_using='result::json')
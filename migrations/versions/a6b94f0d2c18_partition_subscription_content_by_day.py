@@ -0,0 +1,110 @@
+"""Partition subscription_content by fetch_date
+
+Revision ID: a6b94f0d2c18
+Revises: 8d3e5b71c0f2
+Create Date: 2026-10-17 11:37:52.418906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6b94f0d2c18'
+down_revision = '8d3e5b71c0f2'
+branch_labels = None
+depends_on = None
+
+INDEXES = """
+    CREATE INDEX ix_subscription_content_type_fetch_date
+        ON subscription_content (subscription_type, fetch_date DESC);
+    CREATE INDEX ix_subscription_content_weather_name
+        ON subscription_content ((result->>'name'), fetch_date DESC)
+        WHERE subscription_type = 'WeatherUpdateNow';
+    CREATE INDEX ix_subscription_content_news_language
+        ON subscription_content ((result->'data'->0->>'language'), (result->'data'->0->>'categories'), fetch_date DESC)
+        WHERE subscription_type = 'NewsTopStories';
+    CREATE INDEX ix_subscription_content_result
+        ON subscription_content USING gin (result jsonb_path_ops);
+"""
+
+DROP_INDEXES = """
+    DROP INDEX ix_subscription_content_result;
+    DROP INDEX ix_subscription_content_news_language;
+    DROP INDEX ix_subscription_content_weather_name;
+    DROP INDEX ix_subscription_content_type_fetch_date;
+"""
+
+
+def upgrade():
+    # Move the existing table aside; the id sequence is detached so it survives the drop
+    op.execute(DROP_INDEXES)
+    op.execute("ALTER TABLE subscription_content RENAME TO subscription_content_unpartitioned")
+    op.execute("ALTER TABLE subscription_content_unpartitioned RENAME CONSTRAINT subscription_content_pkey TO subscription_content_unpartitioned_pkey")
+    op.execute("ALTER SEQUENCE subscription_content_id_seq OWNED BY NONE")
+
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE subscription_content (
+            id INTEGER NOT NULL DEFAULT nextval('subscription_content_id_seq'),
+            subscription_type VARCHAR(50) NOT NULL,
+            result JSONB NOT NULL,
+            fetch_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT subscription_content_pkey PRIMARY KEY (id, fetch_date)
+        ) PARTITION BY RANGE (fetch_date)
+    """)
+
+    # Catches rows for days the maintenance command has not created a partition for yet
+    op.execute("CREATE TABLE subscription_content_default PARTITION OF subscription_content DEFAULT")
+
+    # One partition per day that has data, plus the coming week
+    op.execute("""
+        DO $$
+        DECLARE
+            day DATE;
+        BEGIN
+            FOR day IN
+                SELECT DISTINCT fetch_date::date FROM subscription_content_unpartitioned
+                UNION
+                SELECT generate_series(current_date, current_date + 7, interval '1 day')::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF subscription_content FOR VALUES FROM (%L) TO (%L)',
+                    'subscription_content_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END $$
+    """)
+
+    op.execute("""
+        INSERT INTO subscription_content (id, subscription_type, result, fetch_date)
+        SELECT id, subscription_type, result, fetch_date FROM subscription_content_unpartitioned
+    """)
+    op.execute("DROP TABLE subscription_content_unpartitioned")
+    op.execute("ALTER SEQUENCE subscription_content_id_seq OWNED BY subscription_content.id")
+    op.execute(INDEXES)
+
+
+def downgrade():
+    op.execute(DROP_INDEXES)
+    op.execute("ALTER TABLE subscription_content RENAME TO subscription_content_partitioned")
+    op.execute("ALTER TABLE subscription_content_partitioned RENAME CONSTRAINT subscription_content_pkey TO subscription_content_partitioned_pkey")
+    op.execute("ALTER SEQUENCE subscription_content_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE subscription_content (
+            id INTEGER NOT NULL DEFAULT nextval('subscription_content_id_seq'),
+            subscription_type VARCHAR(50) NOT NULL,
+            result JSONB NOT NULL,
+            fetch_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT subscription_content_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO subscription_content (id, subscription_type, result, fetch_date)
+        SELECT id, subscription_type, result, fetch_date FROM subscription_content_partitioned
+    """)
+    # Dropping the parent drops every partition with it
+    op.execute("DROP TABLE subscription_content_partitioned")
+    op.execute("ALTER SEQUENCE subscription_content_id_seq OWNED BY subscription_content.id")
+    op.execute(INDEXES)
@@ -0,0 +1,44 @@
+"""Drop subscription_content lookup indexes
+
+Nothing reads subscription_content any more: weather is resolved through
+weather_locations and the content cache, news through news_articles. The table keeps
+the fetched responses until retention drops their partition, and its lookup indexes,
+the GIN index over every full result above all, only slowed each insert down.
+
+Revision ID: c81e4f6a2d57
+Revises: f2d7a9c4b813
+Create Date: 2026-10-17 19:05:41.230517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81e4f6a2d57'
+down_revision = 'f2d7a9c4b813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Dropping an index on the partitioned parent drops it from every partition
+    op.execute("DROP INDEX IF EXISTS ix_subscription_content_result")
+    op.execute("DROP INDEX IF EXISTS ix_subscription_content_news_language")
+    op.execute("DROP INDEX IF EXISTS ix_subscription_content_weather_name")
+    op.execute("DROP INDEX IF EXISTS ix_subscription_content_type_fetch_date")
+
+
+def downgrade():
+    op.execute("""
+        CREATE INDEX ix_subscription_content_type_fetch_date
+            ON subscription_content (subscription_type, fetch_date DESC);
+        CREATE INDEX ix_subscription_content_weather_name
+            ON subscription_content ((result->>'name'), fetch_date DESC)
+            WHERE subscription_type = 'WeatherUpdateNow';
+        CREATE INDEX ix_subscription_content_news_language
+            ON subscription_content ((result->'data'->0->>'language'), (result->'data'->0->>'categories'), fetch_date DESC)
+            WHERE subscription_type = 'NewsTopStories';
+        CREATE INDEX ix_subscription_content_result
+            ON subscription_content USING gin (result jsonb_path_ops);
+    """)
@@ -0,0 +1,52 @@
+"""Drop the subscription_content default partition
+
+Postgres refuses DETACH PARTITION ... CONCURRENTLY while the parent has a default
+partition, and retention needs a concurrent detach to drop expired days without
+locking out inserts. The rows that landed in the default partition move to daily
+partitions of their own.
+
+Revision ID: d5a3e9b07c14
+Revises: c81e4f6a2d57
+Create Date: 2026-10-17 21:12:08.604391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a3e9b07c14'
+down_revision = 'c81e4f6a2d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE subscription_content DETACH PARTITION subscription_content_default")
+
+    # One partition per day the default partition held rows for
+    op.execute("""
+        DO $$
+        DECLARE
+            day DATE;
+        BEGIN
+            FOR day IN SELECT DISTINCT fetch_date::date FROM subscription_content_default LOOP
+                IF to_regclass('subscription_content_p' || to_char(day, 'YYYYMMDD')) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF subscription_content FOR VALUES FROM (%L) TO (%L)',
+                        'subscription_content_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                    );
+                END IF;
+            END LOOP;
+        END $$
+    """)
+
+    op.execute("""
+        INSERT INTO subscription_content (id, subscription_type, result, fetch_date)
+        SELECT id, subscription_type, result, fetch_date FROM subscription_content_default
+    """)
+    op.execute("DROP TABLE subscription_content_default")
+
+
+def downgrade():
+    op.execute("CREATE TABLE subscription_content_default PARTITION OF subscription_content DEFAULT")
@@ -0,0 +1,28 @@
+"""Add run_key to newsletter_jobs
+
+Revision ID: e4a8c2f17b05
+Revises: 7b2f4c9d1e63
+Create Date: 2026-10-17 16:31:12.774093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8c2f17b05'
+down_revision = '7b2f4c9d1e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('newsletter_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('run_key', sa.String(length=100), nullable=True))
+        batch_op.create_unique_constraint('uq_newsletter_jobs_run_key', ['run_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('newsletter_jobs', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_newsletter_jobs_run_key', type_='unique')
+        batch_op.drop_column('run_key')
@@ -0,0 +1,35 @@
+"""Add weather_locations table
+
+Revision ID: f2d7a9c4b813
+Revises: e4a8c2f17b05
+Create Date: 2026-10-17 17:42:08.316504
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d7a9c4b813'
+down_revision = 'e4a8c2f17b05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('weather_locations',
+    sa.Column('location', sa.String(length=255), nullable=False),
+    sa.Column('city_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('country', sa.String(length=10), nullable=True),
+    sa.Column('lat', sa.Float(), nullable=True),
+    sa.Column('lon', sa.Float(), nullable=True),
+    sa.Column('resolved_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('location')
+    )
+    op.create_index('ix_weather_locations_city_id', 'weather_locations', ['city_id'])
+
+
+def downgrade():
+    op.drop_index('ix_weather_locations_city_id', table_name='weather_locations')
+    op.drop_table('weather_locations')
@@ -0,0 +1,64 @@
+"""
+Fixtures for tests that run the services against a scratch PostgreSQL database, the
+local upstream stand-ins in benchmarks/fake_upstreams.py and the SMTP sink in
+benchmarks/smtp_sink.py:
+
+    TEST_DATABASE_URL=postgresql://localhost/newsletter_test python -m pytest tests
+
+The app fixture creates and drops its own schema, and skips the test when
+TEST_DATABASE_URL is unset. Tests that do not use it need neither.
+
+Install the test requirements with `pip install -r requirements-dev.txt`.
+"""
+import os
+
+import pytest
+from sqlalchemy import make_url, text
+
+from benchmarks.fake_upstreams import FakeUpstreams
+from benchmarks.smtp_sink import SMTPSink
+from app.config import Config
+
+SCHEMA = 'test_newsletter'
+DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+@pytest.fixture
+def upstreams():
+    upstreams = FakeUpstreams().start()
+    yield upstreams
+    upstreams.stop()
+
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture
+def app(upstreams, sink):
+    if not DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    Config.SQLALCHEMY_DATABASE_URI = make_url(DATABASE_URL).update_query_dict(
+        {'options': f"-csearch_path={SCHEMA}"}).render_as_string(hide_password=False)
+    Config.OPENWEATHER_BASE_URL = Config.NEWS_API_BASE_URL = upstreams.url
+    Config.MAIL_SERVER, Config.MAIL_PORT = sink.host, sink.port
+    Config.MAIL_USE_TLS, Config.MAIL_USERNAME, Config.MAIL_PASSWORD = False, None, None
+    Config.MAIL_DEFAULT_SENDER = 'newsletter@example.com'
+    Config.LOG_LEVEL, Config.LOG_FILE = 'WARNING', ''
+
+    from app import create_app, db
+    import app.models  # noqa: F401  Registers the tables for create_all()
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        db.session.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        db.session.commit()
+        db.create_all()
+        yield app
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
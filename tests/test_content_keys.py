@@ -0,0 +1,77 @@
+"""
+Tests content key planning and news slicing in main_service.
+"""
+from app.services.main_service import (
+    content_key, news_feed_covers, news_feed_key, normalize_categories, normalize_limit,
+    plan_subscriptions, slice_news,
+)
+
+
+def weather(location, units='imperial'):
+    return {'name': 'WeatherUpdateNow', 'details': {'location': location, 'units': units}}
+
+
+def news(categories='general', language='en', limit=None):
+    return {'name': 'NewsTopStories', 'details': {'categories': categories, 'language': language, 'limit': limit}}
+
+
+def test_normalize_categories_sorts_and_dedupes():
+    assert normalize_categories("tech, business,tech") == ('business', 'tech')
+    assert normalize_categories(['tech', ' ', 'business']) == ('business', 'tech')
+    assert normalize_categories('') == ('general',)
+    assert normalize_categories(None) == ('general',)
+
+
+def test_normalize_limit():
+    assert normalize_limit('5') == 5
+    assert normalize_limit(3) == 3
+    assert normalize_limit(0) is None
+    assert normalize_limit('many') is None
+    assert normalize_limit(None) is None
+
+
+def test_weather_key_leaves_out_units():
+    assert content_key(weather('Paris', 'metric')) == content_key(weather('Paris', 'imperial'))
+    assert content_key(weather('Paris')) == ('WeatherUpdateNow', 'Paris')
+
+
+def test_news_key():
+    assert content_key(news("tech,business", limit='4')) == ('NewsTopStories', 'en', ('business', 'tech'), 4)
+    assert content_key({'name': 'NewsTopStories'}) == ('NewsTopStories', 'en', ('general',), None)
+
+
+def test_unknown_subscription_has_no_key():
+    assert content_key({'name': 'Horoscope', 'details': {}}) is None
+    assert content_key({}) is None
+
+
+def test_plan_subscriptions_collects_distinct_keys():
+    keys = plan_subscriptions([
+        [weather('Paris'), news("tech,business")],
+        [weather('Paris', 'metric'), news("business,tech")],
+        [news(limit=3), {'name': 'Horoscope'}],
+    ])
+    assert keys == {
+        ('WeatherUpdateNow', 'Paris'),
+        ('NewsTopStories', 'en', ('business', 'tech'), None),
+        ('NewsTopStories', 'en', ('general',), 3),
+    }
+
+
+def test_news_keys_with_different_limits_share_a_feed():
+    assert news_feed_key(content_key(news(limit=3))) == news_feed_key(content_key(news(limit=8)))
+    assert news_feed_key(content_key(news(limit=3))) != news_feed_key(content_key(news(language='de', limit=3)))
+
+
+def test_slice_news():
+    feed = {'data': list(range(10)), 'fetched_limit': 10}
+    assert slice_news(feed, 3) == {'data': [0, 1, 2]}
+    assert slice_news("Failed to fetch news: boom", 3) == "Failed to fetch news: boom"
+
+
+def test_news_feed_covers():
+    assert news_feed_covers({'data': [1, 2], 'fetched_limit': 10}, 10)
+    assert not news_feed_covers({'data': [1, 2], 'fetched_limit': 5}, 10)
+    assert news_feed_covers({'data': [1, 2, 3]}, 3)
+    assert not news_feed_covers(None, 1)
+    assert not news_feed_covers("Failed to fetch news: boom", 1)
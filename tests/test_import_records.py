@@ -0,0 +1,70 @@
+"""
+Tests parsing and validation of user import uploads in import_service.
+"""
+import io
+
+import pytest
+
+from app.services.import_service import ImportFormatError, detect_format, iter_records, validate_record
+
+
+def record(**overrides):
+    return {'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', **overrides}
+
+
+def test_valid_record():
+    row, error = validate_record(record(first_name=' Ada '))
+    assert error is None
+    assert row == {'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', 'subscriptions': {}}
+
+
+@pytest.mark.parametrize('overrides, error', [
+    ({'first_name': ''}, "first_name is required"),
+    ({'last_name': None}, "last_name is required"),
+    ({'first_name': 'x' * 21}, "first_name is longer than 20 characters"),
+    ({'email': 'not-an-email'}, "email is missing or invalid"),
+    ({'subscriptions': '{'}, "subscriptions is not valid JSON"),
+    ({'subscriptions': 5}, "subscriptions must be an object or a list"),
+    ({'subscriptions': [{'details': {}}]}, "each subscription must be an object with a name"),
+])
+def test_invalid_record(overrides, error):
+    row, message = validate_record(record(**overrides))
+    assert row is None
+    assert message.startswith(error)
+
+
+@pytest.mark.parametrize('subscriptions', [
+    [{'name': 'WeatherUpdateNow'}],
+    {'subscriptions': [{'name': 'WeatherUpdateNow'}]},
+    '[{"name": "WeatherUpdateNow"}]',
+])
+def test_subscription_shapes(subscriptions):
+    row, error = validate_record(record(subscriptions=subscriptions))
+    assert error is None
+    assert row['subscriptions'] == {'subscriptions': [{'name': 'WeatherUpdateNow'}]}
+
+
+def test_detect_format():
+    assert detect_format('users.CSV') == 'csv'
+    assert detect_format('users.jsonl') == 'ndjson'
+    assert detect_format(content_type='application/x-ndjson') == 'ndjson'
+    assert detect_format('users.txt', 'text/plain') is None
+
+
+def test_csv_records_carry_line_numbers():
+    stream = io.StringIO("first_name,last_name,email\nAda,Lovelace,ada@example.com\nAlan,Turing,alan@example.com\n")
+    assert [(line, record['email']) for line, record, _ in iter_records(stream, 'csv')] == [
+        (2, 'ada@example.com'), (3, 'alan@example.com')]
+
+
+def test_csv_header_must_have_required_columns():
+    with pytest.raises(ImportFormatError, match="missing email"):
+        list(iter_records(io.StringIO("first_name,last_name\nAda,Lovelace\n"), 'csv'))
+
+
+def test_ndjson_reports_bad_lines_and_skips_blank_ones():
+    stream = io.StringIO('{"email": "a@example.com"}\n\n{oops\n[1]\n')
+    records = list(iter_records(stream, 'ndjson'))
+    assert records[0] == (1, {'email': 'a@example.com'}, None)
+    assert [(line, error.split(':')[0]) for line, _, error in records[1:]] == [
+        (3, "Invalid JSON"), (4, "Expected a JSON object")]
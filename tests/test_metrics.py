@@ -0,0 +1,70 @@
+"""
+Tests the Prometheus exposition of metrics_service, including snapshots summed across
+processes.
+"""
+import json
+
+from app.services import metrics_service
+from app.services.metrics_service import CACHE_REQUESTS, STAGE_SECONDS, Counter, Histogram, render_metrics
+
+
+def write(directory, name, snapshot):
+    (directory / f"{name}.json").write_text(json.dumps(snapshot))
+
+
+def sample(page, line_start):
+    return [line for line in page.splitlines() if line.startswith(line_start)]
+
+
+def test_counter_and_histogram_samples(monkeypatch):
+    monkeypatch.setattr(metrics_service, '_registry', [])  # Keep these out of the rendered page
+    counter = Counter('test_events_total', "Events.", ['kind'])
+    counter.inc('a')
+    counter.inc('a', amount=2)
+    counter.inc('b')
+    assert list(counter.samples()) == [
+        ('test_events_total', '{kind="a"}', 3), ('test_events_total', '{kind="b"}', 1)]
+
+    histogram = Histogram('test_seconds', "Durations.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert list(histogram.samples()) == [
+        ('test_seconds_bucket', '{le="0.1"}', 1),
+        ('test_seconds_bucket', '{le="1.0"}', 2),
+        ('test_seconds_bucket', '{le="+Inf"}', 3),
+        ('test_seconds_sum', '', 5.55),
+        ('test_seconds_count', '', 3),
+    ]
+
+
+def test_render_sums_snapshots_of_every_process(tmp_path):
+    buckets = len(STAGE_SECONDS.buckets) + 2
+    first_state, second_state = [0] * buckets, [0] * buckets
+    first_state[0], first_state[-1] = 1, 0.25
+    second_state[0], second_state[-1] = 2, 0.5
+    write(tmp_path, '101', {
+        CACHE_REQUESTS.name: [[['WeatherUpdateNow', 'hit'], 3], [['WeatherUpdateNow', 'miss'], 1]],
+        STAGE_SECONDS.name: [[['send_email'], first_state]],
+    })
+    write(tmp_path, '102', {
+        CACHE_REQUESTS.name: [[['WeatherUpdateNow', 'hit'], 4]],
+        STAGE_SECONDS.name: [[['send_email'], second_state]],
+    })
+    (tmp_path / 'broken.json').write_text('{')
+
+    page = render_metrics(str(tmp_path))
+    assert sample(page, 'newsletter_cache_requests_total{') == [
+        'newsletter_cache_requests_total{cache="WeatherUpdateNow",result="hit"} 7',
+        'newsletter_cache_requests_total{cache="WeatherUpdateNow",result="miss"} 1',
+    ]
+    assert sample(page, 'newsletter_cache_hit_ratio{') == ['newsletter_cache_hit_ratio{cache="WeatherUpdateNow"} 0.875']
+    assert sample(page, 'newsletter_stage_seconds_count{') == ['newsletter_stage_seconds_count{stage="send_email"} 3']
+    assert sample(page, 'newsletter_stage_seconds_sum{') == ['newsletter_stage_seconds_sum{stage="send_email"} 0.75']
+
+
+def test_render_lists_every_metric_with_help_and_type(tmp_path):
+    page = render_metrics(str(tmp_path))
+    assert '# TYPE newsletter_cache_requests_total counter' in page
+    assert '# TYPE newsletter_stage_seconds histogram' in page
+    assert page.endswith("\n")
@@ -0,0 +1,68 @@
+"""
+Tests queueing newsletter sends and processing them with a worker.
+
+Needs TEST_DATABASE_URL, see conftest.py.
+"""
+import pytest
+from sqlalchemy import insert
+
+
+def add_users(count):
+    from app import db
+    from app.models import User
+
+    db.session.execute(insert(User), [{
+        'first_name': f"User{index}",
+        'last_name': "Test",
+        'email': f"user{index}@example.com",
+        'subscriptions': {'subscriptions': [{'name': 'WeatherUpdateNow', 'details': {'location': f"City {index}"}}]},
+    } for index in range(count)])
+    db.session.commit()
+
+
+def test_single_user_send_is_queued_as_a_one_task_job(app, sink):
+    from app.models import NewsletterTask
+    from app.services.job_service import run_worker
+
+    add_users(3)
+    response = app.test_client().post('/send_newsletter_to_user')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert sink.stats()['messages'] == 0  # Nothing is sent inside the request
+
+    tasks = NewsletterTask.query.filter_by(job_id=job_id).all()
+    assert [(task.start_id, task.end_id) for task in tasks] == [(1, 1)]
+
+    assert run_worker(burst=True, poll_interval=0) == 1
+    assert sink.stats()['messages'] == 1
+    status = app.test_client().get(f'/newsletter_jobs/{job_id}').get_json()
+    assert (status['status'], status['sent'], status['failed']) == ('completed', 1, 0)
+
+
+def test_single_user_send_without_users(app):
+    assert app.test_client().post('/send_newsletter_to_user').status_code == 404
+
+
+class StopWorker(BaseException):
+    """Ends a polling worker from its tick; a BaseException so run_worker does not catch it."""
+
+
+def test_worker_survives_a_database_error(app, sink):
+    from sqlalchemy.exc import OperationalError
+    from app.services.job_service import enqueue_newsletter, run_worker
+
+    add_users(2)
+    enqueue_newsletter()
+    ticks = []
+
+    def tick():
+        ticks.append(len(ticks))
+        if len(ticks) == 1:
+            raise OperationalError("SELECT 1", {}, Exception("server closed the connection unexpectedly"))
+        if sink.stats()['messages'] == 2:
+            raise StopWorker()
+
+    with pytest.raises(StopWorker):
+        run_worker(poll_interval=0, tick=tick)
+    assert sink.stats()['messages'] == 2
+    assert len(ticks) >= 3
@@ -0,0 +1,73 @@
+"""
+Tests resolve_content_keys() against the local upstream stand-ins.
+
+Needs TEST_DATABASE_URL, see conftest.py.
+"""
+import threading
+import time
+
+import pytest
+
+
+def news_key(limit):
+    return ('NewsTopStories', 'en', ('general',), limit)
+
+
+def test_single_news_key_is_sliced_from_a_larger_cached_feed(app, upstreams):
+    from app.services.main_service import resolve_content_keys
+
+    # A reader with the default limit caches the shared feed at that size
+    resolved = resolve_content_keys([news_key(None)])
+    assert len(resolved[news_key(None)]['data']) == app.config['NEWS_DEFAULT_LIMIT']
+
+    # Alongside one weather key, a single news key still gets only its own share
+    upstreams.calls.clear()
+    weather_key = ('WeatherUpdateNow', 'City 1')
+    resolved = resolve_content_keys([weather_key, news_key(3)])
+    assert len(resolved[news_key(3)]['data']) == 3
+    assert 'fetched_limit' not in resolved[news_key(3)]
+    assert upstreams.calls['/v1/news/top'] == 0
+    assert resolved[weather_key]
+
+
+def test_news_keys_share_one_feed_at_the_largest_limit(app, upstreams):
+    from app.services.main_service import resolve_content_keys
+
+    resolved = resolve_content_keys([news_key(2), news_key(5)])
+    assert [len(resolved[news_key(limit)]['data']) for limit in (2, 5)] == [2, 5]
+    assert upstreams.calls['/v1/news/top'] == 1
+
+
+def test_weather_and_news_are_fetched_concurrently(app, upstreams):
+    from app.services.main_service import resolve_content_keys
+
+    upstreams.latency = 0.3
+    resolved = resolve_content_keys([('WeatherUpdateNow', 'City 1'), news_key(None)])
+    assert all(resolved.values())
+
+    spans = {path: (started, finished) for path, started, finished in upstreams.spans}
+    weather, news = spans['/data/2.5/weather'], spans['/v1/news/top']
+    assert weather[0] < news[1] and news[0] < weather[1]
+
+
+@pytest.mark.parametrize('key', [('WeatherUpdateNow', 'City 1'), news_key(None)])
+def test_no_connection_is_held_during_upstream_fetches(app, upstreams, key):
+    from app import db
+    from app.services.main_service import resolve_content_keys
+
+    pool, checked_out = db.engine.pool, []
+
+    def sample_mid_request():
+        deadline = time.monotonic() + 5
+        while not upstreams.total_calls() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        checked_out.append(pool.checkedout())
+
+    upstreams.latency = 0.3
+    sampler = threading.Thread(target=sample_mid_request)
+    sampler.start()
+    resolved = resolve_content_keys([key])
+    sampler.join()
+    assert resolved[key]
+    assert checked_out == [0]
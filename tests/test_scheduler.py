@@ -0,0 +1,39 @@
+"""
+Tests the content warm-up and the scheduled runs that follow it.
+
+Needs TEST_DATABASE_URL, see conftest.py.
+"""
+from datetime import datetime
+
+import pytz
+
+from tests.test_newsletter_jobs import add_users
+
+
+def test_warm_up_reports_fetched_and_cached_keys_apart(app):
+    from app.services.main_service import warm_content_cache
+
+    add_users(3)
+    report = warm_content_cache()
+    assert (report['keys'], report['cached'], report['fetched'], report['failed']) == (3, 0, 3, [])
+
+    report = warm_content_cache()
+    assert (report['keys'], report['cached'], report['fetched'], report['upstream_requests']) == (3, 3, 0, 0)
+
+
+def test_failed_warm_up_does_not_stop_the_run_being_queued(app, monkeypatch):
+    from app.services import scheduler_service
+
+    def broken_warm_up():
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(scheduler_service, 'warm_content_cache', broken_warm_up)
+    monkeypatch.setattr(scheduler_service, '_fired', set())
+    monkeypatch.setattr(scheduler_service, 'run_due_maintenance', lambda now=None: None)
+    app.config.update(NEWSLETTER_SCHEDULE='07:00,07:10', NEWSLETTER_TIMEZONE='UTC', NEWSLETTER_WARM_LEAD_MINUTES=15)
+    add_users(1)
+
+    # 07:00 is due and the 07:10 send's warm-up is due too
+    queued = scheduler_service.fire_due_runs(datetime(2026, 10, 17, 7, 1, tzinfo=pytz.utc))
+    assert len(queued) == 1
+    assert 'warm:2026-10-17T07:10' in scheduler_service._fired
@@ -0,0 +1,42 @@
+"""
+Tests POST /import_users end to end.
+
+Needs TEST_DATABASE_URL, see conftest.py.
+"""
+
+
+def ndjson(count, start=0):
+    return ''.join(
+        f'{{"first_name": "User{index}", "last_name": "Test", "email": "user{index}@example.com"}}\n'
+        for index in range(start, start + count)
+    ).encode()
+
+
+def post(app, body):
+    return app.test_client().post('/import_users?format=ndjson', data=body, content_type='application/x-ndjson')
+
+
+def test_import(app):
+    response = post(app, ndjson(3) + b'{"first_name": "No", "last_name": "Email"}\n')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['accepted'], report['rejected']) == (3, 1)
+    assert report['errors'][0]['line'] == 4
+
+
+def test_import_stops_at_the_request_limit(app):
+    app.config['IMPORT_MAX_REQUEST_RECORDS'] = 5
+    response = post(app, ndjson(8))
+    assert response.status_code == 400
+    report = response.get_json()
+    assert (report['accepted'], report['stopped_at_line']) == (5, 6)
+    assert 'flask import-users' in report['error']
+
+
+def test_import_keeps_the_rows_before_invalid_utf8(app):
+    response = post(app, ndjson(3000) + b'\xff\xfe\n' + ndjson(10, start=3000))
+    assert response.status_code == 400
+    report = response.get_json()
+    assert report['accepted'] > 0
+    assert report['stopped_at_line'] == report['accepted'] + 1
+    assert report['error'].startswith("Upload is not valid UTF-8")
@@ -0,0 +1,41 @@
+"""
+Tests fetch_and_save_weather_batch() against the local OpenWeatherMap stand-in in
+benchmarks/fake_upstreams.py.
+
+Needs TEST_DATABASE_URL, see conftest.py.
+"""
+import math
+
+import pytest
+from sqlalchemy import text
+
+
+@pytest.mark.parametrize('count', [1, 20, 45])
+def test_batch_resolves_names_once_then_uses_group_endpoint(app, upstreams, count):
+    from app.services.weather_service import fetch_and_save_weather_batch
+
+    locations = [f"City {index}" for index in range(count)]
+
+    results = fetch_and_save_weather_batch(locations)
+    assert dict(upstreams.calls) == {'/data/2.5/weather': count}
+    assert set(results) == set(locations)
+    assert all(data and not error for data, error in results.values())
+
+    upstreams.calls.clear()
+    results = fetch_and_save_weather_batch(locations)
+    assert dict(upstreams.calls) == {'/data/2.5/group': math.ceil(count / 20)}
+    assert set(results) == set(locations)
+    assert all(data and not error for data, error in results.values())
+
+
+def test_batch_saves_every_result(app):
+    from app import db
+    from app.services.weather_service import fetch_and_save_weather_batch
+
+    locations = [f"City {index}" for index in range(30)]
+    fetch_and_save_weather_batch(locations)
+    fetch_and_save_weather_batch(locations)
+
+    saved = db.session.execute(text(
+        "SELECT count(*) FROM subscription_content WHERE subscription_type = 'WeatherUpdateNow'")).scalar()
+    assert saved == 2 * len(locations)
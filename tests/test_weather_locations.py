@@ -0,0 +1,32 @@
+"""
+Tests location and unit handling in weather_service.
+"""
+import pytest
+
+from app.services.weather_service import convert_temperature, location_from_weather, normalize_location, normalize_units
+
+
+@pytest.mark.parametrize('spelling', ["New York, US", "new york,us", " NEW  YORK ,  US ", "New York ,US"])
+def test_spellings_of_a_location_normalize_alike(spelling):
+    assert normalize_location(spelling) == "new york, us"
+
+
+def test_normalize_location_handles_missing_and_long_values():
+    assert normalize_location(None) == ""
+    assert len(normalize_location("x" * 300)) == 255
+
+
+def test_location_from_weather():
+    weather = {'id': 5128581, 'name': "New York", 'sys': {'country': 'US'}, 'coord': {'lat': 40.71, 'lon': -74.01}}
+    assert location_from_weather(weather) == {
+        'city_id': 5128581, 'name': "New York", 'country': 'US', 'lat': 40.71, 'lon': -74.01}
+    assert location_from_weather({'id': 1})['name'] == ''
+
+
+def test_units():
+    assert normalize_units(' Metric ') == 'metric'
+    assert normalize_units('kelvin') == 'imperial'
+    assert normalize_units(None) == 'imperial'
+    assert convert_temperature(100, 'imperial') == 212
+    assert convert_temperature(0, 'standard') == 273.15
+    assert convert_temperature(21.5, 'metric') == 21.5